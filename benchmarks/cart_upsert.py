@@ -0,0 +1,96 @@
+"""Compare the old SELECT-then-write add_to_cart against the native upsert
+while several threads hammer the same cart row.
+
+    python benchmarks/cart_upsert.py --threads 8 --clicks 200
+
+Runs against a throwaway SQLite file, never the real greenmart.db.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from website import upsert
+from website.models import db, Cart, Product, User
+
+
+def select_then_write(user_id, product_id):
+    item = Cart.query.filter_by(user_id=user_id, product_id=product_id).first()
+    if item:
+        item.quantity += 1
+    else:
+        db.session.add(Cart(user_id=user_id, product_id=product_id, quantity=1))
+
+
+def native_upsert(user_id, product_id):
+    upsert.add_to_cart(user_id, product_id)
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + path
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, name="bench", email="bench@example.com", password_hash="x"))
+        db.session.add(Product(id=1, name="Tomato", price=100, stock=0))
+        db.session.commit()
+
+    return app
+
+
+def run(strategy, threads, clicks):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    app = make_app(path)
+    errors = []
+
+    def worker():
+        with app.app_context():
+            for _ in range(clicks):
+                try:
+                    strategy(1, 1)
+                    db.session.commit()
+                except (IntegrityError, OperationalError) as e:
+                    db.session.rollback()
+                    errors.append(type(e).__name__)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        item = Cart.query.filter_by(user_id=1, product_id=1).first()
+        quantity = item.quantity if item else 0
+        db.engine.dispose()
+    os.remove(path)
+
+    expected = threads * clicks
+    print(
+        f"{strategy.__name__:<18} {expected / elapsed:>9.0f} clicks/s  "
+        f"quantity={quantity}/{expected}  lost={expected - quantity - len(errors)}  "
+        f"errors={len(errors)}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--clicks", type=int, default=200)
+    args = parser.parse_args()
+
+    for strategy in (select_then_write, native_upsert):
+        run(strategy, args.threads, args.clicks)
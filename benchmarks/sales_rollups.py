@@ -0,0 +1,94 @@
+"""Time the sales report over a year of rollups: the first load into NumPy,
+a cached report, and a report right after an order changed one day.
+
+    python benchmarks/sales_rollups.py --products 500 --days 365
+
+Runs against a throwaway SQLite file, never the real greenmart.db.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert
+
+from website import analytics
+from website.models import db, Order, OrderItem, Product, SalesDaily, SalesDailyProduct, User
+
+
+def make_app(path, products, days):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + path
+    app.config["STOCKOUT_EWMA_SPAN_DAYS"] = 14
+    db.init_app(app)
+
+    end = date.today()
+    rng = random.Random(0)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, name="bench", email="bench@example.com", password_hash="x"))
+        db.session.execute(
+            insert(Product),
+            [{"id": i, "name": f"Product {i}", "price": 10, "stock": 100} for i in range(1, products + 1)],
+        )
+
+        daily, per_product = [], []
+        for offset in range(days):
+            day = end - timedelta(days=offset)
+            sold = rng.sample(range(1, products + 1), products // 2)
+            per_product += [
+                {"day": day, "product_id": pid, "category_id": pid % 10, "orders": 1, "units": 2, "revenue": 20.0}
+                for pid in sold
+            ]
+            daily.append({"day": day, "orders": len(sold), "units": 2 * len(sold), "revenue": 20.0 * len(sold)})
+        db.session.execute(insert(SalesDaily), daily)
+        db.session.execute(insert(SalesDailyProduct), per_product)
+        db.session.commit()
+
+    return app, end - timedelta(days=days - 1), end, len(per_product)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def run(products, days):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    app, start, end, rows = make_app(path, products, days)
+
+    def report():
+        analytics.sales_report(start, end)
+
+    def new_order():
+        order = Order(user_id=1, total_amount=10, created_at=datetime.utcnow())
+        order.items.append(OrderItem(product_id=1, quantity=1, price=10))
+        db.session.add(order)
+        db.session.commit()
+
+    with app.app_context():
+        print(f"{days} days x {products} products = {rows} rollup rows")
+        print(f"first report (full load)  {timed(report):>8.1f} ms")
+        print(f"cached report             {timed(report):>8.1f} ms")
+        new_order()
+        print(f"report after a new order  {timed(report):>8.1f} ms")
+        db.engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    run(args.products, args.days)
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from website import create_app
+from website.models import db, Product, User
+
+
+PRODUCT_COUNT = 10
+FLASH_SALE_IDS = [1, 2]
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("greenmart")
+
+    app = create_app(
+        {
+            "TESTING": True,
+            "WTF_CSRF_ENABLED": False,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "test.db"),
+            "INVOICE_CACHE_DIR": os.path.join(tmp, "invoices"),
+            "SNAPSHOT_DIR": os.path.join(tmp, "snapshots"),
+            "METRICS_DIR": os.path.join(tmp, "metrics"),
+            "FLASH_SALE_COUNTER_DB": os.path.join(tmp, "flash_sale_counters.db"),
+            "FLASH_SALE_PRODUCT_IDS": FLASH_SALE_IDS,
+            "FLASH_SALE_FLUSH_INTERVAL": 3600,  # tests flush explicitly
+            "PASSWORD_HASH_WORKERS": 0,
+            "SLOW_QUERY_MS": 0,
+            # Any page repeating a statement more than the threshold fails
+            "NPLUSONE_ENABLED": True,
+            "NPLUSONE_STRICT": True,
+        }
+    )
+
+    with app.app_context():
+        db.session.add_all(
+            [
+                User(id=1, name="Admin", email="admin@example.com", password_hash="x", role="admin"),
+                User(id=2, name="Customer", email="customer@example.com", password_hash="x"),
+            ]
+        )
+        db.session.add_all(
+            [
+                Product(id=i, name=f"Product {i}", price=10.0 * i, stock=20)
+                for i in range(1, PRODUCT_COUNT + 1)
+            ]
+        )
+        db.session.commit()
+
+    return app
+
+
+@pytest.fixture
+def app_ctx(app):
+    with app.app_context():
+        yield
+        db.session.rollback()
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+@pytest.fixture
+def customer(app):
+    client = app.test_client()
+    login(client, 2)
+    return client
+
+
+@pytest.fixture
+def admin(app):
+    client = app.test_client()
+    login(client, 1)
+    return client
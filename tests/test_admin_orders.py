@@ -0,0 +1,87 @@
+import csv
+import io
+import re
+
+import pytest
+
+from website import admin as admin_module
+from website.models import db, Order, User
+
+
+@pytest.fixture
+def buyers(app):
+    """Two customers with orders worth 101, 102 and 103."""
+    with app.app_context():
+        users = [
+            User(name="Upper", email="Orders.Upper@example.com", password_hash="x"),
+            User(name="Percent", email="orders%lower@example.com", password_hash="x"),
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        orders = [
+            Order(user_id=users[0].id, total_amount=101, status="Pending"),
+            Order(user_id=users[0].id, total_amount=102, status="Shipped"),
+            Order(user_id=users[1].id, total_amount=103, status="Pending"),
+        ]
+        db.session.add_all(orders)
+        db.session.commit()
+        order_ids = [order.id for order in orders]
+        user_ids = [user.id for user in users]
+
+    yield order_ids
+
+    with app.app_context():
+        for order_id in order_ids:
+            db.session.delete(db.session.get(Order, order_id))
+        for user_id in user_ids:
+            db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+
+def listed(admin, **filters):
+    response = admin.get("/manage-orders", query_string=filters)
+    assert response.status_code == 200
+    return [int(order_id) for order_id in re.findall(r'name="order_ids" value="(\d+)"', response.text)]
+
+
+def test_amount_and_status_filters(admin, buyers):
+    assert listed(admin, min_amount=101, max_amount=103) == buyers[::-1]
+    assert listed(admin, min_amount=101, max_amount=103, status="pending") == [buyers[2], buyers[0]]
+
+
+def test_email_filter_is_a_literal_prefix(admin, buyers):
+    amounts = {"min_amount": 101, "max_amount": 103}
+
+    assert listed(admin, email="Orders.", **amounts) == [buyers[1], buyers[0]]
+    assert listed(admin, email="orders.", **amounts) == []  # case-sensitive
+    assert listed(admin, email="orders%", **amounts) == [buyers[2]]
+    assert listed(admin, email="orders_", **amounts) == []
+
+
+def test_keyset_pages_continue_below_the_last_id(admin, buyers, monkeypatch):
+    monkeypatch.setattr(admin_module, "ORDERS_PER_PAGE", 2)
+
+    response = admin.get("/manage-orders?min_amount=101&max_amount=103")
+    assert f"before={buyers[1]}" in response.text
+
+    assert listed(admin, min_amount=101, max_amount=103, before=buyers[1]) == [buyers[0]]
+
+
+def test_bad_filters_redirect_with_a_message(admin):
+    response = admin.get("/manage-orders?from=yesterday")
+
+    assert response.status_code == 302
+    with admin.session_transaction() as session:
+        assert admin_module.ORDER_FILTER_ERROR in [message for _, message in session["_flashes"]]
+
+
+def test_csv_export_streams_the_filtered_orders(admin, buyers):
+    response = admin.get("/admin/orders/export.csv?min_amount=101&max_amount=103&email=Orders.")
+
+    assert response.is_streamed
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ["order_id", "customer", "email", "total_amount", "status", "created_at"]
+    assert [(int(row[0]), row[2]) for row in rows[1:]] == [
+        (buyers[1], "Orders.Upper@example.com"),
+        (buyers[0], "Orders.Upper@example.com"),
+    ]
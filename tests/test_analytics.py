@@ -0,0 +1,162 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from website import analytics, flash_sale
+from website.models import (
+    db,
+    Order,
+    OrderItem,
+    Product,
+    ProductForecast,
+    SalesRollupChange,
+)
+
+
+ALPHA = 2 / 15  # STOCKOUT_EWMA_SPAN_DAYS = 14
+
+
+def sell(product_id, quantity, created_at=None):
+    order = Order(user_id=2, total_amount=quantity, created_at=created_at or datetime.utcnow())
+    order.items.append(OrderItem(product_id=product_id, quantity=quantity, price=1))
+    db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def add_product(product_id, stock):
+    db.session.add(Product(id=product_id, name=f"Product {product_id}", price=1, stock=stock))
+    db.session.commit()
+
+
+def forecast(**kwargs):
+    return {row["id"]: row for row in analytics.stockout_forecast(horizon=1000, limit=1000, **kwargs)}
+
+
+def test_sales_are_blended_into_the_stored_velocity(app_ctx):
+    add_product(201, stock=10)
+    forecast()
+
+    sell(201, 5)
+    row = forecast()[201]
+
+    as_of = analytics._forecast_day()
+    velocity = ALPHA * (1 - ALPHA) ** (as_of - analytics._today().toordinal()) * 5
+    assert row["per_day"] == round(velocity, 2)
+    assert row["days_left"] == round(10 / velocity, 1)
+
+
+def test_stock_changes_update_days_left_on_flush(app_ctx):
+    add_product(202, stock=10)
+    sell(202, 3)
+    forecast()
+
+    db.session.get(Product, 202).stock = 2
+    db.session.commit()
+
+    row = db.session.get(ProductForecast, 202)
+    assert row.days_left == pytest.approx(2 / row.velocity)
+
+
+def test_flash_products_use_the_live_counters(app_ctx, monkeypatch):
+    forecast()
+    monkeypatch.setattr(flash_sale, "available", lambda product_id: 0)
+
+    row = forecast()[1]
+
+    assert row["stock"] == 0
+    assert row["days_left"] == 0
+
+
+def test_report_reads_the_rank_index(app_ctx):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "ORDER BY product_forecast.days_left" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        forecast()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    (statement, parameters), = statements
+    plan = " ".join(
+        row[3] for row in db.session.connection().exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters
+        )
+    )
+    assert "ix_product_forecast_rank" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_incremental_forecast_matches_a_rebuild(app_ctx):
+    add_product(203, stock=50)
+    forecast()
+
+    now = datetime.utcnow()
+    sell(203, 4, now - timedelta(days=3))
+    sell(203, 6, now)
+    tomorrow = analytics._today() + timedelta(days=1)
+    forecast(today=tomorrow)
+    incremental = {r.product_id: (r.velocity, r.days_left) for r in ProductForecast.query}
+
+    analytics.rebuild_forecast(today=tomorrow)
+    rebuilt = {r.product_id: (r.velocity, r.days_left) for r in ProductForecast.query}
+
+    assert incremental.keys() == rebuilt.keys()
+    for product_id, (velocity, days_left) in rebuilt.items():
+        assert incremental[product_id][0] == pytest.approx(velocity, abs=1e-9)
+        if days_left is None:
+            assert incremental[product_id][1] is None
+        else:
+            assert incremental[product_id][1] == pytest.approx(days_left)
+
+
+def test_sales_report_totals_live_orders(app_ctx):
+    day = datetime(2020, 3, 4, 12)
+    sell(3, 2, day)
+    sell(4, 1, day)
+    sell(3, 5, day).status = "cancelled"
+    db.session.commit()
+
+    report = analytics.sales_report(day.date(), day.date())
+
+    assert report["totals"] == {"revenue": 3.0, "orders": 2, "units": 3}
+    assert [p["units"] for p in report["top_products"]] == [2, 1]
+
+
+def test_new_rollups_are_patched_into_the_cached_arrays(app_ctx, monkeypatch):
+    analytics.sales_report(date(2020, 1, 1), date(2020, 12, 31))
+
+    loads = []
+    load_arrays = analytics._load_arrays
+    monkeypatch.setattr(
+        analytics, "_load_arrays", lambda days=None: loads.append(days) or load_arrays(days)
+    )
+    sell(5, 3, datetime(2020, 5, 6, 9))
+    patched = analytics.sales_report(date(2020, 1, 1), date(2020, 12, 31))
+
+    assert loads == [{date(2020, 5, 6)}]
+    analytics._cache.arrays = None
+    assert analytics.sales_report(date(2020, 1, 1), date(2020, 12, 31)) == patched
+
+
+def test_workers_behind_the_change_log_reload_everything(app_ctx, monkeypatch):
+    analytics.sales_report(date(2020, 1, 1), date(2020, 12, 31))
+    sell(6, 1, datetime(2020, 6, 7, 9))
+    analytics.refresh()
+    SalesRollupChange.query.delete()
+    db.session.commit()
+
+    loads = []
+    load_arrays = analytics._load_arrays
+    monkeypatch.setattr(
+        analytics, "_load_arrays", lambda days=None: loads.append(days) or load_arrays(days)
+    )
+    report = analytics.sales_report(date(2020, 6, 7), date(2020, 6, 7))
+
+    assert loads == [None]
+    assert report["totals"]["units"] >= 1
@@ -0,0 +1,86 @@
+import pytest
+
+from website.models import db, Cart, Product, User
+
+from conftest import login
+
+
+@pytest.fixture
+def stocked(app):
+    with app.app_context():
+        for product_id in (8, 9):
+            db.session.get(Product, product_id).stock = 5
+        db.session.commit()
+
+
+@pytest.fixture
+def shopper(app, stocked):
+    with app.app_context():
+        user = User(name="Batch", email="batch@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    login(client, user_id)
+    yield client
+
+    with app.app_context():
+        Cart.query.filter_by(user_id=user_id).delete()
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+
+def quantities(response):
+    return {item["product_id"]: item["quantity"] for item in response.get_json()["items"]}
+
+
+def test_batch_adds_deltas_and_sets_quantities(shopper):
+    response = shopper.patch(
+        "/api/cart",
+        json=[
+            {"product_id": 8, "delta": 1},
+            {"product_id": 8, "delta": 1},
+            {"product_id": 9, "quantity": 3},
+        ],
+    )
+    assert response.status_code == 200
+    assert quantities(response) == {8: 2, 9: 3}
+
+    response = shopper.patch("/api/cart", json={"items": [{"product_id": 9, "quantity": 0}]})
+    assert quantities(response) == {8: 2}
+
+
+def test_batch_over_stock_changes_nothing(shopper):
+    shopper.patch("/api/cart", json=[{"product_id": 8, "quantity": 4}])
+
+    response = shopper.patch(
+        "/api/cart", json=[{"product_id": 9, "delta": 1}, {"product_id": 8, "delta": 2}]
+    )
+
+    assert response.status_code == 409
+    assert quantities(shopper.patch("/api/cart", json=[])) == {8: 4}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"product_id": 8},
+        [{"product_id": "x", "delta": 1}],
+        [{"product_id": 999999, "delta": 1}],
+        [{"product_id": 8, "delta": 10**6}],
+    ],
+)
+def test_invalid_batches_are_rejected(shopper, body):
+    assert shopper.patch("/api/cart", json=body).status_code == 400
+
+
+def test_guest_batches_update_the_session_cart(app, stocked):
+    client = app.test_client()
+
+    response = client.patch("/api/cart", json=[{"product_id": 8, "delta": 2}])
+    assert quantities(response) == {8: 2}
+
+    response = client.patch("/api/cart", json=[{"product_id": 8, "delta": 4}])
+    assert response.status_code == 409
+    assert quantities(client.patch("/api/cart", json=[])) == {8: 2}
@@ -0,0 +1,137 @@
+import pytest
+
+from website import catalog
+from website.models import db, Category, Product
+
+
+@pytest.fixture
+def products(app_ctx):
+    for product_id in (5, 6, 7):
+        product = db.session.get(Product, product_id)
+        product.stock, product.price = 10, 1.0
+    db.session.commit()
+
+
+def state(*ids):
+    db.session.expire_all()
+    return {i: (db.session.get(Product, i).stock, db.session.get(Product, i).price) for i in ids}
+
+
+def test_apply_updates_sets_adds_and_reprices(products):
+    results = catalog.apply_updates(
+        [
+            {"id": 5, "stock": 3},
+            {"id": 6, "stock_delta": -4, "price": 2.5},
+            {"id": 6, "stock_delta": 1},
+            {"id": 7, "price": "abc"},
+            {"id": 999999, "stock": 1},
+        ]
+    )
+
+    assert [r["status"] for r in results] == ["ok", "ok", "ok", "error", "error"]
+    assert results[2]["stock"] == 7
+    assert state(5, 6, 7) == {5: (3, 1.0), 6: (7, 2.5), 7: (10, 1.0)}
+
+
+def test_delta_below_zero_is_rejected(products):
+    (result,) = catalog.apply_updates([{"id": 5, "stock_delta": -11}])
+
+    assert result["status"] == "error"
+    assert state(5) == {5: (10, 1.0)}
+
+
+def test_conflicting_stock_rolls_back_the_batch(products, monkeypatch):
+    # Another request sold stock after the batch read it
+    real_current = catalog._current
+    monkeypatch.setattr(
+        catalog, "_current", lambda ids: {i: [100, p] for i, (s, p) in real_current(ids).items()}
+    )
+
+    with pytest.raises(catalog.UpdateConflict):
+        catalog.apply_updates([{"id": 5, "price": 9.0}, {"id": 6, "stock_delta": -50}])
+
+    assert state(5, 6) == {5: (10, 1.0), 6: (10, 1.0)}
+
+
+@pytest.mark.parametrize("field, value", [("stock", 2.5), ("stock_delta", -1.5), ("id", 5.5), ("stock", True)])
+def test_updates_reject_non_integral_numbers(products, field, value):
+    (result,) = catalog.apply_updates([{"id": 5, field: value}])
+
+    assert result["status"] == "error"
+    assert state(5) == {5: (10, 1.0)}
+
+
+def test_updates_accept_integral_floats(products):
+    (result,) = catalog.apply_updates([{"id": 5.0, "stock": 4.0}])
+
+    assert result["status"] == "ok"
+    assert state(5) == {5: (4, 1.0)}
+
+
+@pytest.mark.parametrize("field, value", [("stock", 2.5), ("id", 1.5), ("category_id", 2.5)])
+def test_import_rejects_non_integral_numbers(field, value):
+    with pytest.raises(catalog.RowError):
+        catalog.clean({"name": "Pear", "price": 1, field: value})
+
+
+@pytest.fixture
+def imported(app):
+    """Restores product 10 and removes whatever the import added."""
+    yield
+    with app.app_context():
+        product = db.session.get(Product, 10)
+        product.name, product.price, product.category_id = "Product 10", 100.0, None
+        for product in Product.query.filter(Product.name.like("Imported %")):
+            db.session.delete(product)
+        for category in Category.query.filter_by(name="Imported"):
+            db.session.delete(category)
+        db.session.commit()
+
+
+def test_import_command_upserts_by_id(app, imported, tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text(
+        "id,name,price,stock,category\n"
+        "10,Imported Ten,12.5,,Imported\n"
+        ",Imported New,3,4,Imported\n"
+        ",Imported Broken,free,1,\n"
+    )
+
+    result = app.test_cli_runner().invoke(args=["catalog", "import", str(path)])
+
+    assert result.exit_code == 0, result.output
+    assert f"{path}: 1 inserted, 1 updated, 1 skipped" in result.output
+    assert "line 4: invalid price: 'free'" in result.output
+    with app.app_context():
+        ten = db.session.get(Product, 10)
+        new = Product.query.filter_by(name="Imported New").one()
+        assert (ten.name, ten.price, ten.stock) == ("Imported Ten", 12.5, 20)
+        assert (new.price, new.stock) == (3, 4)
+        assert ten.category_id == new.category_id == Category.query.filter_by(name="Imported").one().id
+
+
+def test_import_without_overwrite_keeps_existing_products(app_ctx, imported):
+    totals = catalog.import_rows(
+        [(1, {"id": 10, "name": "Imported Ten", "price": 1}), (2, {"name": "Imported Extra", "price": 2})],
+        overwrite=False,
+    )
+
+    assert totals == {"inserted": 1, "updated": 0, "skipped": 0}
+    db.session.expire_all()
+    assert db.session.get(Product, 10).name == "Product 10"
+
+
+def test_import_reports_bad_lines_across_batches(app_ctx, imported, tmp_path):
+    path = tmp_path / "products.jsonl"
+    path.write_text(
+        "".join(f'{{"name": "Imported {i}", "price": {i}}}\n' for i in range(5)) + "{not json\n"
+    )
+    errors = []
+
+    totals = catalog.import_rows(
+        catalog.read_rows(str(path)), batch_size=2, on_error=lambda line_no, e: errors.append(line_no)
+    )
+
+    assert totals == {"inserted": 5, "updated": 0, "skipped": 1}
+    assert errors == [6]
+    assert Product.query.filter(Product.name.like("Imported %")).count() == 5
@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import event
+
+from website import category_registry
+from website.models import db, Category, Product
+
+
+def registry():
+    return {c.name: c.product_count for c in category_registry.get_all()}
+
+
+@pytest.fixture
+def shelves(app_ctx):
+    """Two categories and a product on the first."""
+    fruit, veg = Category(name="Registry Fruit"), Category(name="Registry Veg")
+    product = Product(name="Registry Apple", price=1, stock=1, category=fruit)
+    db.session.add_all([fruit, veg, product])
+    db.session.commit()
+
+    yield fruit, veg, product
+
+    db.session.rollback()
+    for row in (Product.query.filter_by(name="Registry Apple").first(), fruit, veg):
+        if row is not None and row in db.session:
+            db.session.delete(row)
+    db.session.commit()
+
+
+def test_product_counts_follow_inserts_moves_and_deletes(shelves):
+    fruit, veg, product = shelves
+    assert registry()["Registry Fruit"] == 1
+
+    product.category = veg
+    db.session.commit()
+    assert (registry()["Registry Fruit"], registry()["Registry Veg"]) == (0, 1)
+
+    db.session.delete(product)
+    db.session.commit()
+    assert registry()["Registry Veg"] == 0
+
+
+def test_counts_match_a_full_recount(shelves):
+    counts = {c.id: c.product_count for c in category_registry.get_all() if c.product_count}
+
+    assert category_registry.reconcile() == counts
+
+
+def test_rolled_back_changes_are_not_counted(shelves):
+    fruit, veg, product = shelves
+    product.category = veg
+    db.session.flush()
+    db.session.rollback()
+
+    assert registry()["Registry Fruit"] == 1
+
+
+def test_cached_reads_cost_no_query(shelves):
+    category_registry.get_all()
+    seen = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        category_registry.get_all()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert seen == []
+
+
+def test_admin_category_routes_refresh_the_registry(admin, app):
+    admin.post("/add-category", data={"name": "Registry Herbs"})
+    with app.app_context():
+        assert "Registry Herbs" in registry()
+        category_id = Category.query.filter_by(name="Registry Herbs").one().id
+
+    admin.post(f"/category/edit/{category_id}", data={"name": "Registry Spices"})
+    with app.app_context():
+        assert "Registry Spices" in registry()
+
+    admin.get(f"/category/delete/{category_id}")
+    with app.app_context():
+        assert "Registry Spices" not in registry()
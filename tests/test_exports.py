@@ -0,0 +1,68 @@
+import csv
+import gzip
+import io
+import json
+
+from website import exports
+from website.models import db, Product, User
+
+
+def test_users_csv_never_includes_password_hashes(admin, app):
+    response = admin.get("/admin/export/users.csv")
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers["Content-Disposition"] == "attachment; filename=users.csv"
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ["id", "name", "email", "role"]
+    with app.app_context():
+        assert [int(row[0]) for row in rows[1:]] == [user.id for user in User.query.order_by(User.id)]
+
+
+def test_products_jsonl_has_one_object_per_row(admin, app):
+    lines = admin.get("/admin/export/products.jsonl").get_data(as_text=True).splitlines()
+
+    records = [json.loads(line) for line in lines]
+    with app.app_context():
+        assert [record["id"] for record in records] == [
+            product_id for product_id, in db.session.query(Product.id).order_by(Product.id)
+        ]
+    assert set(records[0]) == {"id", "name", "price", "stock", "category_id", "category", "description", "image"}
+
+
+def test_gzip_wraps_the_same_bytes(admin):
+    plain = admin.get("/admin/export/products.csv").data
+    response = admin.get("/admin/export/products.csv?gzip=1")
+
+    assert response.mimetype == "application/gzip"
+    assert response.headers["Content-Disposition"].endswith("filename=products.csv.gz")
+    assert gzip.decompress(response.data) == plain
+
+
+def test_unknown_exports_and_customers_are_refused(admin, customer):
+    assert admin.get("/admin/export/passwords.csv").status_code == 404
+    assert admin.get("/admin/export/users.xml").status_code == 404
+    assert customer.get("/admin/export/users.csv").status_code == 302
+
+
+def test_chunks_stay_near_the_chunk_size(monkeypatch):
+    monkeypatch.setattr(exports, "CHUNK_SIZE", 100)
+    rows = [(i, "x" * 20) for i in range(50)]
+
+    for encode in (exports.csv_chunks, exports.jsonl_chunks):
+        chunks = list(encode(["id", "text"], rows))
+        assert len(chunks) > 5
+        assert all(len(chunk) < 200 for chunk in chunks)
+
+
+def test_cli_writes_the_dataset(app, tmp_path):
+    out = tmp_path / "orders.jsonl.gz"
+
+    result = app.test_cli_runner().invoke(
+        args=["data", "export", "orders", "--format", "jsonl", "--gzip", "--out", str(out)]
+    )
+
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        expected = b"".join(exports.stream("orders", "jsonl"))
+    assert gzip.decompress(out.read_bytes()) == expected
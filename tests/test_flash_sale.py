@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy import func
+
+from website import catalog, flash_sale
+from website.models import db, Order, OrderItem, Product
+
+
+@pytest.fixture
+def stock(app_ctx):
+    def set_stock(**stock):
+        for product_id, value in stock.items():
+            db.session.get(Product, int(product_id[1:])).stock = value
+        db.session.commit()
+        flash_sale.reconcile()
+
+    return set_stock
+
+
+def test_reservation_is_all_or_nothing(stock):
+    stock(p1=5, p2=1)
+
+    short_id, reservation = flash_sale.reserve({1: 3, 2: 2})
+    assert short_id == 2
+    assert not reservation
+    assert (flash_sale.available(1), flash_sale.available(2)) == (5, 1)
+
+    short_id, reservation = flash_sale.reserve({1: 3, 2: 1, 5: 4})
+    assert short_id is None
+    assert 1 in reservation and 5 not in reservation  # 5 is not on sale
+    assert (flash_sale.available(1), flash_sale.available(2)) == (2, 0)
+
+    flash_sale.release(reservation)
+    assert (flash_sale.available(1), flash_sale.available(2)) == (5, 1)
+
+
+def test_reconcile_keeps_reservations_in_flight(stock):
+    stock(p1=5, p2=5)
+
+    _, reservation = flash_sale.reserve({1: 2})
+    flash_sale.reconcile()
+    assert flash_sale.available(1) == 3
+
+    flash_sale.release(reservation)
+    assert flash_sale.available(1) == 5
+
+
+def test_flush_applies_each_sale_once(stock):
+    stock(p1=5, p2=5)
+
+    _, reservation = flash_sale.reserve({1: 2})
+    order = Order(user_id=2, total_amount=20, status="Pending")
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(OrderItem(order_id=order.id, product_id=1, quantity=2, price=10))
+    db.session.commit()
+    flash_sale.confirm(reservation)
+
+    assert flash_sale.flush() == 1
+    assert flash_sale.flush() == 0
+    assert db.session.get(Product, 1).stock == 3
+    assert flash_sale.available(1) == 3
+
+
+def sell(product_id, quantity, item_id=None):
+    order = Order(user_id=2, total_amount=quantity, status="Pending")
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(
+        OrderItem(id=item_id, order_id=order.id, product_id=product_id, quantity=quantity, price=10)
+    )
+    db.session.commit()
+
+
+def test_item_committed_after_a_higher_id_is_still_applied(stock):
+    stock(p1=10, p2=10)
+    last_id = db.session.query(func.max(OrderItem.id)).scalar()
+
+    # On PostgreSQL a lower id can commit after a higher one was flushed
+    sell(1, 2, item_id=last_id + 100)
+    assert flash_sale.flush() == 1
+    sell(1, 3, item_id=last_id + 50)
+    assert flash_sale.flush() == 1
+
+    assert db.session.get(Product, 1).stock == 5
+
+
+def test_catalog_import_flushes_and_reloads_the_counters(stock):
+    stock(p1=10, p2=10)
+    _, reservation = flash_sale.reserve({2: 4})
+    sell(2, 4)
+    flash_sale.confirm(reservation)
+
+    catalog.import_rows([(1, {"id": 2, "name": "Product 2", "price": 20, "stock": 7})])
+
+    assert flash_sale.available(2) == 7
+    assert flash_sale.flush() == 0  # the sale was written back before the import
+    assert db.session.get(Product, 2).stock == 7
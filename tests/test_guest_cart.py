@@ -0,0 +1,78 @@
+import pytest
+from flask import session
+
+from website import guest_cart
+from website.models import db, Cart, User
+
+
+@pytest.fixture
+def guest(app):
+    with app.test_request_context():
+        yield
+        db.session.rollback()
+
+
+@pytest.fixture
+def shopper(guest):
+    user = User(name="Shopper", email="shopper@example.com", password_hash="x")
+    db.session.add(user)
+    db.session.commit()
+    yield user
+    Cart.query.filter_by(user_id=user.id).delete()
+    db.session.delete(user)
+    db.session.commit()
+
+
+def cart_rows(user):
+    return dict(db.session.query(Cart.product_id, Cart.quantity).filter_by(user_id=user.id))
+
+
+def test_add_and_update_stop_at_the_max_quantity(app, guest):
+    app.config["CART_MAX_QUANTITY"] = 5
+    try:
+        guest_cart.add(1, 4)
+        assert guest_cart.add(1, 4) is True
+        guest_cart.update(1, "increase")
+    finally:
+        app.config["CART_MAX_QUANTITY"] = 99
+
+    assert guest_cart.get_items() == {1: 5}
+
+
+def test_add_refuses_a_line_past_the_max_lines(app, guest):
+    app.config["CART_MAX_LINES"] = 2
+    try:
+        guest_cart.add(1)
+        guest_cart.add(2)
+        with pytest.raises(guest_cart.CartFull):
+            guest_cart.add(3)
+        guest_cart.add(2)  # existing lines can still grow
+    finally:
+        app.config["CART_MAX_LINES"] = 100
+
+    assert guest_cart.get_items() == {1: 1, 2: 2}
+
+
+def test_merge_adds_quantities_and_clears_the_guest_cart(shopper):
+    db.session.add(Cart(user_id=shopper.id, product_id=3, quantity=2))
+    db.session.commit()
+    session[guest_cart.SESSION_KEY] = "3:1,4:2,99999:1"
+
+    guest_cart.merge_into(shopper)
+
+    assert cart_rows(shopper) == {3: 3, 4: 2}
+    assert guest_cart.get_items() == {}
+
+
+def test_merge_clamps_quantities_and_lines(app, shopper):
+    db.session.add(Cart(user_id=shopper.id, product_id=3, quantity=4))
+    db.session.commit()
+    session[guest_cart.SESSION_KEY] = "3:4,4:9,5:1"
+
+    app.config.update(CART_MAX_QUANTITY=5, CART_MAX_LINES=2)
+    try:
+        guest_cart.merge_into(shopper)
+    finally:
+        app.config.update(CART_MAX_QUANTITY=99, CART_MAX_LINES=100)
+
+    assert cart_rows(shopper) == {3: 5, 4: 5}
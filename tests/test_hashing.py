@@ -0,0 +1,76 @@
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from website import hashing
+from website.models import db, User
+from website.workers import BoundedPool, PoolBusy
+
+
+@pytest.fixture
+def member(app_ctx):
+    user = User(
+        name="Hashing",
+        email="hashing@example.com",
+        password_hash=generate_password_hash("s3cret", "pbkdf2:sha256:1000"),
+    )
+    db.session.add(user)
+    db.session.commit()
+    yield user
+    db.session.delete(user)
+    db.session.commit()
+
+
+def test_login_upgrades_an_old_hash(member):
+    assert hashing.needs_rehash(member.password_hash)
+
+    assert member.check_password("s3cret")
+    db.session.commit()
+
+    assert member.password_hash.startswith("scrypt:32768:8:1$")
+    assert not hashing.needs_rehash(member.password_hash)
+    assert member.check_password("s3cret")
+
+
+def test_wrong_password_keeps_the_old_hash(member):
+    old_hash = member.password_hash
+
+    assert not member.check_password("wrong")
+    assert member.password_hash == old_hash
+
+
+def test_default_parameters_are_compared_canonically(app_ctx, app, monkeypatch):
+    # "scrypt" alone means werkzeug's defaults, which it writes out in full
+    monkeypatch.setitem(app.config, "PASSWORD_HASH_METHOD", "scrypt")
+
+    assert not hashing.needs_rehash(generate_password_hash("x", "scrypt:32768:8:1"))
+    assert hashing.needs_rehash(generate_password_hash("x", "scrypt:16384:8:1"))
+
+
+def test_slow_jobs_fail_fast_instead_of_queueing(app_ctx, app, monkeypatch):
+    monkeypatch.setitem(app.config, "SLOWPOOL_WORKERS", 1)
+    monkeypatch.setitem(app.config, "SLOWPOOL_MAX_PENDING", 1)
+    monkeypatch.setitem(app.config, "SLOWPOOL_TIMEOUT", 0.05)
+    pool = BoundedPool("SLOWPOOL")
+
+    with pytest.raises(PoolBusy):
+        pool.run(time.sleep, 0.5)  # times out
+    with pytest.raises(PoolBusy):
+        pool.run(time.sleep, 0)  # the slot is still taken
+
+    time.sleep(1)
+    assert pool.run(abs, -3) == 3
+    pool._executor.shutdown()
+
+
+def test_busy_pool_answers_503(app, monkeypatch):
+    def busy(*args):
+        raise hashing.HashingBusy()
+
+    monkeypatch.setattr(hashing, "verify", busy)
+    client = app.test_client()
+
+    response = client.post("/login", data={"email": "customer@example.com", "password": "whatever"})
+
+    assert response.status_code == 503
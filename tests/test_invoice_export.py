@@ -0,0 +1,69 @@
+import io
+import zipfile
+
+import pytest
+
+from website import invoices
+from website.models import db, Order, OrderItem
+
+
+AMOUNT = 4321.5  # tags this module's orders for the min_amount filter
+
+
+@pytest.fixture
+def orders(app, monkeypatch):
+    monkeypatch.setitem(app.config, "INVOICE_EXPORT_WORKERS", 2)
+    monkeypatch.setitem(app.config, "INVOICE_EXPORT_WINDOW", 2)
+    with app.app_context():
+        orders = []
+        for _ in range(3):
+            order = Order(user_id=2, total_amount=AMOUNT, status="Pending")
+            order.items.append(OrderItem(product_id=3, quantity=1, price=30))
+            orders.append(order)
+        db.session.add_all(orders)
+        db.session.commit()
+        order_ids = [order.id for order in orders]
+
+    yield order_ids
+
+    with app.app_context():
+        for order_id in order_ids:
+            order = db.session.get(Order, order_id)
+            for item in order.items:
+                db.session.delete(item)
+            db.session.delete(order)  # through the ORM so the orders counter follows
+        db.session.commit()
+
+
+def export(admin):
+    response = admin.get(f"/admin/invoices/export?min_amount={AMOUNT}")
+    assert response.status_code == 200
+    return zipfile.ZipFile(io.BytesIO(response.data))
+
+
+def test_export_zips_one_pdf_per_order(admin, orders):
+    archive = export(admin)
+
+    assert archive.namelist() == [f"POS_ORD{order_id}.pdf" for order_id in orders]
+    assert all(archive.read(name).startswith(b"%PDF") for name in archive.namelist())
+
+
+def test_failed_render_becomes_an_error_entry(admin, orders, monkeypatch):
+    pos_invoice_data = invoices.pos_invoice_data
+
+    def broken_middle_order(order):
+        data = pos_invoice_data(order)
+        if order.id == orders[1]:
+            data["store_name"] = None  # the renderer calls .upper() on it
+        return data
+
+    monkeypatch.setattr(invoices, "pos_invoice_data", broken_middle_order)
+
+    archive = export(admin)
+
+    assert archive.namelist() == [
+        f"POS_ORD{orders[0]}.pdf",
+        f"POS_ORD{orders[1]}.error.txt",
+        f"POS_ORD{orders[2]}.pdf",
+    ]
+    assert b"AttributeError" in archive.read(f"POS_ORD{orders[1]}.error.txt")
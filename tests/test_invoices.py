@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from website import invoices
+from website.models import db, Order, OrderItem
+
+
+@pytest.fixture
+def order(app, monkeypatch):
+    monkeypatch.setitem(app.config, "INVOICE_RENDER_WORKERS", 0)
+    with app.app_context():
+        order = Order(user_id=2, total_amount=30, status="Pending")
+        order.items.append(OrderItem(product_id=3, quantity=1, price=30))
+        db.session.add(order)
+        db.session.commit()
+        return order.id
+
+
+def cached_files(app, order_id):
+    return [
+        name
+        for name in os.listdir(app.config["INVOICE_CACHE_DIR"])
+        if name.startswith(f"ORD{order_id}-")
+    ]
+
+
+def test_pos_invoice_is_rendered_once_and_revalidated(app, customer, order):
+    first = customer.get(f"/invoice/pos/ORD{order}")
+    assert first.status_code == 200
+    assert first.data.startswith(b"%PDF")
+    assert len(cached_files(app, order)) == 1
+
+    again = customer.get(f"/invoice/pos/ORD{order}", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_order_change_drops_the_cached_pdf(app, customer, order):
+    etag = customer.get(f"/invoice/pos/ORD{order}").headers["ETag"]
+
+    with app.app_context():
+        db.session.get(Order, order).status = "approved"
+        db.session.commit()
+    assert cached_files(app, order) == []
+
+    response = customer.get(f"/invoice/pos/ORD{order}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_other_customers_orders_are_not_served(admin, order):
+    assert admin.get(f"/invoice/pos/ORD{order}").status_code == 404
+
+
+def test_digest_covers_the_template_version(order, app_ctx, monkeypatch):
+    data = invoices.pos_invoice_data(db.session.get(Order, order))
+    monkeypatch.setattr(invoices, "TEMPLATE_VERSION", invoices.TEMPLATE_VERSION + 1)
+
+    assert invoices.digest(data) != invoices.digest(invoices.pos_invoice_data(db.session.get(Order, order)))
+
+
+def test_layout_is_built_once_per_process():
+    assert invoices._get_layout() is invoices._get_layout()
+
+
+def test_busy_render_pool_answers_503(customer, order, monkeypatch):
+    def busy(*args):
+        raise invoices.RenderBusy()
+
+    monkeypatch.setattr(invoices._render_pool, "run", busy)
+
+    assert customer.get(f"/invoice/pos/ORD{order}").status_code == 503
+
+
+def test_reportlab_is_imported_on_first_render(tmp_path):
+    config = {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/app.db",
+        "FLASH_SALE_COUNTER_DB": str(tmp_path / "counters.db"),
+        "SLOW_QUERY_LOG": str(tmp_path / "slow_queries.jsonl"),
+    }
+    script = (
+        "import sys\n"
+        "from website import create_app\n"
+        f"create_app({config!r})\n"
+        "assert not any(name.startswith('reportlab') for name in sys.modules)\n"
+    )
+
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
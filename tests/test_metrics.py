@@ -0,0 +1,85 @@
+import json
+import os
+
+from sqlalchemy import event
+
+from website import metrics
+from website.models import db
+
+
+HOME = (("endpoint", "views.home"),)
+
+
+def test_only_admins_or_the_token_may_scrape(app, admin, customer, monkeypatch):
+    assert customer.get("/metrics").status_code == 403
+    assert admin.get("/metrics").status_code == 200
+
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "s3cret")
+    assert admin.get("/metrics").status_code == 403
+    assert app.test_client().get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 403
+    assert app.test_client().get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_requests_record_latency_queries_and_templates(app):
+    client = app.test_client()
+    client.get("/")  # warm the caches so the counted request is typical
+    before = metrics.collect()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        assert client.get("/").status_code == 200
+    finally:
+        with app.app_context():
+            event.remove(db.engine, "before_cursor_execute", capture)
+    after = metrics.collect()
+
+    def counted(key):
+        return after["counters"][key] - before["counters"].get(key, 0)
+
+    requests = ("greenmart_http_requests_total", (*HOME, ("method", "GET"), ("status", "200")))
+    assert counted(requests) == 1
+    assert counted(("greenmart_template_renders_total", (("template", "home.html"),))) == 1
+
+    key = ("greenmart_sql_queries_per_request", HOME)
+    old, new = before["histograms"][key], after["histograms"][key]
+    assert (new[-2] - old[-2], new[-1] - old[-1]) == (len(statements), 1)  # sum, count
+
+
+def test_histograms_render_cumulative_buckets():
+    snapshot = {
+        "counters": {},
+        "histograms": {
+            ("greenmart_sql_queries_per_request", HOME): [1, 1, 2, 2, 2, 2, 2, 3, 130, 4],
+        },
+    }
+
+    text = metrics.render(snapshot)
+
+    assert 'greenmart_sql_queries_per_request_bucket{endpoint="views.home",le="1"} 1' in text
+    assert 'greenmart_sql_queries_per_request_bucket{endpoint="views.home",le="+Inf"} 4' in text
+    assert 'greenmart_sql_queries_per_request_sum{endpoint="views.home"} 130' in text
+    assert 'greenmart_sql_queries_per_request_count{endpoint="views.home"} 4' in text
+
+
+def test_other_workers_snapshots_are_added(app):
+    other = ("greenmart_template_renders_total", (("template", "elsewhere.html"),))
+    snapshot = metrics._encode({"counters": {other: 7}, "histograms": {}})
+    directory = app.config["METRICS_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    running = os.path.join(directory, f"{os.getppid()}.json")
+    exited = os.path.join(directory, "999999999.json")
+    for path in (running, exited):
+        with open(path, "w") as f:
+            json.dump(snapshot, f)
+
+    with app.app_context():
+        combined = metrics.collect_all()
+
+    assert combined["counters"][other] == 7
+    assert not os.path.exists(exited)
+    os.remove(running)
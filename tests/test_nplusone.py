@@ -0,0 +1,54 @@
+from website import nplusone
+from website.models import db, Cart, Order, OrderItem, Product
+
+
+def test_fingerprint_folds_literals_and_in_lists():
+    a = nplusone.fingerprint("SELECT * FROM product WHERE id = 1 AND name = 'a'")
+    b = nplusone.fingerprint("SELECT  *  FROM product WHERE id = 22 AND name = 'b''c'")
+    assert a == b
+
+    assert nplusone.fingerprint("SELECT * FROM product WHERE id IN (?, ?)") == (
+        nplusone.fingerprint("SELECT * FROM product WHERE id IN (?, ?, ?, ?)")
+    )
+
+
+def test_repeated_statement_is_detected(app):
+    threshold = app.config["NPLUSONE_THRESHOLD"]
+
+    with app.test_request_context("/"):
+        app.preprocess_request()
+        for product_id in range(1, threshold + 3):
+            Product.query.filter_by(id=product_id).first()
+
+        (count, _, shape), = nplusone.detected()
+        assert count == threshold + 2
+        assert shape.startswith("SELECT product.id")
+
+
+def test_checkout_loads_cart_products_in_one_query(app, customer):
+    with app.app_context():
+        Cart.query.filter_by(user_id=2).delete()
+        db.session.add_all(
+            [Cart(user_id=2, product_id=pid, quantity=1) for pid in range(3, 10)]
+        )
+        db.session.commit()
+
+    assert customer.get("/checkout").status_code == 200
+
+
+def test_order_pages_eager_load_items(app, customer, admin):
+    with app.app_context():
+        order = Order(user_id=2, total_amount=1, status="Pending")
+        db.session.add(order)
+        db.session.flush()
+        db.session.add_all(
+            [
+                OrderItem(order_id=order.id, product_id=pid, quantity=1, price=1)
+                for pid in range(3, 10)
+            ]
+        )
+        db.session.commit()
+        order_id = order.id
+
+    assert customer.get("/orders").status_code == 200
+    assert admin.get(f"/admin/orders/view/{order_id}").status_code == 200
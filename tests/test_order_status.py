@@ -0,0 +1,37 @@
+import pytest
+
+from website import order_status
+from website.models import db, Order
+
+
+def make_orders(*statuses):
+    orders = [Order(user_id=2, total_amount=1, status=status) for status in statuses]
+    db.session.add_all(orders)
+    db.session.commit()
+    return [order.id for order in orders]
+
+
+def statuses(ids):
+    db.session.expire_all()
+    return [db.session.get(Order, i).status for i in ids]
+
+
+def test_bulk_transition_moves_only_allowed_orders(app_ctx):
+    ids = make_orders("Pending", "pending", "approved", "delivered")
+
+    moved = order_status.bulk_transition("approved", Order.id.in_(ids))
+
+    assert sorted(moved) == ids[:2]
+    assert statuses(ids) == ["approved", "approved", "approved", "delivered"]
+
+
+def test_final_states_do_not_move(app_ctx):
+    ids = make_orders("delivered", "cancelled")
+
+    assert order_status.bulk_transition("cancelled", Order.id.in_(ids)) == []
+    assert statuses(ids) == ["delivered", "cancelled"]
+
+
+def test_unknown_status_is_rejected(app_ctx):
+    with pytest.raises(ValueError):
+        order_status.bulk_transition("shipped")
@@ -0,0 +1,63 @@
+from website import ratelimit
+
+
+def make_clock(monkeypatch, start=1000.0):
+    now = [start]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_capacity_then_refills(monkeypatch):
+    now = make_clock(monkeypatch)
+    buckets = ratelimit.TokenBuckets()
+
+    assert [buckets.allow("k", 3, 60) for _ in range(4)] == [True, True, True, False]
+
+    now[0] += 20  # a third of the period refills one token
+    assert buckets.allow("k", 3, 60)
+    assert not buckets.allow("k", 3, 60)
+
+
+def test_buckets_are_per_key(monkeypatch):
+    make_clock(monkeypatch)
+    buckets = ratelimit.TokenBuckets()
+
+    assert buckets.allow("a", 1, 60)
+    assert not buckets.allow("a", 1, 60)
+    assert buckets.allow("b", 1, 60)
+
+
+def test_lru_bounds_the_number_of_keys(monkeypatch):
+    make_clock(monkeypatch)
+    buckets = ratelimit.TokenBuckets(max_keys=2)
+
+    for key in ("a", "b", "c"):
+        buckets.allow(key, 1, 60)
+
+    # "a" was evicted, so it starts again with a full bucket
+    assert list(buckets._buckets) == ["b", "c"]
+    assert buckets.allow("a", 1, 60)
+
+
+def test_signup_on_home_page_uses_signup_budget(app):
+    ratelimit.buckets.clear()
+    client = app.test_client()
+    capacity = app.config["RATE_LIMITS"]["signup"]["per_ip"][0]
+
+    codes = [
+        client.post(
+            "/",
+            data={
+                "name": "x",
+                "email": f"new{i}@example.com",
+                "password": "secret1",
+                "confirm_password": "different",
+                "submit": "Sign Up",
+            },
+        ).status_code
+        for i in range(capacity + 1)
+    ]
+
+    assert codes[-1] == 429
+    assert 429 not in codes[:-1]
+    ratelimit.buckets.clear()
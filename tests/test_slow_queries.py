@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from sqlalchemy import select
+
+from website import query_timing, slow_queries
+from website.models import db, Product
+
+
+@pytest.fixture
+def slow_log(app, tmp_path, monkeypatch):
+    """Log every statement (threshold ~0 ms) to a temporary file."""
+    path = tmp_path / "slow.jsonl"
+    monkeypatch.setattr(query_timing, "_observers", list(query_timing._observers))
+    monkeypatch.setitem(app.config, "SLOW_QUERY_MS", 1e-9)
+    monkeypatch.setitem(app.config, "SLOW_QUERY_LOG", str(path))
+    slow_queries.init_app(app)
+
+    def entries():
+        return [json.loads(line) for line in path.read_text().splitlines()]
+
+    yield entries
+    for handler in list(slow_queries.logger.handlers):
+        slow_queries.logger.removeHandler(handler)
+        handler.close()
+
+
+def test_slow_statement_is_logged_with_shapes_and_plan(app, slow_log):
+    with app.app_context():
+        db.session.execute(select(Product.name).where(Product.name == "secret value")).all()
+
+    entry, = [e for e in slow_log() if "FROM product" in e["sql"]]
+    assert "secret value" not in json.dumps(entry)
+    assert entry["params"] == ["str(12)"]
+    assert entry["plan"]
+
+
+def test_request_endpoint_is_recorded(admin, slow_log):
+    admin.get("/dashboard")
+
+    assert "admin.dashboard" in {e["endpoint"] for e in slow_log()}
+
+
+def test_streamed_statement_is_not_explained(app, slow_log):
+    with app.app_context():
+        db.session.execute(
+            select(Product.id), execution_options={"stream_results": True}
+        ).all()
+
+    entry, = [e for e in slow_log() if "FROM product" in e["sql"]]
+    assert entry["plan"] is None
+
+
+def test_summary_groups_by_fingerprint(app, slow_log):
+    with app.app_context():
+        for product_id in (1, 2, 3):
+            db.session.get(Product, product_id)
+            db.session.expunge_all()
+
+        group, = [g for g in slow_queries.summarize() if "FROM product" in g["sql"]]
+
+    assert group["count"] == 3
+    assert group["avg_ms"] == pytest.approx(group["total_ms"] / 3)
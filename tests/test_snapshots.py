@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+
+from website import snapshots
+from website.models import db, Order, OrderItem
+
+
+@pytest.fixture
+def orders(app_ctx):
+    orders = [
+        Order(user_id=2, total_amount=60, status="Snapshot"),
+        Order(user_id=2, total_amount=40, status="Pending"),
+    ]
+    orders[0].items.extend(
+        [OrderItem(product_id=3, quantity=2, price=15), OrderItem(product_id=4, quantity=1, price=30)]
+    )
+    orders[1].items.append(OrderItem(product_id=4, quantity=1, price=40))
+    db.session.add_all(orders)
+    db.session.commit()
+
+    yield orders
+
+    for order in orders:
+        for item in order.items:
+            db.session.delete(item)
+        db.session.delete(order)  # through the ORM so the orders counter follows
+    db.session.commit()
+
+
+def test_export_matches_the_database(orders, tmp_path):
+    items = OrderItem.query.join(Order).order_by(OrderItem.id).all()
+
+    assert snapshots.export(str(tmp_path / "snap")) == len(items)
+    snap = snapshots.Snapshot(str(tmp_path / "snap"))
+
+    assert len(snap) == len(items)
+    assert isinstance(snap["quantity"], np.memmap)
+    assert snap["item_id"].tolist() == [item.id for item in items]
+    assert snap.product_names(snap["product"]) == [item.product.name for item in items]
+    revenue = (snap["quantity"] * snap["price"]).sum()
+    assert revenue == pytest.approx(sum(item.quantity * item.price for item in items))
+
+
+def test_status_and_date_masks(orders, tmp_path):
+    snapshots.export(str(tmp_path / "snap"))
+    snap = snapshots.Snapshot(str(tmp_path / "snap"))
+
+    mask = snap.status_is("Snapshot")
+    assert sorted(snap["item_id"][mask].tolist()) == sorted(item.id for item in orders[0].items)
+    assert not snap.status_is("No such status").any()
+
+    created = orders[0].created_at
+    day = np.datetime64(created, "D")
+    assert snap.between(day, day + 1)[mask].all()
+    assert not snap.between(day + 1, day + 2).any()
+
+
+def test_latest_picks_the_newest_snapshot(orders, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        snapshots.Snapshot.latest(str(tmp_path))
+
+    snapshots.export(str(tmp_path / "2026-01-01"))
+    snapshots.export(str(tmp_path / "2026-01-02"))
+
+    assert snapshots.Snapshot.latest(str(tmp_path)).path == str(tmp_path / "2026-01-02")
+
+
+def test_export_command_keeps_the_newest(app, orders, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "SNAPSHOT_DIR", str(tmp_path))
+    for name in ("2020-01-01", "2020-01-02", "2020-01-03"):
+        os.makedirs(tmp_path / name)
+
+    result = app.test_cli_runner().invoke(args=["snapshots", "export", "--keep", "2"])
+
+    assert result.exit_code == 0, result.output
+    assert sorted(os.listdir(tmp_path))[0] == "2020-01-03"
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import event
+
+from website import store_settings, store_stats
+from website.models import db, Setting
+
+
+@pytest.fixture
+def settings(app):
+    yield
+    with app.app_context():
+        store_settings.save(store_settings.DEFAULTS)
+
+
+def statements(fn):
+    seen = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    return seen
+
+
+def test_admin_form_saves_the_settings(admin, app, settings):
+    response = admin.post(
+        "/admin/settings",
+        data={"store_name": " Test Mart ", "contact_email": "help@test.example", "gst_rate": "12.5"},
+    )
+    assert response.status_code == 302
+
+    page = app.test_client().get("/").text
+    assert "Welcome to Our Test Mart." in page
+    assert "help@test.example" in page
+    with app.app_context():
+        assert store_settings.gst_rate() == 0.125
+
+
+def test_cached_reads_cost_no_query(app_ctx):
+    store_settings.get_all()
+
+    assert statements(lambda: [store_settings.get("store_name") for _ in range(10)]) == []
+
+
+def test_change_in_another_worker_is_seen_after_the_interval(app, app_ctx, settings):
+    assert store_settings.get("store_name") == "Green Mart"
+
+    # Another worker saves: the row and the shared version change, but
+    # this process's cache is not invalidated
+    db.session.merge(Setting(key="store_name", value="Elsewhere"))
+    store_stats.add(store_settings.VERSION_KEY, 1)
+    db.session.commit()
+    assert store_settings.get("store_name") == "Green Mart"
+
+    app.config["SETTINGS_CHECK_INTERVAL"] = 0
+    try:
+        assert store_settings.get("store_name") == "Elsewhere"
+    finally:
+        app.config["SETTINGS_CHECK_INTERVAL"] = 5
@@ -0,0 +1,50 @@
+from website import store_stats
+from website.models import db, Order, Product, StoreStat, User
+
+
+def test_counters_follow_inserts_and_deletes(app_ctx):
+    before = store_stats.get("orders")
+
+    orders = [Order(user_id=2, total_amount=1) for _ in range(20)]
+    db.session.add_all(orders)
+    db.session.commit()
+    assert store_stats.get("orders") == before + 20
+
+    for order in orders:
+        db.session.delete(order)
+    db.session.commit()
+    assert store_stats.get("orders") == before
+
+
+def test_get_many_returns_only_the_named_counters(app_ctx):
+    db.session.add(StoreStat(name="unrelated", value=5))
+    db.session.commit()
+
+    stats = store_stats.get_many(["users", "missing"])
+
+    assert stats == {"users": User.query.count(), "missing": 0}
+
+
+def test_reconcile_folds_the_shards_into_one_row(app_ctx):
+    db.session.add_all([Order(user_id=2, total_amount=1) for _ in range(20)])
+    db.session.commit()
+
+    counts = store_stats.reconcile()
+
+    assert counts == {
+        "users": User.query.count(),
+        "products": Product.query.count(),
+        "orders": Order.query.count(),
+    }
+    assert StoreStat.query.filter(StoreStat.name.like("orders:%")).count() == 0
+    assert store_stats.get("orders") == counts["orders"]
+
+
+def test_dashboard_shows_the_counters(admin, app):
+    with app.app_context():
+        orders = store_stats.get("orders")
+
+    response = admin.get("/dashboard")
+
+    assert response.status_code == 200
+    assert str(orders) in response.get_data(as_text=True)
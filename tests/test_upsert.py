@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from website import upsert
+from website.models import db, Cart, User, Wishlist
+
+
+DIALECTS = {
+    "mysql": mysql.dialect(),
+    "postgresql": postgresql.dialect(),
+    "sqlite": sqlite.dialect(),
+}
+
+
+def compiled(name, build):
+    dialect = DIALECTS[name]
+    return str(build(SimpleNamespace(dialect=dialect)).compile(dialect=dialect))
+
+
+@pytest.mark.parametrize(
+    "name, clause",
+    [
+        ("mysql", "ON DUPLICATE KEY UPDATE quantity = (cart.quantity + VALUES(quantity))"),
+        ("postgresql", "ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = (cart.quantity + excluded.quantity)"),
+        ("sqlite", "ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = (cart.quantity + excluded.quantity)"),
+    ],
+)
+def test_conflict_add_compiles_for_each_dialect(name, clause):
+    def build(bind):
+        stmt = upsert._insert(Cart.__table__, bind).values(user_id=1, product_id=1, quantity=1)
+        return upsert._on_conflict_add(stmt, ["user_id", "product_id"], "quantity")
+
+    assert clause in " ".join(compiled(name, build).split())
+
+
+@pytest.mark.parametrize("name", DIALECTS)
+def test_capped_add_compiles_for_each_dialect(name):
+    def build(bind):
+        stmt = upsert._insert(Cart.__table__, bind).values(user_id=1, product_id=1, quantity=1)
+        return upsert._on_conflict_add(stmt, ["user_id", "product_id"], "quantity", cap=99)
+
+    assert "CASE WHEN" in compiled(name, build)
+
+
+@pytest.mark.parametrize(
+    "name, clause", [("mysql", "INSERT IGNORE"), ("postgresql", "ON CONFLICT DO NOTHING"), ("sqlite", "ON CONFLICT DO NOTHING")]
+)
+def test_insert_ignore_compiles_for_each_dialect(name, clause):
+    sql = compiled(name, lambda bind: upsert.insert_ignore(Wishlist.__table__, {"user_id": 1, "product_id": 1}, bind))
+
+    assert clause in sql
+
+
+def test_add_to_cart_reports_new_rows(app_ctx):
+    user = User(name="Upsert", email="upsert@example.com", password_hash="x")
+    db.session.add(user)
+    db.session.commit()
+
+    assert upsert.add_to_cart(user.id, 3) is True
+    assert upsert.add_to_cart(user.id, 3) is False
+    assert upsert.add_to_wishlist(user.id, 3) is True
+    assert upsert.add_to_wishlist(user.id, 3) is False
+    db.session.commit()
+    assert Cart.query.filter_by(user_id=user.id, product_id=3).one().quantity == 2
+
+    Cart.query.filter_by(user_id=user.id).delete()
+    Wishlist.query.filter_by(user_id=user.id).delete()
+    db.session.delete(user)
+    db.session.commit()
+
+
+def test_unsupported_database_fails_at_startup(app, monkeypatch):
+    monkeypatch.setattr(upsert, "db", SimpleNamespace(engine=SimpleNamespace(dialect=SimpleNamespace(name="mssql"))))
+
+    with pytest.raises(RuntimeError, match="mssql"):
+        upsert.init_app(app)
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import event
+
+from website import user_cache
+from website.models import db, User
+
+
+@pytest.fixture
+def member(app_ctx):
+    user = User(name="Member", email="member@example.com", password_hash="x")
+    db.session.add(user)
+    db.session.commit()
+    yield user.id
+    user_cache.invalidate(user.id)
+    db.session.rollback()
+    db.session.delete(db.session.get(User, user.id))
+    db.session.commit()
+
+
+def load_role(user_id):
+    role = user_cache.load(user_id).role
+    db.session.expunge_all()
+    return role
+
+
+def users_queries(fn):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    return statements
+
+
+def test_cache_hit_skips_the_users_query(member):
+    load_role(member)
+
+    assert users_queries(lambda: load_role(member)) == []
+
+
+def test_change_committed_by_another_worker_is_seen(member, monkeypatch):
+    assert load_role(member) == "customer"
+
+    # Another worker's commit cannot clear this process's entry
+    monkeypatch.setattr(user_cache, "invalidate", lambda user_id: None)
+    db.session.get(User, member).role = "admin"
+    db.session.commit()
+    db.session.expunge_all()
+
+    assert load_role(member) == "admin"
+
+
+def test_bulk_update_is_seen(member):
+    assert load_role(member) == "customer"
+
+    User.query.filter_by(id=member).update({"role": "admin"})
+    db.session.commit()
+
+    assert load_role(member) == "admin"
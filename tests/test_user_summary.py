@@ -0,0 +1,93 @@
+import pytest
+
+from website import guest_cart, user_summary
+from website.models import db, Cart, Product
+
+
+@pytest.fixture
+def request_ctx(app):
+    with app.test_request_context():
+        yield
+        db.session.rollback()
+
+
+@pytest.fixture
+def price(app_ctx):
+    """Set product 6's price for one test and restore it afterwards."""
+    product = db.session.get(Product, 6)
+    original = product.price
+
+    def set_price(value):
+        db.session.get(Product, 6).price = value
+        db.session.commit()
+
+    yield set_price
+    set_price(original)
+
+
+def test_guest_subtotal_uses_database_prices(app_ctx):
+    price = db.session.get(Product, 4).price
+    assert price != 200  # the all_products price
+
+    assert user_summary.for_guest({4: 2}) == (2, 2 * price, frozenset())
+
+
+def test_price_change_reprices_guest_carts(price):
+    user_summary.for_guest({6: 1})
+
+    price(7.5)
+
+    assert user_summary.for_guest({6: 2}).subtotal == 15.0
+
+
+def test_price_change_in_another_worker_is_seen(app, price, monkeypatch):
+    user_summary.for_guest({6: 1})
+    # The other worker's commit only bumps the shared version
+    monkeypatch.setattr(user_summary, "clear", lambda: None)
+    price(3.0)
+
+    app.config["PRICES_CHECK_INTERVAL"] = 0
+    try:
+        assert user_summary.for_guest({6: 1}).subtotal == 3.0
+    finally:
+        app.config["PRICES_CHECK_INTERVAL"] = 5
+
+
+def test_user_summary_follows_cart_changes(request_ctx):
+    price_3 = db.session.get(Product, 3).price
+    price_5 = db.session.get(Product, 5).price
+
+    Cart.query.filter_by(user_id=2).delete()
+    db.session.add(Cart(user_id=2, product_id=3, quantity=2))
+    db.session.commit()
+    user_summary.invalidate(2)
+    assert user_summary.get(2)[:2] == (2, 2 * price_3)
+
+    db.session.add(Cart(user_id=2, product_id=5, quantity=1))
+    db.session.commit()
+    user_summary.invalidate(2)
+    assert user_summary.get(2)[:2] == (3, 2 * price_3 + price_5)
+
+    Cart.query.filter_by(user_id=2).delete()
+    db.session.commit()
+    user_summary.invalidate(2)
+
+
+def test_cart_api_prices_lines_from_the_database(customer):
+    response = customer.patch("/api/cart", json=[{"product_id": 4, "quantity": 2}])
+
+    line, = [item for item in response.get_json()["items"] if item["product_id"] == 4]
+    with customer.application.app_context():
+        assert line["subtotal"] == 2 * db.session.get(Product, 4).price
+
+    customer.patch("/api/cart", json=[{"product_id": 4, "quantity": 0}])
+
+
+def test_badge_subtotal_has_two_decimals(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session[guest_cart.SESSION_KEY] = "3:1"
+
+    with app.app_context():
+        price = db.session.get(Product, 3).price
+    assert f"${price:.2f}".encode() in client.get("/cart").data
@@ -1,10 +1,11 @@
 from flask import Flask
-from .models import db, User
+from .models import db
+from . import user_cache, hashing, upsert
 from flask_login import LoginManager
 from flask_migrate import Migrate
 import os
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
 
     app.config["SECRET_KEY"] = "1234"
@@ -16,6 +17,95 @@ def create_app():
     )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    app.config["INVOICE_CACHE_DIR"] = os.path.join(
+        BASE_DIR, "..", "instance", "invoices"
+    )
+    app.config["INVOICE_EXPORT_WORKERS"] = os.cpu_count()
+    app.config["INVOICE_EXPORT_WINDOW"] = 32  # PDFs rendering at once
+    app.config["INVOICE_RENDER_WORKERS"] = 2
+    app.config["INVOICE_RENDER_MAX_PENDING"] = 16
+    app.config["INVOICE_RENDER_TIMEOUT"] = 30  # seconds
+
+    # Reports flag products expected to sell out within the horizon, using
+    # an exponentially weighted average of daily units sold over the span.
+    # The averages are stored; run `flask analytics rebuild` after changing it.
+    app.config["STOCKOUT_HORIZON_DAYS"] = 14
+    app.config["STOCKOUT_EWMA_SPAN_DAYS"] = 14
+
+    # Nightly columnar order-item exports (flask snapshots export)
+    app.config["SNAPSHOT_DIR"] = os.path.join(
+        BASE_DIR, "..", "instance", "snapshots"
+    )
+
+    # Opt-in flash-sale mode: comma separated product ids whose stock is
+    # served from counters shared by all workers and written back in batches.
+    app.config["FLASH_SALE_PRODUCT_IDS"] = [
+        int(pid)
+        for pid in os.environ.get("FLASH_SALE_PRODUCT_IDS", "").split(",")
+        if pid.strip()
+    ]
+    app.config["FLASH_SALE_FLUSH_BATCH"] = 50
+    app.config["FLASH_SALE_FLUSH_INTERVAL"] = 5  # seconds
+    app.config["FLASH_SALE_COUNTER_DB"] = os.path.join(
+        BASE_DIR, "..", "instance", "flash_sale_counters.db"
+    )
+
+    # Password hashing runs in a bounded process pool (0 workers = inline).
+    # Changing the method upgrades each user's hash on their next login.
+    app.config["PASSWORD_HASH_METHOD"] = "scrypt:32768:8:1"
+    app.config["PASSWORD_HASH_WORKERS"] = 2
+    app.config["PASSWORD_HASH_MAX_PENDING"] = 32
+    app.config["PASSWORD_HASH_TIMEOUT"] = 10  # seconds
+
+    # How often each process checks whether store settings changed
+    app.config["SETTINGS_CHECK_INTERVAL"] = 5  # seconds
+    app.config["CATEGORIES_CHECK_INTERVAL"] = 5  # seconds
+    app.config["PRICES_CHECK_INTERVAL"] = 5  # seconds
+
+    # Prometheus /metrics; workers share snapshots through METRICS_DIR.
+    # Set METRICS_TOKEN to let scrapers in with "Authorization: Bearer
+    # <token>"; without it only logged-in admins can read /metrics.
+    app.config["METRICS_DIR"] = os.environ.get(
+        "METRICS_DIR", os.path.join(BASE_DIR, "..", "instance", "metrics")
+    )
+    app.config["METRICS_FLUSH_INTERVAL"] = 5  # seconds
+    app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+
+    # N+1 query detection for development and tests: NPLUSONE=warn logs
+    # statements repeated more than the threshold within one request,
+    # NPLUSONE=strict fails the request instead.
+    nplusone = os.environ.get("NPLUSONE", "warn" if os.environ.get("FLASK_DEBUG") else "")
+    app.config["NPLUSONE_ENABLED"] = nplusone in ("warn", "strict")
+    app.config["NPLUSONE_STRICT"] = nplusone == "strict"
+    app.config["NPLUSONE_THRESHOLD"] = 5
+
+    # Statements slower than SLOW_QUERY_MS (0 disables) go to a rotating
+    # JSONL log with their plan, summarised at /admin/slow-queries.
+    app.config["SLOW_QUERY_MS"] = float(os.environ.get("SLOW_QUERY_MS", 200))
+    app.config["SLOW_QUERY_EXPLAIN"] = True
+    app.config["SLOW_QUERY_LOG"] = os.path.join(
+        BASE_DIR, "..", "instance", "slow_queries.jsonl"
+    )
+    app.config["SLOW_QUERY_LOG_MAX_BYTES"] = 5 * 1024 * 1024
+    app.config["SLOW_QUERY_LOG_BACKUPS"] = 3
+
+    # Most of one product a cart may hold, and the most lines a guest cart
+    # (kept in the session cookie) may have.
+    app.config["CART_MAX_QUANTITY"] = 99
+    app.config["CART_MAX_LINES"] = 100
+
+    # Token-bucket budgets per scope as (requests, seconds)
+    app.config["RATE_LIMITS"] = {
+        "login": {"per_ip": (10, 60), "per_account": (5, 300)},
+        "signup": {"per_ip": (5, 3600)},
+        "reset_password": {"per_ip": (5, 3600), "per_account": (3, 3600)},
+        "search": {"per_ip": (30, 10)},
+    }
+
+    # Tests point the database and instance files somewhere disposable
+    if test_config:
+        app.config.update(test_config)
+
     # -------------------------
     # INIT DATABASE
     # -------------------------
@@ -31,7 +121,31 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.load(int(user_id))
+
+    # -------------------------
+    # SERVICES
+    # -------------------------
+    from . import (
+        analytics,
+        catalog,
+        exports,
+        invoices,
+        metrics,
+        nplusone,
+        slow_queries,
+        snapshots,
+        store_settings,
+        store_stats,
+    )
+
+    upsert.init_app(app)
+    hashing.init_app(app)
+    metrics.init_app(app)
+    nplusone.init_app(app)
+    slow_queries.init_app(app)
+    invoices.init_app(app)
+    store_settings.init_app(app)
 
     # -------------------------
     # REGISTER BLUEPRINTS
@@ -44,6 +158,16 @@ def create_app():
     app.register_blueprint(auth)
     app.register_blueprint(admin)
 
+    # -------------------------
+    # CLI COMMANDS
+    # -------------------------
+    app.cli.add_command(invoices.cli)
+    app.cli.add_command(store_stats.cli)
+    app.cli.add_command(analytics.cli)
+    app.cli.add_command(snapshots.cli)
+    app.cli.add_command(exports.cli)
+    app.cli.add_command(catalog.cli)
+
     # -------------------------
     # CREATE DATABASE TABLES
     # -------------------------
@@ -51,4 +175,19 @@ def create_app():
         os.makedirs("instance", exist_ok=True)
         db.create_all()
 
+        # create_all skips existing tables, so add indexes declared later
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+
+    # -------------------------
+    # RECONCILE COUNTERS
+    # -------------------------
+    from . import category_registry, flash_sale
+
+    flash_sale.init_app(app)
+    store_stats.init_app(app)
+    category_registry.init_app(app)
+    analytics.init_app(app)
+
     return app
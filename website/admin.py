@@ -1,4 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Response, stream_with_context, current_app, abort, jsonify
+from datetime import date, timedelta
 from functools import wraps
 from werkzeug.utils import secure_filename
 import os
@@ -6,9 +8,24 @@ from .forms import CategoryForm
 from .models import Category, Product
 from flask_login import login_user, logout_user, login_required, current_user
 from .forms import SettingsForm
-from .models import db, User, Product, Order
+from .models import db, User, Product, Order, OrderItem
 from .forms import ShopItemsForm, LoginForm, SignupForm
 from .models import Category
+from . import guest_cart
+from .ratelimit import rate_limit
+from . import (
+    analytics,
+    catalog,
+    exports,
+    flash_sale,
+    invoices,
+    order_status,
+    slow_queries,
+    store_settings,
+    store_stats,
+)
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
 
 admin = Blueprint("admin", __name__)
 
@@ -28,6 +45,7 @@ def admin_required(f):
 
 # ---------------- Admin Login ----------------
 @admin.route("/login", methods=["GET", "POST"])
+@rate_limit("login", account_field="email")
 def login():
     if request.method == "POST":
         email = request.form.get("email")
@@ -37,6 +55,8 @@ def login():
 
         if user and user.check_password(password):
             login_user(user)
+            db.session.commit()  # persist a rehashed password, if any
+            guest_cart.merge_into(user)
 
             if user.role == "admin":
                 return redirect(url_for("admin.dashboard"))
@@ -64,19 +84,16 @@ def logout():
 @admin.route("/dashboard")
 @admin_required
 def dashboard():
-    users = User.query.count()
-    products = Product.query.count()
-    orders = Order.query.count()
-    categories = Category.query.all()
+    stats = store_stats.get_many(["users", "products", "orders"])
 
     login_form = LoginForm()
     signup_form = SignupForm()
 
     return render_template(
         "dashboard.html",
-        users=users,
-        products=products,
-        orders=orders,
+        users=stats["users"],
+        products=stats["products"],
+        orders=stats["orders"],
         login_form=login_form,
         signup_form=signup_form,
     )
@@ -113,6 +130,48 @@ def manage_products():
     )
 
 
+@admin.route("/admin/products/bulk")
+@admin_required
+def bulk_update_products():
+    login_form = LoginForm()
+    signup_form = SignupForm()
+
+    return render_template(
+        "admin/bulk_update.html",
+        login_form=login_form,
+        signup_form=signup_form,
+    )
+
+
+@admin.route("/admin/api/products/bulk", methods=["POST"])
+@admin_required
+def api_bulk_update_products():
+    """Apply ``[{id, stock | stock_delta, price}, ...]`` in one transaction
+    and return a result per entry."""
+    entries = request.get_json(silent=True)
+    if isinstance(entries, dict):
+        entries = entries.get("updates")
+
+    if not isinstance(entries, list):
+        return jsonify({"status": "error", "message": "Expected a list of updates"}), 400
+
+    try:
+        results = catalog.apply_updates(entries)
+    except catalog.UpdateConflict as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+
+    failed = sum(1 for r in results if r["status"] != "ok")
+
+    return jsonify(
+        {
+            "status": "success",
+            "applied": len(results) - failed,
+            "failed": failed,
+            "results": results,
+        }
+    )
+
+
 @admin.route("/admin/products/add", methods=["GET", "POST"])
 @admin_required
 def add_product():
@@ -158,7 +217,14 @@ def add_product():
 @admin.route("/admin/orders/view/<int:id>")
 @admin_required
 def view_order(id):
-    order = Order.query.get_or_404(id)
+    order = (
+        Order.query.options(
+            joinedload(Order.user),
+            selectinload(Order.items).selectinload(OrderItem.product),
+        )
+        .filter_by(id=id)
+        .first_or_404()
+    )
     login_form = LoginForm()
     signup_form = SignupForm()
     return render_template(
@@ -179,6 +245,11 @@ def edit_product(id):
     signup_form = SignupForm()
 
     if form.validate_on_submit():
+        in_sale = flash_sale.is_flash_product(product.id)
+        if in_sale:
+            # Write back pending flash-sale sales before stock is overwritten
+            flash_sale.flush()
+
         product.name = form.product_name.data
         product.price = form.current_price.data
         product.description = str(form.previous_price.data)
@@ -195,6 +266,8 @@ def edit_product(id):
            
 
         db.session.commit()
+        if in_sale:
+            flash_sale.reconcile()
         flash("Product updated successfully!")
         return redirect(url_for("admin.manage_products"))
 
@@ -228,18 +301,180 @@ def update_order_status(id):
     return redirect(url_for("admin.manage_orders"))
 
 
+ORDERS_PER_PAGE = 50
+ORDER_FILTER_ERROR = "Check the filters: dates are YYYY-MM-DD and amounts are numbers."
+
+
+def _order_filters():
+    """Filter clauses for the manage-orders form; raises ValueError."""
+    args = request.args
+    clauses = []
+
+    if args.get("status"):
+        clauses.append(Order.status.in_(order_status.spellings([args["status"]])))
+
+    start = invoices.parse_date(args.get("from"))
+    end = invoices.parse_date(args.get("to"))
+    if start:
+        clauses.append(Order.created_at >= start)
+    if end:
+        clauses.append(Order.created_at < end + timedelta(days=1))
+
+    email = (args.get("email") or "").strip()
+    if email:
+        # A range rather than LIKE: SQLite's LIKE is case-insensitive and
+        # cannot use the (binary) unique index on users.email, and typed
+        # "%" or "_" must match literally. The match is case-sensitive.
+        clauses.append(
+            Order.user_id.in_(
+                select(User.id).where(
+                    User.email >= email, User.email < email + "\U0010ffff"
+                )
+            )
+        )
+
+    if args.get("min_amount"):
+        clauses.append(Order.total_amount >= float(args["min_amount"]))
+    if args.get("max_amount"):
+        clauses.append(Order.total_amount <= float(args["max_amount"]))
+
+    return clauses
+
+
 @admin.route("/manage-orders")
 @login_required
 @admin_required
 def manage_orders():
     login_form = LoginForm()
     signup_form = SignupForm()
-    orders = Order.query.order_by(Order.created_at.desc()).all()
+
+    try:
+        clauses = _order_filters()
+        before = request.args.get("before", type=int)
+    except ValueError:
+        flash(ORDER_FILTER_ERROR)
+        return redirect(url_for("admin.manage_orders"))
+
+    # Keyset pagination, newest first: each page continues below the last id
+    query = Order.query.options(joinedload(Order.user)).filter(*clauses)
+    if before:
+        query = query.filter(Order.id < before)
+
+    orders = query.order_by(Order.id.desc()).limit(ORDERS_PER_PAGE + 1).all()
+    next_before = orders[ORDERS_PER_PAGE - 1].id if len(orders) > ORDERS_PER_PAGE else None
+
+    filters = {k: v for k, v in request.args.items() if k != "before" and v}
+
     return render_template(
         "admin/manage_orders.html",
         login_form=login_form,
         signup_form=signup_form,
-        orders=orders,
+        orders=orders[:ORDERS_PER_PAGE],
+        filters=filters,
+        next_before=next_before,
+    )
+
+
+@admin.route("/admin/orders/bulk-status", methods=["POST"])
+@admin_required
+def bulk_order_status():
+    """Move the selected orders, or every order matching the current
+    filters, to a new status in one statement."""
+    new_status = request.form.get("status")
+    if new_status not in order_status.TRANSITIONS:
+        flash("Choose a status to apply.")
+        return redirect(url_for("admin.manage_orders", **request.args))
+
+    if request.form.get("scope") == "filter":
+        try:
+            clauses = _order_filters()
+        except ValueError:
+            flash(ORDER_FILTER_ERROR)
+            return redirect(url_for("admin.manage_orders"))
+        requested = None
+    else:
+        ids = request.form.getlist("order_ids", type=int)
+        if not ids:
+            flash("Select at least one order.")
+            return redirect(url_for("admin.manage_orders", **request.args))
+        clauses = [Order.id.in_(ids)]
+        requested = len(ids)
+
+    changed = order_status.bulk_transition(new_status, *clauses)
+
+    message = f"{len(changed)} order(s) marked {new_status}."
+    if requested is not None and requested > len(changed):
+        message += f" {requested - len(changed)} skipped: not allowed from their current status."
+    flash(message)
+
+    return redirect(url_for("admin.manage_orders", **request.args))
+
+
+@admin.route("/admin/orders/export.csv")
+@admin_required
+def export_orders_csv():
+    try:
+        clauses = _order_filters()
+    except ValueError:
+        flash(ORDER_FILTER_ERROR)
+        return redirect(url_for("admin.manage_orders"))
+
+    rows = db.session.execute(
+        select(
+            Order.id,
+            User.name,
+            User.email,
+            Order.total_amount,
+            Order.status,
+            Order.created_at,
+        )
+        .outerjoin(User, User.id == Order.user_id)
+        .where(*clauses)
+        .order_by(Order.id.desc())
+        .execution_options(yield_per=1000)
+    )
+
+    header = ["order_id", "customer", "email", "total_amount", "status", "created_at"]
+
+    return Response(
+        stream_with_context(exports.csv_chunks(header, rows)),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=orders.csv"},
+    )
+
+
+@admin.route("/admin/export/<dataset>.<fmt>")
+@admin_required
+def export_data(dataset, fmt):
+    if dataset not in exports.DATASETS or fmt not in exports.FORMATS:
+        abort(404)
+
+    gzip = request.args.get("gzip") == "1"
+
+    return Response(
+        stream_with_context(exports.stream(dataset, fmt, gzip)),
+        mimetype="application/gzip" if gzip else exports.FORMATS[fmt],
+        headers={
+            "Content-Disposition": f"attachment; filename={exports.filename(dataset, fmt, gzip)}"
+        },
+    )
+
+
+@admin.route("/admin/invoices/export")
+@admin_required
+def export_invoices():
+    try:
+        clauses = _order_filters()
+    except ValueError:
+        flash(ORDER_FILTER_ERROR)
+        return redirect(url_for("admin.manage_orders"))
+
+    query = invoices.export_query().filter(*clauses)
+
+    return Response(
+        stream_with_context(invoices.export_zip(query)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=invoices.zip"},
     )
 
 
@@ -248,10 +483,25 @@ def manage_orders():
 def reports():
     login_form = LoginForm()
     signup_form = SignupForm()
-    # Example stats, you can replace with real queries
-    total_orders = Order.query.count()
-    total_products = Product.query.count()
-    low_stock_products = Product.query.filter(Product.stock < 5).all()
+    stats = store_stats.get_many(["orders", "products"])
+    total_orders = stats["orders"]
+    total_products = stats["products"]
+    # ⏳ Products ranked by days until they sell out at recent velocity
+    stockouts = analytics.stockout_forecast(
+        horizon=current_app.config["STOCKOUT_HORIZON_DAYS"],
+    )
+
+    # 📈 Sales for the chosen range (defaults to the last 30 days)
+    try:
+        end = invoices.parse_date(request.args.get("to"))
+        start = invoices.parse_date(request.args.get("from"))
+    except ValueError:
+        flash("Dates must be in YYYY-MM-DD format.")
+        return redirect(url_for("admin.reports"))
+
+    end = end.date() if end else date.today()
+    start = start.date() if start else end - timedelta(days=29)
+    sales = analytics.sales_report(start, end)
 
     return render_template(
         "admin/reports.html",
@@ -259,7 +509,25 @@ def reports():
         total_products=total_products,
         login_form=login_form,
         signup_form=signup_form,
-        low_stock_products=low_stock_products,
+        stockouts=stockouts,
+        sales=sales,
+        start=start,
+        end=end,
+    )
+
+
+@admin.route("/admin/slow-queries")
+@admin_required
+def slow_query_report():
+    login_form = LoginForm()
+    signup_form = SignupForm()
+
+    return render_template(
+        "admin/slow_queries.html",
+        queries=slow_queries.summarize(),
+        threshold=current_app.config["SLOW_QUERY_MS"],
+        login_form=login_form,
+        signup_form=signup_form,
     )
 
 
@@ -295,13 +563,24 @@ def manage_categories():
 def settings():
     login_form = LoginForm()
     signup_form = SignupForm()
-    # You can create a Settings model to store these
     form = SettingsForm()
     if form.validate_on_submit():
-        # Save to database or config
+        store_settings.save(
+            {
+                "store_name": form.store_name.data.strip(),
+                "contact_email": form.contact_email.data.strip(),
+                "gst_rate": f"{form.gst_rate.data:g}",
+            }
+        )
         flash("Settings updated successfully!")
         return redirect(url_for("admin.settings"))
 
+    if request.method == "GET":
+        current = store_settings.get_all()
+        form.store_name.data = current["store_name"]
+        form.contact_email.data = current["contact_email"]
+        form.gst_rate.data = float(current["gst_rate"])
+
     return render_template(
         "admin/settings.html", login_form=login_form, signup_form=signup_form, form=form
     )
@@ -0,0 +1,623 @@
+import threading
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, func, insert, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from .models import (
+    db,
+    Category,
+    Order,
+    OrderItem,
+    Product,
+    ProductForecast,
+    SalesDaily,
+    SalesDailyProduct,
+    SalesDirtyDay,
+    SalesRollupChange,
+    StoreStat,
+)
+from .upsert import insert_ignore, upsert_rows
+from . import flash_sale, store_stats
+
+
+# ------------------------------------------------
+# SALES ANALYTICS
+# ------------------------------------------------
+# sales_daily / sales_daily_product hold one row per day (and product) with
+# orders, units and revenue. Any change to an order or its items marks its
+# day in sales_dirty_day within the same transaction; refresh() rebuilds
+# only those days. Queries keep the rollups in NumPy arrays and aggregate
+# any date range with bincount. Each refresh logs the days it rebuilt under
+# the new rollup version, so a worker whose arrays are behind reloads only
+# those days' rows.
+VERSION_KEY = "sales_rollup_version"
+CHANGE_LOG_VERSIONS = 1000  # older entries are pruned; lagging workers reload
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+@event.listens_for(Order, "after_insert")
+@event.listens_for(Order, "after_update")
+@event.listens_for(Order, "after_delete")
+def _order_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and target.created_at is not None:
+        session.info.setdefault("sales_dirty_days", set()).add(
+            _as_date(target.created_at)
+        )
+
+
+@event.listens_for(OrderItem, "after_insert")
+@event.listens_for(OrderItem, "after_update")
+@event.listens_for(OrderItem, "after_delete")
+def _item_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and target.order_id is not None:
+        session.info.setdefault("sales_dirty_orders", set()).add(target.order_id)
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+@event.listens_for(Product, "after_delete")
+def _product_changed(mapper, connection, target):
+    session = object_session(target)
+    state = inspect(target)
+    if session is not None and (
+        state.deleted or state.attrs.stock.history.has_changes()
+    ):
+        session.info.setdefault("forecast_products", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_dirty_days(session, flush_context):
+    mark_orders(
+        session,
+        session.info.pop("sales_dirty_orders", set()),
+        session.info.pop("sales_dirty_days", set()),
+    )
+    forecast_products(session, session.info.pop("forecast_products", set()))
+
+
+def mark_orders(session, order_ids, days=()):
+    """Mark the days of ``order_ids`` (plus ``days``) for a rebuild.
+
+    Called from the flush hook above, and directly by bulk statements that
+    bypass ORM events.
+    """
+    days = set(days)
+
+    if order_ids:
+        days.update(
+            _as_date(created_at)
+            for (created_at,) in session.execute(
+                select(Order.created_at).where(Order.id.in_(order_ids))
+            )
+        )
+
+    if days:
+        session.execute(
+            insert_ignore(
+                SalesDirtyDay.__table__,
+                [{"day": day} for day in days],
+                bind=session.get_bind(),
+            )
+        )
+
+
+def _live_orders(start, end):
+    return (
+        Order.created_at >= start,
+        Order.created_at < end,
+        func.lower(func.coalesce(Order.status, "")) != "cancelled",
+    )
+
+
+def _rebuild_day(day):
+    """Rebuild one day's rollups; returns ``{product_id: units added}``."""
+    start = datetime.combine(day, time.min)
+    live = _live_orders(start, start + timedelta(days=1))
+
+    deltas = {
+        product_id: -units
+        for product_id, units in db.session.execute(
+            select(SalesDailyProduct.product_id, SalesDailyProduct.units).where(
+                SalesDailyProduct.day == day
+            )
+        )
+    }
+
+    SalesDailyProduct.query.filter_by(day=day).delete()
+    SalesDaily.query.filter_by(day=day).delete()
+
+    rows = (
+        db.session.query(
+            OrderItem.product_id,
+            Product.category_id,
+            func.count(func.distinct(OrderItem.order_id)),
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.quantity * OrderItem.price),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .filter(*live)
+        .group_by(OrderItem.product_id, Product.category_id)
+        .all()
+    )
+    orders = db.session.query(func.count(Order.id)).filter(*live).scalar()
+
+    if rows:
+        db.session.execute(
+            insert(SalesDailyProduct),
+            [
+                {
+                    "day": day,
+                    "product_id": product_id,
+                    "category_id": category_id,
+                    "orders": n_orders,
+                    "units": units or 0,
+                    "revenue": revenue or 0,
+                }
+                for product_id, category_id, n_orders, units, revenue in rows
+            ],
+        )
+
+    if orders:
+        db.session.add(
+            SalesDaily(
+                day=day,
+                orders=orders,
+                units=sum(r[3] or 0 for r in rows),
+                revenue=sum(r[4] or 0 for r in rows),
+            )
+        )
+
+    for product_id, _, _, units, _ in rows:
+        deltas[product_id] = deltas.get(product_id, 0) + (units or 0)
+    return {pid: units for pid, units in deltas.items() if units}
+
+
+def refresh():
+    """Rebuild the rollups for every dirty day; returns how many."""
+    days = [d.day for d in SalesDirtyDay.query.all()]
+    if not days:
+        return 0
+
+    # Clear the markers first: on SQLite this takes the write lock, so an
+    # order committed while we rebuild marks its day dirty again afterwards.
+    SalesDirtyDay.query.filter(SalesDirtyDay.day.in_(days)).delete(
+        synchronize_session=False
+    )
+
+    # Blend each day's change in units into the stored velocities. A day
+    # after the forecast day gets a weight above alpha that the next daily
+    # decay brings back to the exact EWMA.
+    as_of = _forecast_day(for_update=True)
+    alpha = _alpha()
+    blended = {}
+    for day in days:
+        weight = alpha * (1 - alpha) ** (as_of - day.toordinal()) if as_of else 0
+        for product_id, units in _rebuild_day(day).items():
+            blended[product_id] = blended.get(product_id, 0) + weight * units
+    if as_of:
+        forecast_products(db.session, blended, blended)
+
+    store_stats.add(VERSION_KEY, 1)
+    version = store_stats.get(VERSION_KEY)
+    db.session.execute(
+        insert(SalesRollupChange), [{"version": version, "day": day} for day in days]
+    )
+    SalesRollupChange.query.filter(
+        SalesRollupChange.version <= version - CHANGE_LOG_VERSIONS
+    ).delete(synchronize_session=False)
+
+    db.session.commit()
+    return len(days)
+
+
+def mark_all_dirty():
+    days = {
+        _as_date(d)
+        for (d,) in db.session.query(func.date(Order.created_at)).distinct()
+        if d is not None
+    }
+    if days:
+        db.session.execute(
+            insert_ignore(SalesDirtyDay.__table__, [{"day": day} for day in days])
+        )
+    db.session.commit()
+    return len(days)
+
+
+# ------------------------------------------------
+# QUERY API
+# ------------------------------------------------
+_cache = SimpleNamespace(version=None, arrays=None)
+_cache_lock = threading.Lock()
+
+
+def _load_arrays(days=None):
+    """The rollups as arrays; only those of ``days`` if given."""
+    daily = select(
+        SalesDaily.day, SalesDaily.orders, SalesDaily.units, SalesDaily.revenue
+    )
+    products = select(
+        SalesDailyProduct.day,
+        SalesDailyProduct.product_id,
+        SalesDailyProduct.category_id,
+        SalesDailyProduct.units,
+        SalesDailyProduct.revenue,
+    )
+    if days is not None:
+        daily = daily.where(SalesDaily.day.in_(days))
+        products = products.where(SalesDailyProduct.day.in_(days))
+
+    daily = db.session.execute(daily).all()
+    products = db.session.execute(products).all()
+
+    return SimpleNamespace(
+        d_day=np.array([r[0].toordinal() for r in daily], dtype=np.int64),
+        d_orders=np.array([r[1] for r in daily], dtype=np.float64),
+        d_units=np.array([r[2] for r in daily], dtype=np.float64),
+        d_revenue=np.array([r[3] for r in daily], dtype=np.float64),
+        p_day=np.array([r[0].toordinal() for r in products], dtype=np.int64),
+        p_product=np.array([r[1] for r in products], dtype=np.int64),
+        p_category=np.array([r[2] or 0 for r in products], dtype=np.int64),
+        p_units=np.array([r[3] for r in products], dtype=np.float64),
+        p_revenue=np.array([r[4] for r in products], dtype=np.float64),
+    )
+
+
+def _patch_arrays(a, days):
+    """Copy of ``a`` with the rows of ``days`` replaced by their current
+    rollups."""
+    fresh = _load_arrays(days)
+    ordinals = [day.toordinal() for day in days]
+    keep = {
+        "d": ~np.isin(a.d_day, ordinals),
+        "p": ~np.isin(a.p_day, ordinals),
+    }
+    return SimpleNamespace(
+        **{
+            name: np.concatenate((values[keep[name[0]]], getattr(fresh, name)))
+            for name, values in vars(a).items()
+        }
+    )
+
+
+def _changed_days(since):
+    """Days rebuilt after version ``since``, or None if the log no longer
+    reaches back that far."""
+    rows = db.session.execute(
+        select(SalesRollupChange.version, SalesRollupChange.day).where(
+            SalesRollupChange.version > since
+        )
+    ).all()
+    if not rows or min(version for version, _ in rows) != since + 1:
+        return None
+    return {day for _, day in rows}
+
+
+def _arrays():
+    refresh()
+    version = store_stats.get(VERSION_KEY)
+
+    with _cache_lock:
+        if _cache.arrays is not None and _cache.version == version:
+            return _cache.arrays
+
+        days = None
+        if _cache.arrays is not None and _cache.version < version:
+            days = _changed_days(_cache.version)
+
+        if days is None:
+            _cache.arrays = _load_arrays()
+        else:
+            _cache.arrays = _patch_arrays(_cache.arrays, days)
+        _cache.version = version
+        return _cache.arrays
+
+
+def _top(ids, values, limit):
+    order = np.argsort(values)[::-1][:limit]
+    return [(int(ids[i]), float(values[i])) for i in order if values[i] > 0]
+
+
+def sales_report(start, end, top=10):
+    """Aggregate the rollups for ``start``..``end`` (inclusive dates)."""
+    a = _arrays()
+    first, last = start.toordinal(), end.toordinal()
+    n_days = max(last - first + 1, 0)
+
+    d = (a.d_day >= first) & (a.d_day <= last)
+    p = (a.p_day >= first) & (a.p_day <= last)
+
+    def per_day(values):
+        return np.bincount(a.d_day[d] - first, weights=values[d], minlength=n_days)
+
+    revenue = per_day(a.d_revenue)
+    orders = per_day(a.d_orders)
+    units = per_day(a.d_units)
+
+    product_ids, product_idx = np.unique(a.p_product[p], return_inverse=True)
+    product_revenue = np.bincount(product_idx, weights=a.p_revenue[p])
+    product_units = np.bincount(product_idx, weights=a.p_units[p])
+
+    category_ids, category_idx = np.unique(a.p_category[p], return_inverse=True)
+    category_revenue = np.bincount(category_idx, weights=a.p_revenue[p])
+
+    top_products = _top(product_ids, product_revenue, top)
+    units_by_product = dict(zip(product_ids.tolist(), product_units.tolist()))
+    categories = _top(category_ids, category_revenue, len(category_ids))
+
+    names = dict(
+        db.session.query(Product.id, Product.name).filter(
+            Product.id.in_([pid for pid, _ in top_products])
+        )
+    )
+    category_names = dict(
+        db.session.query(Category.id, Category.name).filter(
+            Category.id.in_([cid for cid, _ in categories])
+        )
+    )
+
+    return {
+        "days": [date.fromordinal(first + i).isoformat() for i in range(n_days)],
+        "revenue": revenue.round(2).tolist(),
+        "orders": orders.astype(int).tolist(),
+        "units": units.astype(int).tolist(),
+        "totals": {
+            "revenue": round(float(revenue.sum()), 2),
+            "orders": int(orders.sum()),
+            "units": int(units.sum()),
+        },
+        "top_products": [
+            {
+                "name": names.get(pid, f"Product {pid}"),
+                "revenue": round(value, 2),
+                "units": int(units_by_product[pid]),
+            }
+            for pid, value in top_products
+        ],
+        "categories": [
+            {
+                "name": category_names.get(cid, "Uncategorised"),
+                "revenue": round(value, 2),
+            }
+            for cid, value in categories
+        ],
+    }
+
+
+# ------------------------------------------------
+# STOCK-OUT FORECAST
+# ------------------------------------------------
+# product_forecast keeps every product's EWMA of daily units sold and the
+# days its stock lasts at that rate, all as of one day (FORECAST_DAY_KEY).
+# The flush hook above recomputes days_left for products whose stock
+# changed, refresh() blends rebuilt days into the velocities of the products
+# they touch, and the first report of a new day decays every row at once.
+# The report is then an indexed range scan; flash-sale products are ranked
+# by their live counters instead of the lagging Product.stock.
+FORECAST_DAY_KEY = "stockout_forecast_day"
+
+
+def _today():
+    # Order.created_at is UTC, so rollup days are UTC days
+    return datetime.utcnow().date()
+
+
+def _alpha():
+    return 2 / (current_app.config["STOCKOUT_EWMA_SPAN_DAYS"] + 1)
+
+
+def _days_left(stock, velocity):
+    if (stock or 0) <= 0:
+        return 0.0
+    if velocity > 1e-9:
+        return stock / velocity
+    return None
+
+
+def _forecast_day(for_update=False):
+    stmt = select(StoreStat.value).where(StoreStat.name == FORECAST_DAY_KEY)
+    if for_update:
+        stmt = stmt.with_for_update()
+    return db.session.execute(stmt).scalar() or 0
+
+
+def forecast_products(session, product_ids, velocity_deltas=None):
+    """Recompute days_left for ``product_ids`` from their current stock,
+    first adding ``velocity_deltas`` (``{product_id: delta}``) if given.
+
+    Called from the flush hook above, and directly by bulk statements that
+    change Product.stock without ORM events.
+    """
+    if not product_ids:
+        return
+    velocity_deltas = velocity_deltas or {}
+
+    rows = session.execute(
+        select(Product.id, Product.stock, ProductForecast.velocity)
+        .outerjoin(ProductForecast, ProductForecast.product_id == Product.id)
+        .where(Product.id.in_(list(product_ids)))
+    ).all()
+
+    values = []
+    for product_id, stock, velocity in rows:
+        velocity = max((velocity or 0) + velocity_deltas.get(product_id, 0), 0)
+        values.append(
+            {
+                "product_id": product_id,
+                "velocity": velocity,
+                "days_left": _days_left(stock, velocity),
+            }
+        )
+    upsert_rows(ProductForecast.__table__, values, ["product_id"])
+
+    gone = set(product_ids) - {r[0] for r in rows}
+    if gone:
+        session.execute(
+            ProductForecast.__table__.delete().where(
+                ProductForecast.product_id.in_(gone)
+            )
+        )
+
+
+def forecast_new_products():
+    """Add forecast rows for products inserted without ORM events."""
+    missing = db.session.scalars(
+        select(Product.id)
+        .outerjoin(ProductForecast, ProductForecast.product_id == Product.id)
+        .where(ProductForecast.product_id.is_(None))
+    ).all()
+    forecast_products(db.session, missing)
+    db.session.commit()
+
+
+def _velocity(a, today, alpha):
+    """Per-product EWMA of daily units sold as of ``today``.
+
+    The EWMA of a daily series that is zero on days without sales is
+    ``sum(alpha * (1 - alpha) ** age * units)``, so every product is
+    computed in one bincount over the sparse rollups.
+    """
+    past = a.p_day <= today
+    weights = alpha * (1 - alpha) ** (today - a.p_day[past]) * a.p_units[past]
+
+    product_ids, idx = np.unique(a.p_product[past], return_inverse=True)
+    return dict(zip(product_ids.tolist(), np.bincount(idx, weights=weights).tolist()))
+
+
+def rebuild_forecast(today=None):
+    """Recompute every product's forecast from the rollups."""
+    today = (today or _today()).toordinal()
+    velocity = _velocity(_arrays(), today, _alpha())
+
+    ProductForecast.query.delete()
+    upsert_rows(
+        ProductForecast.__table__,
+        [
+            {
+                "product_id": product_id,
+                "velocity": velocity.get(product_id, 0.0),
+                "days_left": _days_left(stock, velocity.get(product_id, 0.0)),
+            }
+            for product_id, stock in db.session.execute(
+                select(Product.id, Product.stock)
+            )
+        ],
+        ["product_id"],
+    )
+    db.session.merge(StoreStat(name=FORECAST_DAY_KEY, value=today))
+    db.session.commit()
+
+
+def _roll_forecast(today):
+    """Move the forecast to ``today``; a no-op once done for the day."""
+    as_of = _forecast_day()
+    today = today.toordinal()
+    if as_of >= today:
+        return
+
+    decay = (1 - _alpha()) ** (today - as_of)
+    if not as_of or decay < 1e-12:
+        rebuild_forecast(date.fromordinal(today))
+        return
+
+    # Only the worker that moves the day decays the rows
+    stats = StoreStat.__table__
+    moved = db.session.execute(
+        stats.update()
+        .where(stats.c.name == FORECAST_DAY_KEY, stats.c.value == as_of)
+        .values(value=today)
+    ).rowcount
+    if moved:
+        table = ProductForecast.__table__
+        db.session.execute(
+            table.update().values(
+                velocity=table.c.velocity * decay,
+                days_left=table.c.days_left / decay,
+            )
+        )
+    db.session.commit()
+
+
+def stockout_forecast(horizon=14, limit=20, today=None):
+    """Products expected to sell out within ``horizon`` days, soonest first."""
+    refresh()
+    _roll_forecast(today or _today())
+
+    flash_ids = flash_sale.product_ids()
+    rows = [
+        (product_id, name, stock, velocity, days_left)
+        for product_id, name, stock, velocity, days_left in db.session.execute(
+            select(
+                ProductForecast.product_id,
+                Product.name,
+                Product.stock,
+                ProductForecast.velocity,
+                ProductForecast.days_left,
+            )
+            .join(Product, Product.id == ProductForecast.product_id)
+            .where(
+                ProductForecast.days_left <= horizon,
+                ProductForecast.product_id.not_in(flash_ids),
+            )
+            .order_by(ProductForecast.days_left, ProductForecast.velocity.desc())
+            .limit(limit)
+        )
+    ]
+
+    if flash_ids:
+        for product_id, name, velocity in db.session.execute(
+            select(Product.id, Product.name, ProductForecast.velocity)
+            .join(ProductForecast, ProductForecast.product_id == Product.id)
+            .where(Product.id.in_(flash_ids))
+        ):
+            stock = flash_sale.available(product_id) or 0
+            days_left = _days_left(stock, velocity)
+            if days_left is not None and days_left <= horizon:
+                rows.append((product_id, name, stock, velocity, days_left))
+        rows.sort(key=lambda r: (r[4], -r[3]))
+
+    return [
+        {
+            "id": product_id,
+            "name": name,
+            "stock": int(stock or 0),
+            "per_day": round(velocity, 2),
+            "days_left": round(days_left, 1),
+        }
+        for product_id, name, stock, velocity, days_left in rows[:limit]
+    ]
+
+
+def init_app(app):
+    # First run: build rollups for existing orders on the first report view
+    with app.app_context():
+        if not SalesDaily.query.first() and not SalesDirtyDay.query.first():
+            mark_all_dirty()
+
+
+cli = AppGroup("analytics", help="Sales rollup tools.")
+
+
+@cli.command("rebuild")
+def rebuild_command():
+    """Rebuild the daily sales rollups for every order day."""
+    mark_all_dirty()
+    click.echo(f"Rebuilt {refresh()} day(s) of sales rollups")
+    rebuild_forecast()
+    click.echo("Rebuilt the stock-out forecast")
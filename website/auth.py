@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from .models import db, User
 from .forms import SignupForm, LoginForm
+from . import guest_cart
+from .ratelimit import rate_limit
 from flask_login import login_user, logout_user, login_required, current_user
 from flask import Flask, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -12,6 +14,7 @@ auth = Blueprint('auth', __name__)
 # LOGIN
 # ----------------------------------
 @auth.route('/login', methods=['GET', 'POST'])
+@rate_limit("login", account_field="email")
 def login():
     form = LoginForm()
 
@@ -28,6 +31,8 @@ def login():
 
     if user and user.check_password(form.password.data):
         login_user(user)
+        db.session.commit()  # persist a rehashed password, if any
+        guest_cart.merge_into(user)
         flash(f"Welcome back, {user.name}!", "success")
 
         next_page = request.args.get('next')
@@ -42,6 +47,7 @@ def login():
 # SIGNUP
 # ----------------------------------
 @auth.route('/signup', methods=['POST'])
+@rate_limit("signup")
 def signup():
     form = SignupForm()
 
@@ -72,6 +78,7 @@ def logout():
     return redirect(url_for('views.home'))
 
 @auth.route("/forgot_password/reset_password", methods=["POST"])
+@rate_limit("reset_password", account_field="email", json=True)
 def reset_password():
     data = request.json
     if not data or "email" not in data or "new_password" not in data:
@@ -79,7 +86,7 @@ def reset_password():
 
     user = User.query.filter_by(email=data["email"]).first()
     if user:
-        user.password = generate_password_hash(data["new_password"])
+        user.set_password(data["new_password"])
         db.session.commit()
         return jsonify({"status": "ok", "message": "Password reset successfully!"})
     return jsonify({"status": "error", "message": "Email not found."})
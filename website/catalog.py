@@ -0,0 +1,414 @@
+import csv
+import json
+import os
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, insert, select
+
+from .models import db, Category, Product
+from .upsert import upsert_rows
+from . import analytics, category_registry, flash_sale, store_stats, user_summary
+
+
+# ------------------------------------------------
+# CATALOG IMPORT
+# ------------------------------------------------
+# Rows are read and validated one at a time and written in batches: rows
+# with an id are upserted by id (the key used by exports and all_products),
+# rows without one are inserted. Categories are matched by name and created
+# on first sight.
+BATCH_SIZE = 5000
+
+
+def _integer(value):
+    """int() that refuses to truncate: 3, "3" and 3.0 pass, 2.5 and True
+    do not."""
+    if isinstance(value, bool) or (
+        isinstance(value, float) and not value.is_integer()
+    ):
+        raise ValueError(value)
+    return int(value)
+
+
+FIELDS = {
+    "id": _integer,
+    "name": str,
+    "price": float,
+    "stock": _integer,
+    "description": str,
+    "image": str,
+    "category_id": _integer,
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(path, fmt=None):
+    """Yield ``(line_no, dict)`` from a CSV or JSON Lines file."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except ValueError:
+                        yield line_no, None
+
+
+def clean(raw):
+    """Validate one input row into Product column values."""
+    if not isinstance(raw, dict):
+        raise RowError("not a JSON object")
+
+    row = {}
+    for field, cast in FIELDS.items():
+        value = raw.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            continue
+        try:
+            row[field] = cast(value)
+        except (TypeError, ValueError):
+            raise RowError(f"invalid {field}: {value!r}")
+
+    if not row.get("name"):
+        raise RowError("name is required")
+    if "price" not in row or row["price"] < 0:
+        raise RowError("price must be a number >= 0")
+    if row.get("stock", 0) < 0:
+        raise RowError("stock must be >= 0")
+
+    category = str(raw.get("category") or "").strip()
+    if category and "category_id" not in row:
+        row["category"] = category
+
+    return row
+
+
+class _Categories:
+    def __init__(self):
+        self.ids = {}
+        for category_id, name in db.session.execute(
+            select(Category.id, Category.name).order_by(Category.id.desc())
+        ):
+            self.ids[name] = category_id  # lowest id wins on duplicate names
+
+    def resolve(self, row):
+        name = row.pop("category", None)
+        if name:
+            if name not in self.ids:
+                self.ids[name] = db.session.execute(
+                    insert(Category).values(name=name)
+                ).inserted_primary_key[0]
+            row["category_id"] = self.ids[name]
+        return row
+
+
+def _write(batch, categories, overwrite=True):
+    """Upsert one batch; returns ``(inserted, updated)``."""
+    in_sale = {
+        row["id"] for row in batch if "id" in row and "stock" in row
+    } & set(flash_sale.product_ids())
+    if in_sale:
+        # Write back pending flash-sale sales before stock is overwritten
+        flash_sale.flush()
+
+    by_id = {}
+    new_rows = []
+    for row in batch:
+        row = categories.resolve(row)
+        if "id" in row:
+            by_id[row["id"]] = row  # last row wins within a batch
+        else:
+            new_rows.append(row)
+
+    existing = set(
+        db.session.scalars(select(Product.id).where(Product.id.in_(list(by_id))))
+    ) if by_id else set()
+
+    if not overwrite:
+        by_id = {pid: row for pid, row in by_id.items() if pid not in existing}
+
+    # executemany needs identical columns, so group rows by shape
+    groups = {}
+    for row in by_id.values():
+        groups.setdefault(("upsert", *sorted(row)), []).append(row)
+    for row in new_rows:
+        groups.setdefault(("insert", *sorted(row)), []).append(row)
+
+    for shape, rows in groups.items():
+        if shape[0] == "upsert":
+            upsert_rows(Product.__table__, rows, ["id"])
+        else:
+            db.session.execute(insert(Product), rows)
+
+    analytics.forecast_products(db.session, by_id)
+
+    inserted = len(set(by_id) - existing) + len(new_rows)
+    store_stats.add("products", inserted)
+    db.session.commit()
+
+    if in_sale:
+        flash_sale.reconcile()
+
+    return inserted, len(set(by_id) & existing)
+
+
+def import_rows(rows, batch_size=BATCH_SIZE, overwrite=True, on_error=None):
+    """Import ``(line_no, raw)`` pairs; returns a dict of counts.
+
+    With ``overwrite=False`` products whose id already exists are left as
+    they are.
+    """
+    categories = _Categories()
+    totals = {"inserted": 0, "updated": 0, "skipped": 0}
+    batch = []
+
+    def flush():
+        inserted, updated = _write(batch, categories, overwrite)
+        totals["inserted"] += inserted
+        totals["updated"] += updated
+        batch.clear()
+
+    for line_no, raw in rows:
+        try:
+            batch.append(clean(raw))
+        except RowError as e:
+            totals["skipped"] += 1
+            if on_error:
+                on_error(line_no, e)
+            continue
+
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    # Core inserts skip the ORM events that keep category counts, cart
+    # subtotals and stock-out forecasts current
+    if totals["updated"]:
+        user_summary.prices_changed()
+    if totals["inserted"] or totals["updated"]:
+        category_registry.reconcile()
+    if totals["inserted"]:
+        analytics.forecast_new_products()
+
+    return totals
+
+
+def seed_rows():
+    """``all_products`` as import rows, keeping their ids."""
+    from .products import all_products
+
+    for i, product in enumerate(all_products, start=1):
+        yield i, product
+
+
+# ------------------------------------------------
+# BULK STOCK / PRICE UPDATES
+# ------------------------------------------------
+# Entries are checked against one read of the affected products, then
+# applied as at most three executemany UPDATEs (stock set, stock delta,
+# price) in a single transaction. Deltas are applied in SQL and guarded so
+# a checkout racing the update can never push stock below zero.
+ID_CHUNK = 10000
+
+
+class UpdateConflict(Exception):
+    pass
+
+
+def _parse_update(entry):
+    if not isinstance(entry, dict):
+        raise RowError("expected an object")
+
+    if entry.get("id") is None:
+        raise RowError("id is required")
+    try:
+        update = {"id": _integer(entry["id"])}
+    except (TypeError, ValueError):
+        raise RowError(f"invalid id: {entry['id']!r}")
+
+    if entry.get("stock") is not None and entry.get("stock_delta") is not None:
+        raise RowError("give stock or stock_delta, not both")
+
+    for field, cast in (("stock", _integer), ("stock_delta", _integer), ("price", float)):
+        value = entry.get(field)
+        if value is None or value == "":
+            continue
+        try:
+            update[field] = cast(value)
+        except (TypeError, ValueError):
+            raise RowError(f"invalid {field}: {value!r}")
+
+    if len(update) == 1:
+        raise RowError("nothing to update")
+    if update.get("stock", 0) < 0:
+        raise RowError("stock must be >= 0")
+    if update.get("price", 0) < 0:
+        raise RowError("price must be >= 0")
+
+    return update
+
+
+def _current(ids):
+    current = {}
+    ids = sorted(ids)
+    for i in range(0, len(ids), ID_CHUNK):
+        for product_id, stock, price in db.session.execute(
+            select(Product.id, Product.stock, Product.price).where(
+                Product.id.in_(ids[i:i + ID_CHUNK])
+            )
+        ):
+            current[product_id] = [stock or 0, price]
+    return current
+
+
+def apply_updates(entries):
+    """Apply ``{id, stock | stock_delta, price}`` entries in one transaction.
+
+    Returns one result per entry, in order. Invalid entries are reported
+    and skipped; if stock changes underneath a delta the whole batch is
+    rolled back with UpdateConflict.
+    """
+    results = []
+    updates = []
+    for index, entry in enumerate(entries):
+        try:
+            updates.append((index, _parse_update(entry)))
+            results.append(None)
+        except RowError as e:
+            product_id = entry.get("id") if isinstance(entry, dict) else None
+            results.append({"id": product_id, "status": "error", "message": str(e)})
+
+    state = _current({u["id"] for _, u in updates})
+
+    # Net change per product: (absolute stock or None, delta after it, price)
+    net = {}
+    for index, update in updates:
+        product_id = update["id"]
+        if product_id not in state:
+            results[index] = {"id": product_id, "status": "error", "message": "no such product"}
+            continue
+
+        stock, price = state[product_id]
+        new_stock = update.get("stock", stock + update.get("stock_delta", 0))
+        if new_stock < 0:
+            results[index] = {
+                "id": product_id,
+                "status": "error",
+                "message": f"stock would drop below zero ({stock} {update['stock_delta']:+d})",
+            }
+            continue
+
+        absolute, delta, new_price = net.get(product_id, (None, 0, None))
+        if "stock" in update:
+            absolute, delta = update["stock"], 0
+        else:
+            delta += update.get("stock_delta", 0)
+        if "price" in update:
+            new_price = update["price"]
+        net[product_id] = (absolute, delta, new_price)
+
+        state[product_id] = [new_stock, update.get("price", price)]
+        results[index] = {"id": product_id, "status": "ok", "stock": new_stock, "price": state[product_id][1]}
+
+    set_rows, delta_rows, price_rows = [], [], []
+    for product_id, (absolute, delta, price) in net.items():
+        if absolute is not None:
+            set_rows.append({"b_id": product_id, "b_stock": absolute + delta})
+        elif delta:
+            delta_rows.append({"b_id": product_id, "b_delta": delta})
+        if price is not None:
+            price_rows.append({"b_id": product_id, "b_price": price})
+
+    table = Product.__table__
+    stock_changed = [r["b_id"] for r in set_rows + delta_rows]
+    in_sale = set(stock_changed) & set(flash_sale.product_ids())
+    if in_sale:
+        # Write back pending flash-sale sales before stock is overwritten
+        flash_sale.flush()
+
+    if set_rows:
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(stock=bindparam("b_stock")),
+            set_rows,
+        )
+    if delta_rows:
+        result = db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .where(table.c.stock + bindparam("b_delta") >= 0)
+            .values(stock=table.c.stock + bindparam("b_delta")),
+            delta_rows,
+        )
+        if result.rowcount != len(delta_rows):
+            db.session.rollback()
+            raise UpdateConflict("Stock changed during the update; nothing was applied.")
+    if price_rows:
+        db.session.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(price=bindparam("b_price")),
+            price_rows,
+        )
+        user_summary.prices_changed()
+
+    analytics.forecast_products(db.session, stock_changed)
+    db.session.commit()
+
+    if in_sale:
+        flash_sale.reconcile()
+
+    return results
+
+
+cli = AppGroup("catalog", help="Product catalog tools.")
+
+
+@cli.command("import")
+@click.argument("path", required=False)
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Default: from the file extension.")
+@click.option("--seed", is_flag=True, help="Add missing products from all_products.")
+@click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+@click.option("--max-errors", default=20, show_default=True, help="Errors to print.")
+def import_command(path, fmt, seed, batch_size, max_errors):
+    """Upsert products from a CSV or JSON Lines file."""
+    if not path and not seed:
+        raise click.UsageError("Give a PATH to import and/or --seed.")
+    if path and not os.path.exists(path):
+        raise click.BadParameter(f"{path} does not exist", param_hint="PATH")
+
+    shown = {"errors": 0}
+
+    def report(line_no, error):
+        shown["errors"] += 1
+        if shown["errors"] <= max_errors:
+            click.echo(f"line {line_no}: {error}", err=True)
+
+    # Seeding never overwrites products that already exist
+    sources = []
+    if seed:
+        sources.append(("all_products", seed_rows(), False))
+    if path:
+        sources.append((path, read_rows(path, fmt), True))
+
+    for name, rows, overwrite in sources:
+        shown["errors"] = 0
+        totals = import_rows(rows, batch_size, overwrite, on_error=report)
+        click.echo(
+            f"{name}: {totals['inserted']} inserted, "
+            f"{totals['updated']} updated, {totals['skipped']} skipped"
+        )
@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session, object_session
+
+from .models import db, Category, Product, StoreStat
+from . import store_stats
+
+
+# ------------------------------------------------
+# CATEGORY REGISTRY
+# ------------------------------------------------
+# Categories with their product counts, cached per process for every
+# template. Counts live in store_stats as "category_products:<id>" and are
+# adjusted inside the transaction that inserts, deletes or re-categorises a
+# product; any change bumps categories_version so other workers reload.
+# Core inserts (e.g. `flask catalog import`) skip these events and call
+# reconcile() instead.
+VERSION_KEY = "categories_version"
+COUNT_PREFIX = "category_products:"
+
+
+def _count_key(category_id):
+    return f"{COUNT_PREFIX}{category_id}"
+
+
+def _changed(connection, target, counts=()):
+    for category_id, delta in counts:
+        if category_id is not None:
+            store_stats.bump(connection, _count_key(category_id), delta)
+    store_stats.bump(connection, VERSION_KEY)
+
+    session = object_session(target)
+    if session is not None:
+        session.info["categories_changed"] = True
+
+
+@event.listens_for(Product, "after_insert")
+def _product_added(mapper, connection, target):
+    _changed(connection, target, [(target.category_id, 1)])
+
+
+@event.listens_for(Product, "after_delete")
+def _product_removed(mapper, connection, target):
+    _changed(connection, target, [(target.category_id, -1)])
+
+
+@event.listens_for(Product, "after_update")
+def _product_moved(mapper, connection, target):
+    history = inspect(target).attrs.category_id.history
+    if history.has_changes():
+        old = history.deleted[0] if history.deleted else None
+        _changed(connection, target, [(old, -1), (target.category_id, 1)])
+
+
+@event.listens_for(Category, "after_insert")
+@event.listens_for(Category, "after_update")
+def _category_changed(mapper, connection, target):
+    _changed(connection, target)
+
+
+@event.listens_for(Category, "after_delete")
+def _category_deleted(mapper, connection, target):
+    connection.execute(
+        StoreStat.__table__.delete().where(StoreStat.name == _count_key(target.id))
+    )
+    _changed(connection, target)
+
+
+def _load():
+    counts = {
+        stat.name[len(COUNT_PREFIX):]: stat.value
+        for stat in StoreStat.query.filter(StoreStat.name.startswith(COUNT_PREFIX))
+    }
+    return [
+        SimpleNamespace(id=c.id, name=c.name, product_count=counts.get(str(c.id), 0))
+        for c in Category.query.order_by(Category.id)
+    ]
+
+
+_cache = store_stats.VersionedCache(VERSION_KEY, _load, "CATEGORIES_CHECK_INTERVAL")
+
+
+def get_all():
+    return _cache.get()
+
+
+def invalidate():
+    _cache.invalidate()
+
+
+# Changes committed by this process (e.g. manage_categories, add_category,
+# edit_category, delete_category) show up here at once.
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("categories_changed", False):
+        invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("categories_changed", None)
+
+
+def reconcile():
+    """Recount products per category and overwrite the counters."""
+    counts = dict(
+        db.session.query(Product.category_id, func.count(Product.id))
+        .filter(Product.category_id.isnot(None))
+        .group_by(Product.category_id)
+    )
+
+    StoreStat.query.filter(StoreStat.name.startswith(COUNT_PREFIX)).delete(
+        synchronize_session=False
+    )
+    for category_id, count in counts.items():
+        db.session.add(StoreStat(name=_count_key(category_id), value=count))
+
+    store_stats.add(VERSION_KEY, 1)
+    db.session.commit()
+    invalidate()
+    return counts
+
+
+def init_app(app):
+    @app.context_processor
+    def inject_categories():
+        return {"categories": get_all()}
+
+    with app.app_context():
+        if not store_stats.get(VERSION_KEY):
+            reconcile()
@@ -0,0 +1,182 @@
+import csv
+import io
+import json
+import zlib
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select
+
+from .models import db, Category, Order, OrderItem, Product, User
+
+
+# ------------------------------------------------
+# STREAMING EXPORTS
+# ------------------------------------------------
+# Generators that turn row iterators into file chunks, so a Response (or a
+# CLI command) can write any number of rows in constant memory.
+CHUNK_SIZE = 64 * 1024
+YIELD_PER = 1000
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def csv_chunks(header, rows):
+    """Yield ``header`` and ``rows`` as CSV text in ~CHUNK_SIZE pieces."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(header, rows):
+    """Yield one JSON object per row, batched into ~CHUNK_SIZE pieces."""
+    lines, size = [], 0
+
+    for row in rows:
+        line = json.dumps(dict(zip(header, row)), default=str) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(lines)
+            lines, size = [], 0
+
+    yield "".join(lines)
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of byte chunks into a gzip stream on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# ------------------------------------------------
+# DATASETS
+# ------------------------------------------------
+# Each dataset is a list of (column name, SQL expression) plus its joins.
+# Password hashes are never exported.
+def _users():
+    columns = [
+        ("id", User.id),
+        ("name", User.name),
+        ("email", User.email),
+        ("role", User.role),
+    ]
+    return columns, select(*[c for _, c in columns]).order_by(User.id)
+
+
+def _products():
+    columns = [
+        ("id", Product.id),
+        ("name", Product.name),
+        ("price", Product.price),
+        ("stock", Product.stock),
+        ("category_id", Product.category_id),
+        ("category", Category.name),
+        ("description", Product.description),
+        ("image", Product.image),
+    ]
+    query = (
+        select(*[c for _, c in columns])
+        .outerjoin(Category, Category.id == Product.category_id)
+        .order_by(Product.id)
+    )
+    return columns, query
+
+
+def _orders():
+    columns = [
+        ("id", Order.id),
+        ("user_id", Order.user_id),
+        ("email", User.email),
+        ("total_amount", Order.total_amount),
+        ("status", Order.status),
+        ("created_at", Order.created_at),
+    ]
+    query = (
+        select(*[c for _, c in columns])
+        .outerjoin(User, User.id == Order.user_id)
+        .order_by(Order.id)
+    )
+    return columns, query
+
+
+def _order_items():
+    columns = [
+        ("id", OrderItem.id),
+        ("order_id", OrderItem.order_id),
+        ("product_id", OrderItem.product_id),
+        ("product", Product.name),
+        ("quantity", OrderItem.quantity),
+        ("price", OrderItem.price),
+        ("created_at", Order.created_at),
+    ]
+    query = (
+        select(*[c for _, c in columns])
+        .join(Order, Order.id == OrderItem.order_id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .order_by(OrderItem.id)
+    )
+    return columns, query
+
+
+DATASETS = {
+    "users": _users,
+    "products": _products,
+    "orders": _orders,
+    "order_items": _order_items,
+}
+
+
+def filename(dataset, fmt, gzip=False):
+    return f"{dataset}.{fmt}" + (".gz" if gzip else "")
+
+
+def stream(dataset, fmt="csv", gzip=False):
+    """Yield ``dataset`` as encoded ``fmt`` bytes, optionally gzipped.
+
+    Rows are fetched YIELD_PER at a time with a server-side cursor, so
+    memory stays flat regardless of table size.
+    """
+    columns, query = DATASETS[dataset]()
+    header = [name for name, _ in columns]
+    rows = db.session.execute(query.execution_options(yield_per=YIELD_PER))
+
+    encode = csv_chunks if fmt == "csv" else jsonl_chunks
+    chunks = (text.encode() for text in encode(header, rows))
+
+    return gzip_chunks(chunks) if gzip else chunks
+
+
+cli = AppGroup("data", help="Bulk data exports.")
+
+
+@cli.command("export")
+@click.argument("dataset", type=click.Choice(list(DATASETS)))
+@click.option("--format", "fmt", type=click.Choice(list(FORMATS)), default="csv", show_default=True)
+@click.option("--gzip", is_flag=True, help="Compress the output.")
+@click.option("--out", help="Output file (default: <dataset>.<format>[.gz]).")
+def export_command(dataset, fmt, gzip, out):
+    """Stream a full table dump to a file."""
+    out = out or filename(dataset, fmt, gzip)
+
+    with open(out, "wb") as f:
+        for chunk in stream(dataset, fmt, gzip):
+            f.write(chunk)
+
+    click.echo(f"Wrote {out}")
@@ -0,0 +1,399 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app
+from sqlalchemy import bindparam, func
+
+from .models import db, Product, OrderItem, FlashSaleApplied, FlashSaleState
+from .upsert import insert_ignore
+
+
+# ------------------------------------------------
+# STOCK COUNTERS
+# ------------------------------------------------
+class StockCounters:
+    """Per-product stock counters shared by every worker process.
+
+    They live in a small SQLite file (FLASH_SALE_COUNTER_DB) next to the
+    main database, so gunicorn workers reserve from the same numbers. Every
+    write runs in a BEGIN IMMEDIATE transaction, so a reservation over
+    several products either succeeds for all of them or changes nothing.
+
+    Each reservation is also recorded as a hold until its order commits
+    (confirm) or fails (release). reset() subtracts recent holds from the
+    stock it loads, so checkouts in flight in other workers while the
+    counters are reloaded cannot oversell.
+    """
+
+    # Holds older than this belong to a worker that died mid-checkout.
+    HOLD_TTL = 300  # seconds
+
+    def __init__(self):
+        self._local = threading.local()
+        self.path = None
+
+    def configure(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+
+        self._connection().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS counters (
+                product_id INTEGER PRIMARY KEY,
+                remaining INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS holds (
+                token TEXT NOT NULL,
+                product_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_holds_token ON holds (token);
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO meta (name, value) VALUES ('pending', 0);
+            """
+        )
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+            self._local.depth = 0
+        return conn
+
+    def _transaction(self):
+        return _Immediate(self._connection(), self._local)
+
+    def get(self, product_id):
+        row = self._connection().execute(
+            "SELECT remaining FROM counters WHERE product_id = ?", (product_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def reserve(self, quantities):
+        """Take ``{product_id: qty}`` off the counters.
+
+        Returns ``(None, token)`` on success, otherwise the first product id
+        that does not have enough stock left and ``None``.
+        """
+        token = uuid.uuid4().hex
+
+        with self._transaction() as conn:
+            for product_id, qty in quantities.items():
+                if self._remaining(conn, product_id) < qty:
+                    return product_id, None
+
+            now = time.time()
+            for product_id, qty in quantities.items():
+                conn.execute(
+                    "UPDATE counters SET remaining = remaining - ? WHERE product_id = ?",
+                    (qty, product_id),
+                )
+                conn.execute(
+                    "INSERT INTO holds (token, product_id, quantity, created_at) VALUES (?, ?, ?, ?)",
+                    (token, product_id, qty, now),
+                )
+            conn.execute(
+                "UPDATE meta SET value = value + ? WHERE name = 'pending'",
+                (sum(quantities.values()),),
+            )
+
+        return None, token
+
+    def confirm(self, token):
+        """The order holding ``token`` committed; drop its holds."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM holds WHERE token = ?", (token,))
+
+    def release(self, token):
+        """Give back everything held by ``token``."""
+        with self._transaction() as conn:
+            held = conn.execute(
+                "SELECT product_id, quantity FROM holds WHERE token = ?", (token,)
+            ).fetchall()
+            for product_id, qty in held:
+                conn.execute(
+                    "UPDATE counters SET remaining = remaining + ? WHERE product_id = ?",
+                    (qty, product_id),
+                )
+            conn.execute(
+                "UPDATE meta SET value = MAX(value - ?, 0) WHERE name = 'pending'",
+                (sum(qty for _, qty in held),),
+            )
+            conn.execute("DELETE FROM holds WHERE token = ?", (token,))
+
+    def reset(self, load_stock):
+        """Reload the counters from ``load_stock()`` (``{product_id: stock}``).
+
+        Reservations are blocked while ``load_stock`` runs, so it can flush
+        and read Product.stock without a checkout slipping in between.
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM holds WHERE created_at < ?", (time.time() - self.HOLD_TTL,)
+            )
+            held = dict(
+                conn.execute("SELECT product_id, SUM(quantity) FROM holds GROUP BY product_id")
+            )
+            stock = load_stock()
+
+            conn.execute("DELETE FROM counters")
+            conn.executemany(
+                "INSERT INTO counters (product_id, remaining) VALUES (?, ?)",
+                [(pid, (qty or 0) - held.get(pid, 0)) for pid, qty in stock.items()],
+            )
+
+    def take_pending(self):
+        with self._transaction() as conn:
+            pending = self._pending(conn)
+            conn.execute("UPDATE meta SET value = 0 WHERE name = 'pending'")
+            return pending
+
+    @property
+    def pending(self):
+        return self._pending(self._connection())
+
+    @staticmethod
+    def _remaining(conn, product_id):
+        row = conn.execute(
+            "SELECT remaining FROM counters WHERE product_id = ?", (product_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _pending(conn):
+        return conn.execute("SELECT value FROM meta WHERE name = 'pending'").fetchone()[0]
+
+
+class _Immediate:
+    """BEGIN IMMEDIATE ... COMMIT; nested uses join the outer transaction."""
+
+    def __init__(self, conn, local):
+        self.conn = conn
+        self.local = local
+
+    def __enter__(self):
+        depth = getattr(self.local, "depth", 0)
+        if not depth:
+            self.conn.execute("BEGIN IMMEDIATE")
+        self.local.depth = depth + 1
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.local.depth -= 1
+        if not self.local.depth:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class Reservation:
+    """Quantities taken off the counters by one checkout."""
+
+    def __init__(self, quantities, token=None):
+        self.quantities = quantities
+        self.token = token
+
+    def __contains__(self, product_id):
+        return product_id in self.quantities
+
+    def __bool__(self):
+        return bool(self.quantities)
+
+
+counters = StockCounters()
+
+_flush_lock = threading.Lock()
+_flusher = {"pid": None}
+
+
+def product_ids():
+    return current_app.config["FLASH_SALE_PRODUCT_IDS"]
+
+
+def is_flash_product(product_id):
+    return product_id in product_ids()
+
+
+def available(product_id):
+    return counters.get(product_id)
+
+
+def reserve(quantities):
+    """Reserve the flash-sale part of ``{product_id: qty}``.
+
+    Returns ``(short_id, reservation)``; ``short_id`` is the first product
+    without enough stock, in which case nothing was reserved.
+    """
+    quantities = {pid: qty for pid, qty in quantities.items() if is_flash_product(pid)}
+    if not quantities:
+        return None, Reservation({})
+
+    short_id, token = counters.reserve(quantities)
+    return short_id, Reservation(quantities if token else {}, token)
+
+
+def confirm(reservation):
+    if reservation.token:
+        counters.confirm(reservation.token)
+
+
+def release(reservation):
+    if reservation.token:
+        counters.release(reservation.token)
+
+
+# ------------------------------------------------
+# WRITE-BEHIND PERSISTENCE
+# ------------------------------------------------
+# Ledger rows per INSERT, well under SQLite's bound-parameter limit
+LEDGER_CHUNK = 500
+
+
+def flush():
+    """Apply every flash-sale OrderItem missing from the flash_sale_applied
+    ledger to Product.stock in one transaction.
+
+    The same pass doubles as crash recovery: decrements that never reached
+    the database are recomputed from the OrderItem rows themselves. Items
+    are recorded one by one rather than behind an id watermark because ids
+    are not committed in order: on PostgreSQL an item committed after a
+    higher id was flushed would be skipped for good. Workers may flush at
+    the same time; one that finds items already recorded rolls back.
+    """
+    with _flush_lock:
+        counters.take_pending()
+
+        items = (
+            db.session.query(OrderItem.id, OrderItem.product_id, OrderItem.quantity)
+            .join(FlashSaleState, FlashSaleState.product_id == OrderItem.product_id)
+            .outerjoin(
+                FlashSaleApplied, FlashSaleApplied.order_item_id == OrderItem.id
+            )
+            .filter(
+                OrderItem.id > FlashSaleState.applied_item_id,
+                FlashSaleApplied.order_item_id.is_(None),
+            )
+            .all()
+        )
+
+        if not items:
+            db.session.rollback()
+            return 0
+
+        recorded = 0
+        for start in range(0, len(items), LEDGER_CHUNK):
+            recorded += db.session.execute(
+                insert_ignore(
+                    FlashSaleApplied.__table__,
+                    [
+                        {"order_item_id": item_id, "product_id": pid}
+                        for item_id, pid, _ in items[start : start + LEDGER_CHUNK]
+                    ],
+                )
+            ).rowcount
+        if recorded != len(items):
+            db.session.rollback()
+            return 0
+
+        deltas = {}
+        for _, pid, qty in items:
+            deltas[pid] = deltas.get(pid, 0) + (qty or 0)
+
+        db.session.execute(
+            Product.__table__.update()
+            .where(Product.id == bindparam("pid"))
+            .values(stock=Product.stock - bindparam("delta")),
+            [{"pid": pid, "delta": qty} for pid, qty in deltas.items()],
+        )
+        db.session.commit()
+
+        return len(deltas)
+
+
+def maybe_flush():
+    """Flush early once a batch of sales has built up; the timer started in
+    init_app covers the rest."""
+    if counters.pending >= current_app.config["FLASH_SALE_FLUSH_BATCH"]:
+        flush()
+
+
+def _flush_periodically(app):
+    while True:
+        time.sleep(app.config["FLASH_SALE_FLUSH_INTERVAL"])
+        try:
+            with app.app_context():
+                if counters.pending:
+                    flush()
+        except Exception:
+            app.logger.exception("Flash-sale flush failed")
+
+
+def _start_flusher(app):
+    # Threads do not survive a fork, so each worker starts its own
+    if _flusher["pid"] == os.getpid():
+        return
+    _flusher["pid"] = os.getpid()
+    threading.Thread(
+        target=_flush_periodically, args=(app,), name="flash-sale-flush", daemon=True
+    ).start()
+
+
+def reconcile():
+    """Bring the flash-sale tables and counters in line with the database.
+
+    Flushes anything left over from a previous run (including products that
+    have since left the sale), drops their state and ledger rows, starts
+    state for newly added products and reloads the counters from
+    Product.stock.
+    """
+    flush()
+
+    ids = set(product_ids())
+
+    FlashSaleState.query.filter(~FlashSaleState.product_id.in_(ids)).delete(
+        synchronize_session=False
+    )
+    FlashSaleApplied.query.filter(~FlashSaleApplied.product_id.in_(ids)).delete(
+        synchronize_session=False
+    )
+
+    tracked = {s.product_id for s in FlashSaleState.query.all()}
+    last_item_id = db.session.query(func.max(OrderItem.id)).scalar() or 0
+
+    for product_id in ids - tracked:
+        db.session.add(
+            FlashSaleState(product_id=product_id, applied_item_id=last_item_id)
+        )
+
+    db.session.commit()
+
+    def load_stock():
+        flush()
+        return dict(
+            db.session.query(Product.id, Product.stock).filter(Product.id.in_(ids))
+        )
+
+    counters.reset(load_stock)
+
+
+def init_app(app):
+    counters.configure(app.config["FLASH_SALE_COUNTER_DB"])
+
+    with app.app_context():
+        reconcile()
+
+    if app.config["FLASH_SALE_PRODUCT_IDS"]:
+        _start_flusher(app)
+
+        @app.before_request
+        def ensure_flash_sale_flusher():
+            _start_flusher(app)
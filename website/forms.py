@@ -2,7 +2,7 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, Email, EqualTo, Length
 from wtforms import StringField, FloatField, IntegerField, BooleanField, SubmitField, FileField, TextAreaField
-from wtforms.validators import DataRequired
+from wtforms.validators import DataRequired, InputRequired, NumberRange
 
 # -----------------------------
 # SIGNUP FORM
@@ -42,4 +42,5 @@ class CategoryForm(FlaskForm):
 class SettingsForm(FlaskForm):
     store_name = StringField("Store Name", validators=[DataRequired()])
     contact_email = StringField("Contact Email", validators=[DataRequired()])
+    gst_rate = FloatField("GST Rate (%)", validators=[InputRequired(), NumberRange(min=0, max=100)])
     submit = SubmitField("Save Settings")
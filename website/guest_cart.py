@@ -0,0 +1,122 @@
+from flask import current_app, session
+
+from .models import db, Cart, Product
+from .upsert import add_cart_quantities
+from . import user_summary
+
+
+# The guest cart lives in the signed session cookie as "pid:qty,pid:qty"
+# which keeps a full cart well inside the 4 KB cookie limit.
+SESSION_KEY = "cart"
+
+
+class CartFull(Exception):
+    """Adding a new product would take the cart past CART_MAX_LINES."""
+
+
+def _decode(raw):
+    quantities = {}
+    for entry in filter(None, (raw or "").split(",")):
+        product_id, _, qty = entry.partition(":")
+        quantities[int(product_id)] = int(qty)
+    return quantities
+
+
+def _encode(quantities):
+    return ",".join(f"{pid}:{qty}" for pid, qty in quantities.items() if qty > 0)
+
+
+def get_items():
+    return _decode(session.get(SESSION_KEY))
+
+
+def save_items(quantities):
+    encoded = _encode(quantities)
+    if encoded:
+        session[SESSION_KEY] = encoded
+    else:
+        session.pop(SESSION_KEY, None)
+
+
+def known_ids(product_ids):
+    """The subset of ``product_ids`` that exist as Product rows. Cookie
+    contents are client-controlled, so ids are checked before they are
+    stored or merged into Cart rows (which reference product.id)."""
+    if not product_ids:
+        return set()
+    return {
+        pid
+        for (pid,) in db.session.query(Product.id).filter(Product.id.in_(list(product_ids)))
+    }
+
+
+def add(product_id, qty=1):
+    """Add ``qty`` of a product, up to CART_MAX_QUANTITY; returns True if it
+    was already in the cart. Raises CartFull instead of adding a line past
+    CART_MAX_LINES."""
+    quantities = get_items()
+    existed = product_id in quantities
+    if not existed and len(quantities) >= current_app.config["CART_MAX_LINES"]:
+        raise CartFull()
+
+    quantities[product_id] = min(
+        quantities.get(product_id, 0) + qty, current_app.config["CART_MAX_QUANTITY"]
+    )
+    save_items(quantities)
+    return existed
+
+
+def update(product_id, action):
+    quantities = get_items()
+    if product_id not in quantities:
+        return
+
+    if action == "increase":
+        quantities[product_id] = min(
+            quantities[product_id] + 1, current_app.config["CART_MAX_QUANTITY"]
+        )
+    elif action == "decrease":
+        quantities[product_id] -= 1
+
+    save_items(quantities)
+
+
+def remove(product_id):
+    quantities = get_items()
+    if quantities.pop(product_id, None) is not None:
+        save_items(quantities)
+        return True
+    return False
+
+
+def clear():
+    session.pop(SESSION_KEY, None)
+
+
+def merge_into(user):
+    """Move the guest cart into the user's Cart rows with one bulk upsert.
+
+    Merged lines stop at CART_MAX_QUANTITY, and guest products that would
+    take the cart past CART_MAX_LINES are dropped.
+    """
+    max_quantity = current_app.config["CART_MAX_QUANTITY"]
+    quantities = get_items()
+    known = known_ids(quantities)
+    quantities = {
+        pid: min(qty, max_quantity) for pid, qty in quantities.items() if pid in known
+    }
+    if not quantities:
+        clear()
+        return
+
+    existing = {
+        pid for (pid,) in db.session.query(Cart.product_id).filter_by(user_id=user.id)
+    }
+    room = max(current_app.config["CART_MAX_LINES"] - len(existing), 0)
+    for pid in [pid for pid in quantities if pid not in existing][room:]:
+        del quantities[pid]
+
+    add_cart_quantities(user.id, quantities, max_quantity)
+    db.session.commit()
+    user_summary.invalidate(user.id)
+    clear()
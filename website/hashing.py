@@ -0,0 +1,52 @@
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from .workers import BoundedPool, PoolBusy
+
+
+# ------------------------------------------------
+# PASSWORD HASHING SERVICE
+# ------------------------------------------------
+# scrypt/pbkdf2 are deliberately slow, so they run in a small process pool
+# instead of on the request thread. At most PASSWORD_HASH_MAX_PENDING jobs
+# may be queued; beyond that requests fail fast with HashingBusy (503).
+
+
+class HashingBusy(PoolBusy):
+    pass
+
+
+_pool = BoundedPool("PASSWORD_HASH", HashingBusy)
+
+
+def method():
+    return current_app.config["PASSWORD_HASH_METHOD"]
+
+
+def hash_password(password):
+    return _pool.run(generate_password_hash, password, method())
+
+
+def verify(pwhash, password):
+    return _pool.run(check_password_hash, pwhash, password)
+
+
+@lru_cache(maxsize=None)
+def _prefix(method):
+    """The method prefix werkzeug actually writes for ``method``, which
+    expands defaults, e.g. "scrypt" -> "scrypt:32768:8:1"."""
+    return generate_password_hash("", method).split("$", 1)[0]
+
+
+def needs_rehash(pwhash):
+    """True if ``pwhash`` was made with other cost parameters than the
+    configured ones, e.g. "scrypt:32768:8:1" vs "scrypt:65536:8:1"."""
+    return pwhash.split("$", 1)[0] != _prefix(method())
+
+
+def init_app(app):
+    @app.errorhandler(HashingBusy)
+    def hashing_busy(e):
+        return "Too many sign-in attempts right now, please try again shortly.", 503
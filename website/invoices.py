@@ -0,0 +1,380 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import zipfile
+from collections import deque
+from html import escape
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, object_session, selectinload
+
+from .models import Order, OrderItem
+from .workers import BoundedPool, PoolBusy
+from . import store_settings
+
+
+# Bump whenever the POS layout below changes so cached PDFs are rebuilt.
+TEMPLATE_VERSION = 3
+
+
+# ------------------------------------------------
+# INVOICE DATA
+# ------------------------------------------------
+def pos_invoice_data(order):
+    """Everything printed on a POS receipt, as plain picklable data."""
+    return {
+        "order_id": order.id,
+        "created_at": order.created_at.strftime("%d-%m-%Y %H:%M"),
+        "customer": order.user.name if order.user else "",
+        "status": order.status,
+        "store_name": store_settings.get("store_name"),
+        "gst_rate": store_settings.get("gst_rate"),
+        "items": [
+            [item.product.name if item.product else "Product", item.quantity, item.price]
+            for item in order.items
+        ],
+        "template_version": TEMPLATE_VERSION,
+    }
+
+
+def load_order(order_id, user_id=None):
+    query = Order.query.options(
+        joinedload(Order.user),
+        joinedload(Order.items).joinedload(OrderItem.product),
+    ).filter(Order.id == order_id)
+
+    if user_id is not None:
+        query = query.filter(Order.user_id == user_id)
+
+    return query.first_or_404()
+
+
+def digest(data):
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()[:32]
+
+
+# ------------------------------------------------
+# POS LAYOUT
+# ------------------------------------------------
+# ReportLab is imported on first render, so processes that never build a PDF
+# never load it. The stylesheet and table style are built once per process
+# and shared by every invoice rendered there.
+_layout = None
+
+
+def _get_layout():
+    global _layout
+
+    if _layout is None:
+        from reportlab.platypus import (
+            SimpleDocTemplate,
+            Paragraph,
+            Spacer,
+            Table,
+            TableStyle,
+        )
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.pagesizes import mm
+        from reportlab.lib import colors
+
+        styles = getSampleStyleSheet()
+
+        _layout = SimpleNamespace(
+            SimpleDocTemplate=SimpleDocTemplate,
+            Paragraph=Paragraph,
+            Spacer=Spacer,
+            Table=Table,
+            mm=mm,
+            title=styles["Title"],
+            normal=styles["Normal"],
+            table_style=TableStyle([
+                ("GRID", (0,0), (-1,-1), 0.5, colors.black),
+                ("FONT", (0,0), (-1,0), "Helvetica-Bold"),
+                ("ALIGN", (1,1), (-1,-1), "CENTER"),
+            ]),
+        )
+
+    return _layout
+
+
+def render_pos_invoice(data):
+    layout = _get_layout()
+    Paragraph, Spacer, mm = layout.Paragraph, layout.Spacer, layout.mm
+
+    buffer = io.BytesIO()
+
+    # 🧾 POS size (80mm width)
+    doc = layout.SimpleDocTemplate(
+        buffer,
+        pagesize=(80 * mm, 200 * mm),
+        rightMargin=10,
+        leftMargin=10,
+        topMargin=10,
+        bottomMargin=10
+    )
+
+    elements = []
+
+    # 🟢 STORE HEADER
+    elements.append(Paragraph(
+        f"<b>{escape(data['store_name'].upper())}</b><br/>Fresh & Organic Store<br/>----------------------",
+        layout.title
+    ))
+
+    elements.append(Spacer(1, 6))
+
+    elements.append(Paragraph(
+        f"""
+        Invoice: ORD{data["order_id"]}<br/>
+        Date: {data["created_at"]}<br/>
+        Customer: {escape(data["customer"])}
+        <br/>----------------------
+        """,
+        layout.normal
+    ))
+
+    # 🧾 ITEMS
+    rows = [["Item", "Qty", "Amt"]]
+    subtotal = 0
+
+    for name, quantity, price in data["items"]:
+        total = price * quantity
+        subtotal += total
+        rows.append([
+            name[:12],
+            str(quantity),
+            f"{total:.2f}"
+        ])
+
+    table = layout.Table(rows, colWidths=[35*mm, 10*mm, 15*mm])
+    table.setStyle(layout.table_style)
+
+    elements.append(table)
+    elements.append(Spacer(1, 6))
+
+    tax = round(subtotal * float(data["gst_rate"]) / 100, 2)
+    grand = subtotal + tax
+
+    elements.append(Paragraph(
+        f"""
+        ----------------------<br/>
+        Subtotal: ${subtotal:.2f}<br/>
+        GST ({data["gst_rate"]}%): ${tax:.2f}<br/>
+        <b>Total: ${grand:.2f}</b><br/>
+        ----------------------<br/>
+        Thank you....!!<br/>
+        Visit Again!
+        """,
+        layout.normal
+    ))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+class RenderBusy(PoolBusy):
+    pass
+
+
+# On-demand PDFs render on their own bounded pool so a burst of slow
+# invoices cannot tie up the threads serving pages.
+_render_pool = BoundedPool("INVOICE_RENDER", RenderBusy)
+
+
+# ------------------------------------------------
+# ON-DISK CACHE
+# ------------------------------------------------
+# Files are named ORD<id>-<digest>.pdf where the digest covers every value
+# printed on the receipt plus TEMPLATE_VERSION, so a changed order can never
+# be served a stale PDF; invalidation only cleans up superseded files.
+def _cache_dir():
+    path = current_app.config["INVOICE_CACHE_DIR"]
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def cached_pos_invoice(data):
+    """Return ``(path, etag)`` of the rendered PDF, rendering it on a miss."""
+    etag = digest(data)
+    path = os.path.join(_cache_dir(), f"ORD{data['order_id']}-{etag}.pdf")
+
+    if not os.path.exists(path):
+        pdf = _render_pool.run(render_pos_invoice, data)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp, path)
+
+    return path, etag
+
+
+def invalidate(order_id):
+    pattern = os.path.join(current_app.config["INVOICE_CACHE_DIR"], f"ORD{order_id}-*.pdf")
+    for path in glob.glob(pattern):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Drop cached PDFs once a change to an order or its items is committed,
+# e.g. from admin.update_order_status.
+@event.listens_for(Order, "after_update")
+@event.listens_for(Order, "after_delete")
+def _order_changed(mapper, connection, target):
+    _mark(target, target.id)
+
+
+@event.listens_for(OrderItem, "after_insert")
+@event.listens_for(OrderItem, "after_update")
+@event.listens_for(OrderItem, "after_delete")
+def _item_changed(mapper, connection, target):
+    _mark(target, target.order_id)
+
+
+def _mark(target, order_id):
+    session = object_session(target)
+    if session is not None and order_id is not None:
+        mark_orders(session, [order_id])
+
+
+def mark_orders(session, order_ids):
+    """Drop the cached PDFs of ``order_ids`` when ``session`` commits; for
+    bulk statements that bypass the ORM events above."""
+    session.info.setdefault("changed_orders", set()).update(order_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed(session):
+    order_ids = session.info.pop("changed_orders", ())
+    if order_ids and has_app_context():
+        for order_id in order_ids:
+            invalidate(order_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed(session):
+    session.info.pop("changed_orders", None)
+
+
+# ------------------------------------------------
+# BULK EXPORT
+# ------------------------------------------------
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
+def export_query(start=None, end=None, status=None):
+    """Orders created in ``[start, end]`` (whole days) with an optional status."""
+    query = Order.query.options(
+        selectinload(Order.user),
+        selectinload(Order.items).selectinload(OrderItem.product),
+    )
+
+    if start:
+        query = query.filter(Order.created_at >= start)
+    if end:
+        query = query.filter(Order.created_at < end + timedelta(days=1))
+    if status:
+        query = query.filter(Order.status == status)
+
+    return query.order_by(Order.id)
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only sink for ZipFile that hands back what was written so far.
+
+    It is not seekable, so ZipFile streams each entry with a trailing data
+    descriptor instead of seeking back to patch the header.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_zip(query):
+    """Yield a ZIP of POS invoices for ``query`` chunk by chunk.
+
+    Rendering runs in a process pool with at most INVOICE_EXPORT_WINDOW PDFs
+    in flight, so neither the orders nor the archive are ever held in memory
+    as a whole. An order that fails to render is written as
+    ``POS_ORD<id>.error.txt``.
+    """
+    config = current_app.config
+    window = config["INVOICE_EXPORT_WINDOW"]
+    stream = _ZipStream()
+
+    with ProcessPoolExecutor(max_workers=config["INVOICE_EXPORT_WORKERS"]) as pool:
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as archive:
+            in_flight = deque()
+
+            def write_oldest():
+                order_id, future = in_flight.popleft()
+                try:
+                    archive.writestr(f"POS_ORD{order_id}.pdf", future.result())
+                except Exception as e:
+                    # Response headers are already sent, so one bad order
+                    # gets an error entry instead of truncating the archive.
+                    current_app.logger.exception("Invoice ORD%s failed to render", order_id)
+                    archive.writestr(f"POS_ORD{order_id}.error.txt", f"{type(e).__name__}: {e}\n")
+                return stream.drain()
+
+            for order in query.yield_per(window):
+                data = pos_invoice_data(order)
+                in_flight.append(
+                    (order.id, pool.submit(render_pos_invoice, data))
+                )
+                if len(in_flight) >= window:
+                    yield write_oldest()
+
+            while in_flight:
+                yield write_oldest()
+
+        yield stream.drain()
+
+
+def init_app(app):
+    @app.errorhandler(RenderBusy)
+    def render_busy(e):
+        return "Invoices are busy right now, please try again shortly.", 503
+
+
+cli = AppGroup("invoices", help="POS invoice tools.")
+
+
+@cli.command("export")
+@click.option("--from", "start", help="First order date (YYYY-MM-DD).")
+@click.option("--to", "end", help="Last order date (YYYY-MM-DD).")
+@click.option("--status", help="Only orders with this status.")
+@click.option("--out", default="invoices.zip", show_default=True)
+def export_command(start, end, status, out):
+    """Render POS invoices for many orders into one ZIP file."""
+    query = export_query(parse_date(start), parse_date(end), status)
+
+    with open(out, "wb") as f:
+        for chunk in export_zip(query):
+            f.write(chunk)
+
+    click.echo(f"Wrote {out}")
@@ -0,0 +1,342 @@
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+from flask import Response, abort, current_app, g, has_request_context, request
+from flask import before_render_template, template_rendered
+from flask_login import current_user
+
+from . import query_timing
+
+
+# ------------------------------------------------
+# REQUEST METRICS
+# ------------------------------------------------
+# Every request records its latency, status, response size, SQL statement
+# count/time and template render time. Each thread writes only to its own
+# shard, so the request path takes no locks; /metrics sums the shards.
+#
+# Under gunicorn each worker also saves a snapshot to METRICS_DIR/<pid>.json
+# every METRICS_FLUSH_INTERVAL seconds, and whichever worker serves /metrics
+# adds the other workers' snapshots to its own live numbers.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7)
+
+METRICS = {
+    "greenmart_http_requests_total": (
+        "counter", "Requests by endpoint, method and status."),
+    "greenmart_http_request_duration_seconds": (
+        "histogram", "Request latency by endpoint."),
+    "greenmart_http_response_size_bytes": (
+        "histogram", "Response body size by endpoint (when known)."),
+    "greenmart_sql_queries_per_request": (
+        "histogram", "SQL statements executed per request by endpoint."),
+    "greenmart_sql_query_seconds_total": (
+        "counter", "Time spent in SQL statements by endpoint."),
+    "greenmart_template_render_seconds_total": (
+        "counter", "Time spent rendering each template."),
+    "greenmart_template_renders_total": (
+        "counter", "Renders of each template."),
+}
+
+
+class _Shard:
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1):
+        self.counters[(name, labels)] += value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        data = self.histograms.get(key)
+        if data is None:
+            data = self.histograms[key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+
+_local = threading.local()
+_shards = []
+_retired = _Shard()
+_shards_lock = threading.Lock()  # taken once per thread and by collect()
+_state = SimpleNamespace(flushed_at=0.0)
+
+
+def _shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def _merge(into, counters, histograms):
+    for key, value in counters.items():
+        into["counters"][key] = into["counters"].get(key, 0) + value
+    for key, data in histograms.items():
+        current = into["histograms"].get(key)
+        into["histograms"][key] = (
+            list(data) if current is None else [a + b for a, b in zip(current, data)]
+        )
+
+
+def collect():
+    """This process's metrics as ``{"counters": {...}, "histograms": {...}}``."""
+    snapshot = {"counters": {}, "histograms": {}}
+
+    with _shards_lock:
+        # Fold shards of finished threads into one, so per-request threads
+        # (e.g. the dev server) do not grow the list forever.
+        for shard in [s for s in _shards if not s.thread.is_alive()]:
+            _shards.remove(shard)
+            for key, value in shard.counters.items():
+                _retired.counters[key] += value
+            for key, data in shard.histograms.items():
+                current = _retired.histograms.setdefault(key, [0] * len(data))
+                _retired.histograms[key] = [a + b for a, b in zip(current, data)]
+        shards = [_retired, *_shards]
+
+    for shard in shards:
+        _merge(
+            snapshot,
+            shard.counters.copy(),
+            {key: list(data) for key, data in shard.histograms.copy().items()},
+        )
+
+    return snapshot
+
+
+# ------------------------------------------------
+# MULTI-WORKER SNAPSHOTS
+# ------------------------------------------------
+def _encode(snapshot):
+    def key(k):
+        return json.dumps([k[0], list(k[1])])
+
+    return {
+        "counters": {key(k): v for k, v in snapshot["counters"].items()},
+        "histograms": {key(k): v for k, v in snapshot["histograms"].items()},
+    }
+
+
+def _decode(data):
+    def key(k):
+        name, labels = json.loads(k)
+        return name, tuple(tuple(pair) for pair in labels)
+
+    return {
+        "counters": {key(k): v for k, v in data["counters"].items()},
+        "histograms": {key(k): v for k, v in data["histograms"].items()},
+    }
+
+
+def _snapshot_path(pid):
+    return os.path.join(current_app.config["METRICS_DIR"], f"{pid}.json")
+
+
+def save_snapshot():
+    path = _snapshot_path(os.getpid())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(_encode(collect()), f)
+    os.replace(tmp, path)
+
+
+def _maybe_save_snapshot():
+    now = time.monotonic()
+    if now - _state.flushed_at >= current_app.config["METRICS_FLUSH_INTERVAL"]:
+        _state.flushed_at = now
+        save_snapshot()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect_all():
+    """Live metrics of this process plus the latest snapshot of every other
+    running worker sharing METRICS_DIR. Snapshots of exited workers are
+    removed; Prometheus treats the drop as a counter reset."""
+    combined = collect()
+
+    for path in glob.glob(os.path.join(current_app.config["METRICS_DIR"], "*.json")):
+        pid = int(os.path.basename(path).split(".")[0])
+        if pid == os.getpid():
+            continue
+        if not _alive(pid):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                other = _decode(json.load(f))
+        except (OSError, ValueError):
+            continue
+        _merge(combined, other["counters"], other["histograms"])
+
+    return combined
+
+
+# ------------------------------------------------
+# PROMETHEUS TEXT FORMAT
+# ------------------------------------------------
+_BUCKETS = {
+    "greenmart_http_request_duration_seconds": DURATION_BUCKETS,
+    "greenmart_http_response_size_bytes": SIZE_BUCKETS,
+    "greenmart_sql_queries_per_request": QUERY_BUCKETS,
+}
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(snapshot):
+    lines = []
+
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        if kind == "counter":
+            for (metric, labels), value in sorted(snapshot["counters"].items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            continue
+
+        buckets = _BUCKETS[name]
+        for (metric, labels), data in sorted(snapshot["histograms"].items()):
+            if metric != name:
+                continue
+            for bound, count in zip(buckets, data):
+                lines.append(f"{name}_bucket{_labels((*labels, ('le', _number(bound))))} {count}")
+            lines.append(f"{name}_bucket{_labels((*labels, ('le', '+Inf')))} {data[-1]}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(data[-2])}")
+            lines.append(f"{name}_count{_labels(labels)} {data[-1]}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------------------------------
+# HOOKS
+# ------------------------------------------------
+def _request_stats():
+    if has_request_context():
+        return g.get("_metrics")
+    return None
+
+
+def _query_timed(conn, cursor, statement, parameters, context, executemany, elapsed):
+    stats = _request_stats()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_time += elapsed
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None:
+        stats.render_started.append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None and stats.render_started:
+        elapsed = time.perf_counter() - stats.render_started.pop()
+        labels = (("template", template.name or "<string>"),)
+        shard = _shard()
+        shard.inc("greenmart_template_render_seconds_total", labels, elapsed)
+        shard.inc("greenmart_template_renders_total", labels)
+
+
+def init_app(app):
+    query_timing.init_app(app)
+    query_timing.observe(_query_timed)
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def start_request_metrics():
+        g._metrics = SimpleNamespace(
+            started=time.perf_counter(), sql_count=0, sql_time=0.0, render_started=[]
+        )
+
+    @app.after_request
+    def record_request_metrics(response):
+        stats = g.pop("_metrics", None)
+        if stats is None:
+            return response
+
+        endpoint = request.endpoint or "<unmatched>"
+        route = (("endpoint", endpoint),)
+        shard = _shard()
+
+        shard.inc(
+            "greenmart_http_requests_total",
+            (*route, ("method", request.method), ("status", str(response.status_code))),
+        )
+        shard.observe(
+            "greenmart_http_request_duration_seconds", route,
+            time.perf_counter() - stats.started, DURATION_BUCKETS,
+        )
+        shard.observe(
+            "greenmart_sql_queries_per_request", route, stats.sql_count, QUERY_BUCKETS
+        )
+        shard.inc("greenmart_sql_query_seconds_total", route, stats.sql_time)
+
+        if response.content_length is not None:
+            shard.observe(
+                "greenmart_http_response_size_bytes", route,
+                response.content_length, SIZE_BUCKETS,
+            )
+
+        _maybe_save_snapshot()
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        # Scrapers send the token; without one configured only admins may look.
+        token = current_app.config["METRICS_TOKEN"]
+        if token:
+            if not hmac.compare_digest(
+                request.headers.get("Authorization", ""), f"Bearer {token}"
+            ):
+                abort(403)
+        elif not (current_user.is_authenticated and current_user.role == "admin"):
+            abort(403)
+
+        return Response(render(collect_all()), mimetype="text/plain; version=0.0.4")
@@ -1,7 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from . import hashing
 
 db = SQLAlchemy()
 
@@ -16,10 +16,18 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(20), default="customer")
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hashing.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not hashing.verify(self.password_hash, password):
+            return False
+
+        # Transparently move old hashes to the configured cost parameters;
+        # the caller's next commit persists the new hash.
+        if hashing.needs_rehash(self.password_hash):
+            self.set_password(password)
+
+        return True
 
 
 class Product(db.Model):
@@ -32,10 +40,16 @@ class Product(db.Model):
     description = db.Column(db.String(500))
     stock = db.Column(db.Integer, default=0)
 
-    category_id = db.Column(
-        db.Integer,
-        db.ForeignKey("category.id"),
-        nullable=True
+    # active_history loads the old value before it is replaced, so the
+    # category registry can move a product's count even when category_id
+    # was expired (e.g. by the previous commit).
+    category_id = db.column_property(
+        db.Column(
+            db.Integer,
+            db.ForeignKey("category.id"),
+            nullable=True
+        ),
+        active_history=True,
     )
 
 
@@ -92,8 +106,8 @@ class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
     total_amount = db.Column(db.Float)
-    status = db.Column(db.String(20), default="pending")
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), default="pending", index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     # Relationships
     user = db.relationship("User", backref=db.backref("orders", lazy=True))
@@ -117,3 +131,93 @@ class Category(db.Model):
 
     products = db.relationship("Product", backref="category")
 
+
+class Setting(db.Model):
+    __tablename__ = "settings"
+
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.String(500), nullable=False)
+
+
+class FlashSaleState(db.Model):
+    __tablename__ = "flash_sale_state"
+
+    # Highest OrderItem.id when the product joined the sale; checkout took
+    # those items off Product.stock itself.
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), primary_key=True)
+    applied_item_id = db.Column(db.Integer, default=0, nullable=False)
+
+
+class FlashSaleApplied(db.Model):
+    __tablename__ = "flash_sale_applied"
+
+    # Flash-sale OrderItems already taken off Product.stock by a flush.
+    order_item_id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+
+
+class StoreStat(db.Model):
+    __tablename__ = "store_stats"
+
+    # Running row counts (users, products, orders, ...) kept up to date by
+    # ORM events in store_stats.py so dashboards never run COUNT(*).
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+
+# ------------------------------------------------
+# SALES ROLLUPS (maintained by analytics.py)
+# ------------------------------------------------
+class SalesDaily(db.Model):
+    __tablename__ = "sales_daily"
+
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, default=0, nullable=False)
+    units = db.Column(db.Integer, default=0, nullable=False)
+    revenue = db.Column(db.Float, default=0, nullable=False)
+
+
+class SalesDailyProduct(db.Model):
+    __tablename__ = "sales_daily_product"
+
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer)
+    orders = db.Column(db.Integer, default=0, nullable=False)
+    units = db.Column(db.Integer, default=0, nullable=False)
+    revenue = db.Column(db.Float, default=0, nullable=False)
+
+
+class SalesDirtyDay(db.Model):
+    __tablename__ = "sales_dirty_day"
+
+    # Days whose orders changed since their rollup rows were last built.
+    day = db.Column(db.Date, primary_key=True)
+
+
+class SalesRollupChange(db.Model):
+    __tablename__ = "sales_rollup_change"
+
+    # Days rebuilt at each rollup version, so workers patch their cached
+    # arrays instead of reloading every row.
+    version = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+
+
+class ProductForecast(db.Model):
+    __tablename__ = "product_forecast"
+
+    # EWMA of units sold per day as of the store_stats "stockout_forecast_day"
+    # and the days of stock that leaves; NULL when the product is not selling.
+    product_id = db.Column(db.Integer, primary_key=True)
+    velocity = db.Column(db.Float, default=0, nullable=False)
+    days_left = db.Column(db.Float)
+
+
+# Serves the stock-out report's "WHERE days_left <= ? ORDER BY days_left,
+# velocity DESC LIMIT ?" without a sort
+db.Index(
+    "ix_product_forecast_rank",
+    ProductForecast.days_left,
+    ProductForecast.velocity.desc(),
+)
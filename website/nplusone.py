@@ -0,0 +1,112 @@
+import os
+import re
+import traceback
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from .models import db
+
+
+# ------------------------------------------------
+# N+1 QUERY DETECTOR
+# ------------------------------------------------
+# Counts each statement shape (its SQL with literals and IN lists folded)
+# per request. A shape run more than NPLUSONE_THRESHOLD times is reported
+# with the website/ line that issued it, which is almost always a lazy
+# load or a .get() inside a loop. With NPLUSONE_STRICT the request fails
+# instead, so tests catch regressions.
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_in_lists = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s|:\w+|__\[POSTCOMPILE_\w+\])\s*,?)+\)", re.I)
+_spaces = re.compile(r"\s+")
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def fingerprint(statement):
+    """Normalise ``statement`` so repeated queries differing only in
+    literal values or IN-list length compare equal."""
+    shape = _literals.sub("?", statement)
+    shape = _in_lists.sub("IN (...)", shape)
+    return _spaces.sub(" ", shape).strip()
+
+
+def _call_site():
+    """The innermost frame in this package outside this module."""
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(PACKAGE_DIR) and path != os.path.abspath(__file__):
+            return f"{os.path.relpath(path, os.path.dirname(PACKAGE_DIR))}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    state = g.get("_nplusone")
+    if state is None:
+        return
+
+    shape = fingerprint(statement)
+    state["counts"][shape] += 1
+
+    # Capture the call site once, when the shape first crosses the threshold
+    if state["counts"][shape] == state["threshold"] + 1:
+        state["sites"][shape] = _call_site()
+
+
+def detected():
+    """Repeated statement shapes of the current request as
+    ``[(count, call_site, fingerprint)]``, worst first."""
+    state = g.get("_nplusone")
+    if state is None:
+        return []
+
+    return sorted(
+        (
+            (count, state["sites"].get(shape, "unknown"), shape)
+            for shape, count in state["counts"].items()
+            if count > state["threshold"]
+        ),
+        reverse=True,
+    )
+
+
+def init_app(app):
+    if not app.config["NPLUSONE_ENABLED"]:
+        return
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+
+    @app.before_request
+    def start_nplusone():
+        g._nplusone = {
+            "threshold": current_app.config["NPLUSONE_THRESHOLD"],
+            "counts": Counter(),
+            "sites": {},
+        }
+
+    @app.after_request
+    def report_nplusone(response):
+        problems = detected()
+        g.pop("_nplusone", None)
+
+        if not problems:
+            return response
+
+        report = "\n".join(
+            f"  {count}x at {site}: {shape[:200]}" for count, site, shape in problems
+        )
+        message = f"N+1 queries in {request.method} {request.path} ({request.endpoint}):\n{report}"
+
+        if current_app.config["NPLUSONE_STRICT"]:
+            raise NPlusOneError(message)
+
+        current_app.logger.warning(message)
+        return response
@@ -0,0 +1,59 @@
+from sqlalchemy import select, update
+
+from .models import db, Order
+from . import analytics, invoices
+
+
+# ------------------------------------------------
+# ORDER STATUS TRANSITIONS
+# ------------------------------------------------
+# Delivered and cancelled orders are final.
+TRANSITIONS = {
+    "pending": {"approved", "cancelled"},
+    "approved": {"delivered", "cancelled"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+def spellings(statuses):
+    """Stored forms of ``statuses``: checkout writes "Pending" while admin
+    updates write lowercase."""
+    return {s for status in statuses for s in (status, status.capitalize())}
+
+
+def allowed_from(new_status):
+    return [status for status, targets in TRANSITIONS.items() if new_status in targets]
+
+
+def bulk_transition(new_status, *clauses):
+    """Move every order matching ``clauses`` that may go to ``new_status``
+    with one UPDATE, and return the ids that changed.
+
+    Orders in a state that cannot move to ``new_status`` are left alone.
+    The UPDATE bypasses ORM events, so the invoice cache and sales rollups
+    are told about the changed orders in one batch before committing.
+    """
+    if new_status not in TRANSITIONS:
+        raise ValueError(f"Unknown status: {new_status}")
+
+    where = (*clauses, Order.status.in_(spellings(allowed_from(new_status))))
+    stmt = (
+        update(Order)
+        .where(*where)
+        .values(status=new_status)
+        .execution_options(synchronize_session=False)
+    )
+
+    if db.session.get_bind().dialect.update_returning:
+        order_ids = db.session.scalars(stmt.returning(Order.id)).all()
+    else:
+        order_ids = db.session.scalars(select(Order.id).where(*where)).all()
+        if order_ids:
+            db.session.execute(stmt.where(Order.id.in_(order_ids)))
+
+    if order_ids:
+        invoices.mark_orders(db.session, order_ids)
+        analytics.mark_orders(db.session, order_ids)
+
+    db.session.commit()
+    return order_ids
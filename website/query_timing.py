@@ -0,0 +1,47 @@
+import time
+
+from sqlalchemy import event
+
+from .models import db
+
+
+# ------------------------------------------------
+# SQL STATEMENT TIMING
+# ------------------------------------------------
+# One pair of engine listeners times every statement and hands the elapsed
+# seconds to each registered observer (metrics, slow_queries). The start
+# time lives on the statement's ExecutionContext, so a statement that
+# raises leaves nothing behind.
+_observers = []
+
+
+def observe(fn):
+    """Call ``fn(conn, cursor, statement, parameters, context, executemany,
+    elapsed)`` after every statement."""
+    if fn not in _observers:
+        _observers.append(fn)
+    return fn
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+
+    for fn in _observers:
+        fn(conn, cursor, statement, parameters, context, executemany, elapsed)
+
+
+def init_app(app):
+    with app.app_context():
+        engine = db.engine
+
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
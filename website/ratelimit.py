@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, jsonify
+
+
+# ------------------------------------------------
+# TOKEN BUCKETS
+# ------------------------------------------------
+class TokenBuckets:
+    """Per-key token buckets kept as ``key -> (tokens, timestamp)`` in a
+    bounded LRU, so a flood of new keys cannot grow memory without limit."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key, capacity, period):
+        """Take one token from ``key``'s bucket, which holds ``capacity``
+        tokens and refills completely every ``period`` seconds."""
+        now = time.monotonic()
+        rate = capacity / period
+
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+buckets = TokenBuckets()
+
+
+def _account(field):
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        value = data.get(field) if isinstance(data, dict) else None
+    else:
+        value = request.values.get(field)
+
+    return (value or "").strip().lower() or None
+
+
+def _allowed(scope, account_field):
+    limits = current_app.config["RATE_LIMITS"].get(scope)
+    if not limits:
+        return True
+
+    if "per_ip" in limits:
+        if not buckets.allow(("ip", scope, request.remote_addr), *limits["per_ip"]):
+            return False
+
+    if account_field and "per_account" in limits:
+        account = _account(account_field)
+        if account and not buckets.allow(
+            ("account", scope, account), *limits["per_account"]
+        ):
+            return False
+
+    return True
+
+
+def rate_limit(scope, account_field=None, methods=("POST",), json=False):
+    """Reject requests over the ``RATE_LIMITS[scope]`` budget with a 429
+    before the view runs any hashing or queries.
+
+    ``scope`` may be a callable returning the scope for the current request,
+    for views that handle more than one form.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method in methods and not _allowed(
+                scope() if callable(scope) else scope, account_field
+            ):
+                message = "Too many requests, please slow down."
+                if json:
+                    return jsonify({"status": "error", "message": message}), 429
+                return message, 429
+            return f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
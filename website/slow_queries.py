@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, has_app_context, has_request_context, request
+
+from . import query_timing
+from .nplusone import fingerprint
+
+
+# ------------------------------------------------
+# SLOW QUERY LOG
+# ------------------------------------------------
+# Statements taking longer than SLOW_QUERY_MS are appended to a rotating
+# JSONL file with their normalised SQL, the types of their bound parameters
+# (never the values), the endpoint that ran them and the database's plan.
+# /admin/slow-queries groups the entries by fingerprint.
+#
+# Workers share the file; appends are atomic per line, but two workers
+# rotating at once may drop a few entries, which is fine for a diagnostic log.
+EXPLAIN_PREFIX = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+    "mysql": "EXPLAIN ",
+    "mariadb": "EXPLAIN ",
+}
+EXPLAINABLE = ("select", "with", "update", "delete")
+
+logger = logging.getLogger("greenmart.slow_queries")
+logger.propagate = False
+
+
+def _shape(value):
+    if value is None:
+        return "None"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def param_shapes(parameters, executemany=False):
+    """Types of the bound parameters; strings and bytes carry their length."""
+    if executemany:
+        rows = list(parameters)
+        return {"rows": len(rows), "row": param_shapes(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: _shape(value) for key, value in parameters.items()}
+    return [_shape(value) for value in parameters or ()]
+
+
+def _format_plan(dialect, rows):
+    if dialect == "sqlite":
+        # (id, parent, notused, detail); indent children under their parent
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append("  " * depth[node_id] + detail)
+        return lines
+    return [" | ".join(str(column) for column in row) for row in rows]
+
+
+def _streams(context):
+    """Whether the statement reads through a server-side cursor."""
+    options = context.execution_options if context is not None else {}
+    return bool(options.get("stream_results") or options.get("yield_per"))
+
+
+def explain(cursor, dialect, statement, parameters):
+    """The plan of ``statement`` as a list of lines, or None.
+
+    Runs on a fresh DBAPI cursor of the same connection, so the statement
+    sees the same transaction and no engine events fire for it. Callers
+    skip streamed statements: their rows are still unread on the
+    connection, and MySQL refuses another command until they are
+    ("Commands out of sync").
+    """
+    prefix = EXPLAIN_PREFIX.get(dialect)
+    if prefix is None or not statement.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+
+    plan_cursor = cursor.connection.cursor()
+    try:
+        plan_cursor.execute(prefix + statement, parameters)
+        return _format_plan(dialect, plan_cursor.fetchall())
+    except Exception:
+        current_app.logger.debug("Could not explain slow query", exc_info=True)
+        return None
+    finally:
+        plan_cursor.close()
+
+
+def _query_timed(conn, cursor, statement, parameters, context, executemany, elapsed):
+    elapsed_ms = elapsed * 1000
+    if not has_app_context() or elapsed_ms < current_app.config["SLOW_QUERY_MS"]:
+        return
+
+    sql = fingerprint(statement)
+    entry = {
+        "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "ms": round(elapsed_ms, 2),
+        "fingerprint": hashlib.sha1(sql.encode()).hexdigest()[:12],
+        "sql": sql,
+        "params": param_shapes(parameters, executemany),
+        "endpoint": None,
+        "method": None,
+        "path": None,
+        "plan": None,
+    }
+
+    if has_request_context():
+        entry["endpoint"] = request.endpoint
+        entry["method"] = request.method
+        entry["path"] = request.path
+
+    if (
+        current_app.config["SLOW_QUERY_EXPLAIN"]
+        and not executemany
+        and not _streams(context)
+    ):
+        entry["plan"] = explain(cursor, conn.dialect.name, statement, parameters)
+
+    logger.warning(json.dumps(entry))
+
+
+# ------------------------------------------------
+# SUMMARY
+# ------------------------------------------------
+def _log_files():
+    path = current_app.config["SLOW_QUERY_LOG"]
+    backups = current_app.config["SLOW_QUERY_LOG_BACKUPS"]
+    # Oldest first, so later entries overwrite the "latest" fields
+    files = [f"{path}.{i}" for i in range(backups, 0, -1)] + [path]
+    return [f for f in files if os.path.exists(f)]
+
+
+def entries():
+    for path in _log_files():
+        with open(path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash or rotation
+
+
+def summarize(limit=50):
+    """Logged statements grouped by fingerprint, by total time spent."""
+    groups = {}
+
+    for entry in entries():
+        group = groups.get(entry["fingerprint"])
+        if group is None:
+            group = groups[entry["fingerprint"]] = {
+                "fingerprint": entry["fingerprint"],
+                "sql": entry["sql"],
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "endpoints": Counter(),
+            }
+        group["count"] += 1
+        group["total_ms"] += entry["ms"]
+        group["max_ms"] = max(group["max_ms"], entry["ms"])
+        group["endpoints"][entry["endpoint"] or "(no request)"] += 1
+        group["last_seen"] = entry["at"]
+        group["params"] = entry["params"]
+        group["plan"] = entry["plan"] or group.get("plan")
+
+    summary = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)
+    for group in summary:
+        group["avg_ms"] = group["total_ms"] / group["count"]
+        group["endpoints"] = group["endpoints"].most_common()
+    return summary[:limit]
+
+
+def init_app(app):
+    if not app.config["SLOW_QUERY_MS"]:
+        return
+
+    path = app.config["SLOW_QUERY_LOG"]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    handler = RotatingFileHandler(
+        path,
+        maxBytes=app.config["SLOW_QUERY_LOG_MAX_BYTES"],
+        backupCount=app.config["SLOW_QUERY_LOG_BACKUPS"],
+        encoding="utf-8",
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING)
+
+    query_timing.init_app(app)
+    query_timing.observe(_query_timed)
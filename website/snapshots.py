@@ -0,0 +1,243 @@
+import json
+import os
+import shutil
+from datetime import datetime
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, select
+
+from .models import db, Category, Order, OrderItem, Product
+
+
+# ------------------------------------------------
+# COLUMNAR ORDER-ITEM SNAPSHOTS
+# ------------------------------------------------
+# One directory per snapshot:
+#
+#   manifest.json     row count, column dtypes, last OrderItem id
+#   dictionary.json   product / category / status tables the codes refer to
+#   items/<col>.npy   one typed array per column, memory-mappable
+#
+# Analysts open them with Snapshot(path) and slice millions of rows
+# without touching greenmart.db.
+COLUMNS = {
+    "item_id": np.int64,
+    "order_id": np.int64,
+    "user_id": np.int64,
+    "product": np.int32,
+    "category": np.int32,
+    "status": np.int16,
+    "quantity": np.int32,
+    "price": np.float64,
+    "created_at": "datetime64[s]",
+}
+
+CHUNK = 50000
+
+
+def _dictionary():
+    categories = ["Uncategorised"]
+    category_codes = {None: 0}
+    for category in Category.query.order_by(Category.id):
+        category_codes[category.id] = len(categories)
+        categories.append(category.name)
+
+    products = []
+    product_codes = {}
+    for product in Product.query.order_by(Product.id):
+        product_codes[product.id] = len(products)
+        products.append(
+            {
+                "id": product.id,
+                "name": product.name,
+                "category": category_codes.get(product.category_id, 0),
+            }
+        )
+
+    return products, product_codes, categories
+
+
+def export(out_dir):
+    """Write a snapshot of every OrderItem joined with its Order."""
+    products, product_codes, categories = _dictionary()
+    statuses, status_codes = [], {}
+
+    last_id = db.session.query(func.max(OrderItem.id)).scalar() or 0
+    rows = (
+        db.session.query(func.count(OrderItem.id))
+        .join(Order, Order.id == OrderItem.order_id)
+        .filter(OrderItem.id <= last_id)
+        .scalar()
+    )
+
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_dir, "items"))
+
+    columns = {
+        name: np.lib.format.open_memmap(
+            os.path.join(tmp_dir, "items", f"{name}.npy"),
+            mode="w+",
+            dtype=dtype,
+            shape=(rows,),
+        )
+        for name, dtype in COLUMNS.items()
+    }
+
+    def product_code(product_id):
+        if product_id not in product_codes:
+            product_codes[product_id] = len(products)
+            products.append({"id": product_id, "name": f"Product {product_id}", "category": 0})
+        return product_codes[product_id]
+
+    def status_code(status):
+        if status not in status_codes:
+            status_codes[status] = len(statuses)
+            statuses.append(status)
+        return status_codes[status]
+
+    query = (
+        select(
+            OrderItem.id,
+            OrderItem.order_id,
+            Order.user_id,
+            OrderItem.product_id,
+            Order.status,
+            OrderItem.quantity,
+            OrderItem.price,
+            Order.created_at,
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(OrderItem.id <= last_id)
+        .order_by(OrderItem.id)
+        .execution_options(yield_per=CHUNK)
+    )
+
+    written = 0
+    for chunk in db.session.execute(query).partitions():
+        chunk = chunk[: rows - written]
+        end = written + len(chunk)
+        codes = [product_code(r[3]) for r in chunk]
+
+        columns["item_id"][written:end] = [r[0] for r in chunk]
+        columns["order_id"][written:end] = [r[1] for r in chunk]
+        columns["user_id"][written:end] = [r[2] or 0 for r in chunk]
+        columns["product"][written:end] = codes
+        columns["category"][written:end] = [products[c]["category"] for c in codes]
+        columns["status"][written:end] = [status_code(r[4]) for r in chunk]
+        columns["quantity"][written:end] = [r[5] or 0 for r in chunk]
+        columns["price"][written:end] = [r[6] or 0 for r in chunk]
+        columns["created_at"][written:end] = [
+            np.datetime64(r[7], "s") if r[7] else np.datetime64("NaT") for r in chunk
+        ]
+        written = end
+
+    for column in columns.values():
+        column.flush()
+    del columns
+
+    with open(os.path.join(tmp_dir, "dictionary.json"), "w") as f:
+        json.dump({"products": products, "categories": categories, "statuses": statuses}, f)
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(
+            {
+                "rows": written,
+                "last_item_id": last_id,
+                "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+                "columns": {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+            },
+            f,
+            indent=2,
+        )
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return written
+
+
+# ------------------------------------------------
+# QUERY HELPER
+# ------------------------------------------------
+class Snapshot:
+    """Read-only, memory-mapped view of an exported snapshot.
+
+        snap = Snapshot.latest("instance/snapshots")
+        mask = snap.between("2026-01-01", "2026-02-01")
+        revenue = (snap["quantity"][mask] * snap["price"][mask]).sum()
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(path, "dictionary.json")) as f:
+            dictionary = json.load(f)
+
+        self.rows = self.manifest["rows"]
+        self.products = dictionary["products"]
+        self.categories = dictionary["categories"]
+        self.statuses = dictionary["statuses"]
+        self._columns = {}
+
+    @classmethod
+    def latest(cls, root):
+        names = sorted(
+            name
+            for name in os.listdir(root)
+            if os.path.exists(os.path.join(root, name, "manifest.json"))
+        )
+        if not names:
+            raise FileNotFoundError(f"No snapshots in {root}")
+        return cls(os.path.join(root, names[-1]))
+
+    def __getitem__(self, name):
+        if name not in self._columns:
+            column = np.load(os.path.join(self.path, "items", f"{name}.npy"), mmap_mode="r")
+            self._columns[name] = column[: self.rows]
+        return self._columns[name]
+
+    def __len__(self):
+        return self.rows
+
+    def between(self, start, end):
+        """Boolean mask of items created in ``[start, end)``."""
+        created = self["created_at"]
+        return (created >= np.datetime64(start, "s")) & (created < np.datetime64(end, "s"))
+
+    def status_is(self, status):
+        if status not in self.statuses:
+            return np.zeros(self.rows, dtype=bool)
+        return self["status"] == self.statuses.index(status)
+
+    def product_names(self, codes):
+        return [self.products[code]["name"] for code in codes]
+
+
+# ------------------------------------------------
+# CLI
+# ------------------------------------------------
+cli = AppGroup("snapshots", help="Columnar order-item snapshots.")
+
+
+@cli.command("export")
+@click.option("--out", help="Target directory (default: SNAPSHOT_DIR/<date>).")
+@click.option("--keep", default=7, show_default=True, help="Snapshots to keep.")
+def export_command(out, keep):
+    """Export OrderItem + Order into typed .npy columns (run nightly)."""
+    root = current_app.config["SNAPSHOT_DIR"]
+    out = out or os.path.join(root, datetime.utcnow().strftime("%Y-%m-%d"))
+
+    rows = export(out)
+    click.echo(f"Wrote {rows} order items to {out}")
+
+    if os.path.dirname(os.path.abspath(out)) == os.path.abspath(root):
+        old = sorted(
+            name for name in os.listdir(root) if not name.endswith(".tmp")
+        )[:-max(keep, 1)]
+        for name in old:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
@@ -0,0 +1,52 @@
+from .models import db, Setting
+from . import store_stats
+
+
+# ------------------------------------------------
+# STORE SETTINGS
+# ------------------------------------------------
+# Key/value rows in `settings`, cached per process and reloaded when saving
+# bumps the settings_version counter.
+VERSION_KEY = "settings_version"
+
+DEFAULTS = {
+    "store_name": "Green Mart",
+    "contact_email": "support@greenmart.com",
+    "gst_rate": "5",
+}
+
+
+def _load():
+    values = dict(DEFAULTS)
+    values.update((s.key, s.value) for s in Setting.query.all())
+    return values
+
+
+_cache = store_stats.VersionedCache(VERSION_KEY, _load, "SETTINGS_CHECK_INTERVAL")
+
+
+def get_all():
+    return _cache.get()
+
+
+def get(key):
+    return get_all()[key]
+
+
+def gst_rate():
+    """GST as a fraction, e.g. 0.05 for 5%."""
+    return float(get("gst_rate")) / 100
+
+
+def save(values):
+    for key, value in values.items():
+        db.session.merge(Setting(key=key, value=str(value)))
+    store_stats.add(VERSION_KEY, 1)
+    db.session.commit()
+    _cache.invalidate()
+
+
+def init_app(app):
+    @app.context_processor
+    def inject_store_settings():
+        return {"store": get_all()}
@@ -0,0 +1,164 @@
+import random
+import threading
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, select
+
+from .models import db, StoreStat, User, Product, Order
+from .upsert import increment
+
+
+# ------------------------------------------------
+# STORE COUNTERS
+# ------------------------------------------------
+# Each ORM insert/delete of a tracked model bumps its counter row inside the
+# same transaction. Bulk Query.delete() and Core inserts skip ORM events, so
+# code using them must call add() itself, or run `flask stats reconcile`.
+#
+# Every checkout inserts an Order, and on PostgreSQL/MySQL the bump holds
+# that row's lock until the checkout commits. Tracked counters are
+# therefore split over SHARDS rows ("orders", "orders:1", ...), each
+# insert bumping a random one, and readers sum them.
+TRACKED = {
+    "users": User,
+    "products": Product,
+    "orders": Order,
+}
+SHARDS = 8
+
+
+def _shard_names(name):
+    return [name] + [f"{name}:{i}" for i in range(1, SHARDS)]
+
+
+def _update(name, delta):
+    return (
+        StoreStat.__table__.update()
+        .where(StoreStat.name == name)
+        .values(value=StoreStat.value + delta)
+    )
+
+
+def _listener(name, delta):
+    shards = _shard_names(name)
+
+    def bump_shard(mapper, connection, target):
+        bump(connection, random.choice(shards), delta)
+
+    return bump_shard
+
+
+for _name, _model in TRACKED.items():
+    event.listen(_model, "after_insert", _listener(_name, 1))
+    event.listen(_model, "after_delete", _listener(_name, -1))
+
+
+def add(name, delta):
+    """Adjust a counter from code that bypasses ORM events, creating the
+    row if it does not exist yet."""
+    if delta and not db.session.execute(_update(name, delta)).rowcount:
+        db.session.add(StoreStat(name=name, value=delta))
+
+
+def bump(connection, name, delta=1):
+    """Like add(), for flush events that only have a Connection."""
+    connection.execute(
+        increment(
+            StoreStat.__table__, "name", "value", {"name": name, "value": delta},
+            bind=connection,
+        )
+    )
+
+
+def get(name):
+    if name in TRACKED:
+        return get_many([name])[name]
+    stat = db.session.get(StoreStat, name)
+    return stat.value if stat else 0
+
+
+def get_many(names):
+    """``{name: value}`` for ``names`` in one query, summing the shards of
+    tracked counters; missing counters are 0."""
+    keys = {}
+    for name in names:
+        for key in _shard_names(name) if name in TRACKED else [name]:
+            keys[key] = name
+
+    values = dict.fromkeys(names, 0)
+    for key, value in db.session.execute(
+        select(StoreStat.name, StoreStat.value).where(StoreStat.name.in_(keys))
+    ):
+        values[keys[key]] += value
+    return values
+
+
+class VersionedCache:
+    """Process-local copy of ``loader()``, reloaded when the ``version_key``
+    counter changes. The counter is read at most once every
+    ``app.config[interval_key]`` seconds, so most reads cost no query and
+    other workers see a change within the interval.
+    """
+
+    def __init__(self, version_key, loader, interval_key):
+        self.version_key = version_key
+        self.loader = loader
+        self.interval_key = interval_key
+        self._value = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        interval = current_app.config[self.interval_key]
+
+        with self._lock:
+            if self._value is not None and now - self._checked_at < interval:
+                return self._value
+
+            version = get(self.version_key)
+            if self._value is None or version != self._version:
+                self._value = self.loader()
+                self._version = version
+            self._checked_at = now
+            return self._value
+
+    def invalidate(self):
+        """Re-check the version on the next read in this process."""
+        with self._lock:
+            self._checked_at = 0.0
+
+
+def reconcile():
+    """Recount every tracked table and overwrite the counters."""
+    counts = {}
+    for name, model in TRACKED.items():
+        counts[name] = model.query.count()
+        StoreStat.query.filter(StoreStat.name.in_(_shard_names(name)[1:])).delete(
+            synchronize_session=False
+        )
+        db.session.merge(StoreStat(name=name, value=counts[name]))
+
+    db.session.commit()
+    return counts
+
+
+def init_app(app):
+    with app.app_context():
+        tracked = StoreStat.query.filter(StoreStat.name.in_(TRACKED)).count()
+        if tracked < len(TRACKED):
+            reconcile()
+
+
+cli = AppGroup("stats", help="Store counter tools.")
+
+
+@cli.command("reconcile")
+def reconcile_command():
+    """Recount users, products and orders into store_stats."""
+    for name, value in reconcile().items():
+        click.echo(f"{name}: {value}")
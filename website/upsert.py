@@ -0,0 +1,136 @@
+from sqlalchemy import case
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from .models import db, Cart, Wishlist
+
+
+# ------------------------------------------------
+# DIALECT-AWARE UPSERTS
+# ------------------------------------------------
+# PostgreSQL and SQLite share the ON CONFLICT API; MySQL uses ON DUPLICATE KEY.
+INSERTS = {
+    "mysql": mysql.insert,
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _insert(table, bind=None):
+    return INSERTS[(bind or db.session.get_bind()).dialect.name](table)
+
+
+def _on_conflict_add(stmt, keys, column, cap=None):
+    """Turn ``stmt`` into an upsert that adds the new value of ``column``
+    to the existing row when ``keys`` collide, up to ``cap`` if given."""
+    table = stmt.table
+
+    if isinstance(stmt, mysql.Insert):
+        total = table.c[column] + stmt.inserted[column]
+    else:
+        total = table.c[column] + stmt.excluded[column]
+    if cap is not None:
+        total = case((total > cap, cap), else_=total)
+
+    if isinstance(stmt, mysql.Insert):
+        return stmt.on_duplicate_key_update({column: total})
+
+    return stmt.on_conflict_do_update(index_elements=keys, set_={column: total})
+
+
+def _on_conflict_ignore(stmt):
+    if isinstance(stmt, mysql.Insert):
+        return stmt.prefix_with("IGNORE")
+    return stmt.on_conflict_do_nothing()
+
+
+def insert_ignore(table, rows, bind=None):
+    """INSERT that silently skips rows clashing with an existing key."""
+    return _on_conflict_ignore(_insert(table, bind).values(rows))
+
+
+def increment(table, key, column, values, bind=None):
+    """INSERT ``values``, or add its ``column`` to the existing row when
+    ``key`` collides. Usable from a Connection inside flush events."""
+    return _on_conflict_add(_insert(table, bind).values(values), [key], column)
+
+
+def upsert_rows(table, rows, keys):
+    """Insert ``rows`` with one executemany, overwriting the other columns
+    they carry when ``keys`` collide. Every row must have the same columns."""
+    if not rows:
+        return
+
+    stmt = _insert(table)
+    columns = [c for c in rows[0] if c not in keys]
+
+    if not columns:
+        stmt = _on_conflict_ignore(stmt)
+    elif isinstance(stmt, mysql.Insert):
+        stmt = stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in columns})
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={c: stmt.excluded[c] for c in columns},
+        )
+
+    db.session.execute(stmt, rows)
+
+
+def add_cart_quantities(user_id, quantities, max_quantity=None):
+    """Add ``{product_id: qty}`` to a user's cart in a single statement,
+    keeping each line at or below ``max_quantity`` if given."""
+    if not quantities:
+        return
+
+    stmt = _insert(Cart.__table__).values(
+        [
+            {"user_id": user_id, "product_id": product_id, "quantity": qty}
+            for product_id, qty in quantities.items()
+        ]
+    )
+    db.session.execute(
+        _on_conflict_add(stmt, ["user_id", "product_id"], "quantity", max_quantity)
+    )
+
+
+def add_to_cart(user_id, product_id):
+    """Atomically insert a cart row or bump its quantity by one.
+
+    Returns True if the product was not in the cart before.
+    """
+    stmt = _on_conflict_add(
+        _insert(Cart.__table__).values(
+            user_id=user_id, product_id=product_id, quantity=1
+        ),
+        ["user_id", "product_id"],
+        "quantity",
+    )
+
+    if isinstance(stmt, mysql.Insert):
+        # MySQL reports 1 affected row for an insert and 2 for an update
+        return db.session.execute(stmt).rowcount == 1
+
+    quantity = db.session.execute(stmt.returning(Cart.__table__.c.quantity)).scalar()
+    return quantity == 1
+
+
+def add_to_wishlist(user_id, product_id):
+    """Insert a wishlist row unless it already exists.
+
+    Returns True if a row was added.
+    """
+    stmt = insert_ignore(
+        Wishlist.__table__, {"user_id": user_id, "product_id": product_id}
+    )
+    return db.session.execute(stmt).rowcount == 1
+
+
+def init_app(app):
+    """Fail at startup, not on the first write, on a database without
+    upsert support; counters and carts rely on it."""
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    if dialect not in INSERTS:
+        raise RuntimeError(
+            f"Unsupported database {dialect!r}: upserts need one of {', '.join(INSERTS)}"
+        )
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from .models import db, StoreStat, User
+from . import store_stats
+
+
+# Detached User snapshots keyed by id, so Flask-Login's user_loader does not
+# load the users row on every authenticated request. Each hit is checked
+# against two store_stats counters read in one primary-key query: one per
+# user, bumped in the transaction that changes the row, and one for all
+# users, bumped by bulk Query.update()/delete() on User. A role or password
+# change is therefore seen by every worker on its next request.
+TTL = 60  # seconds
+MAX_USERS = 10000
+ALL_USERS_KEY = "users_version"
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _version_key(user_id):
+    return f"user_version:{user_id}"
+
+
+def _version(user_id):
+    keys = [ALL_USERS_KEY, _version_key(user_id)]
+    values = dict(
+        db.session.execute(
+            select(StoreStat.name, StoreStat.value).where(StoreStat.name.in_(keys))
+        ).all()
+    )
+    return tuple(values.get(key, 0) for key in keys)
+
+
+def load(user_id):
+    now = time.monotonic()
+    version = _version(user_id)
+
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry[0] > now and entry[1] == version:
+            _cache.move_to_end(user_id)
+            snapshot = entry[2]
+        else:
+            snapshot = None
+
+    if snapshot is None:
+        snapshot = db.session.get(User, user_id)
+        if snapshot is None:
+            return None
+
+        db.session.expunge(snapshot)
+
+        with _lock:
+            _cache[user_id] = (now + TTL, version, snapshot)
+            _cache.move_to_end(user_id)
+            if len(_cache) > MAX_USERS:
+                _cache.popitem(last=False)
+
+    # Attach a copy to this request's session without a SELECT so views can
+    # still modify and commit current_user as before.
+    return db.session.merge(snapshot, load=False)
+
+
+def invalidate(user_id):
+    with _lock:
+        _cache.pop(user_id, None)
+
+
+# ------------------------------------------------
+# INVALIDATION
+# ------------------------------------------------
+# Core statements on User.__table__ skip both hooks; code issuing them must
+# call store_stats.add(ALL_USERS_KEY, 1) in the same transaction.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_changed(mapper, connection, target):
+    store_stats.bump(connection, _version_key(target.id))
+
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_users", set()).add(target.id)
+
+
+# Query.update()/delete() on User. A do_orm_execute hook would also see
+# 2.0-style update(User), but any such listener stops selectinload working
+# under yield_per (invoice and order exports stream with it).
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _bulk_changed(context):
+    if context.mapper.class_ is User:
+        store_stats.bump(context.session.connection(), ALL_USERS_KEY)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed(session):
+    for user_id in session.info.pop("changed_users", ()):
+        invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed(session):
+    session.info.pop("changed_users", None)
@@ -0,0 +1,195 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+
+from flask import has_request_context, session
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session, object_session
+
+from .models import db, Cart, Product, Wishlist
+from . import store_stats
+
+
+# What every page needs about the visitor's cart and wishlist: the badge
+# count and subtotal, and the set of wishlisted product ids for the hearts.
+CartSummary = namedtuple("CartSummary", "count subtotal wishlist")
+
+EMPTY = CartSummary(0, 0, frozenset())
+
+MAX_USERS = 10000
+
+# Entries are (expires_at, stamp, prices_version, summary). The stamp is
+# also kept in the user's session cookie and changes with every mutation,
+# so a change made through one worker is seen by the others on the user's
+# next request. The TTL bounds staleness from the user's other sessions.
+TTL = 60  # seconds
+PRICES_VERSION = "prices_version"
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_epoch = [0]  # bumped by every invalidation; a load that spans one is dropped
+
+_prices_version = store_stats.VersionedCache(
+    PRICES_VERSION, lambda: store_stats.get(PRICES_VERSION), "PRICES_CHECK_INTERVAL"
+)
+_prices = store_stats.VersionedCache(
+    PRICES_VERSION,
+    lambda: dict(db.session.query(Product.id, Product.price)),
+    "PRICES_CHECK_INTERVAL",
+)
+
+
+def prices():
+    """``{product_id: price}`` for every product, reloaded with prices_version."""
+    return _prices.get()
+
+
+def _stamp():
+    return session.get("cart_stamp") if has_request_context() else None
+
+
+def _new_stamp():
+    if not has_request_context():
+        return None
+    session["cart_stamp"] = uuid.uuid4().hex[:8]
+    return session["cart_stamp"]
+
+
+def _load(user_id):
+    count, subtotal = (
+        db.session.query(
+            func.coalesce(func.sum(Cart.quantity), 0),
+            func.coalesce(func.sum(Cart.quantity * Product.price), 0),
+        )
+        .join(Product, Product.id == Cart.product_id)
+        .filter(Cart.user_id == user_id)
+        .one()
+    )
+    wishlist = frozenset(
+        pid
+        for (pid,) in db.session.query(Wishlist.product_id).filter_by(user_id=user_id)
+    )
+    return CartSummary(int(count), subtotal, wishlist)
+
+
+def get(user_id):
+    now = time.monotonic()
+    stamp = _stamp()
+    prices_version = _prices_version.get()
+
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry[0] > now and entry[1:3] == (stamp, prices_version):
+            _cache.move_to_end(user_id)
+            return entry[3]
+        epoch = _epoch[0]
+
+    summary = _load(user_id)
+
+    with _lock:
+        if _epoch[0] == epoch:
+            _cache[user_id] = (now + TTL, stamp, prices_version, summary)
+            _cache.move_to_end(user_id)
+            if len(_cache) > MAX_USERS:
+                _cache.popitem(last=False)
+
+    return summary
+
+
+def for_guest(quantities):
+    """Summary of a session cart, priced from the cached price list."""
+    if not quantities:
+        return EMPTY
+
+    current = prices()
+    return CartSummary(
+        sum(quantities.values()),
+        sum(current.get(pid, 0) * qty for pid, qty in quantities.items()),
+        frozenset(),
+    )
+
+
+# ------------------------------------------------
+# UPDATES FROM MUTATION VIEWS
+# ------------------------------------------------
+def invalidate(user_id):
+    """Drop a user's summary; the next page view rebuilds it."""
+    _new_stamp()
+    with _lock:
+        _cache.pop(user_id, None)
+        _epoch[0] += 1
+
+
+def _update_wishlist(user_id, change):
+    stamp = _new_stamp()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None:
+            expires_at, _, prices_version, summary = entry
+            _cache[user_id] = (
+                expires_at,
+                stamp,
+                prices_version,
+                summary._replace(wishlist=change(summary.wishlist)),
+            )
+
+
+def wishlist_added(user_id, product_id):
+    _update_wishlist(user_id, lambda ids: ids | {product_id})
+
+
+def wishlist_removed(user_id, product_id):
+    _update_wishlist(user_id, lambda ids: ids - {product_id})
+
+
+def wishlist_cleared(user_id):
+    _update_wishlist(user_id, lambda ids: frozenset())
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+        _epoch[0] += 1
+    _prices_version.invalidate()
+    _prices.invalidate()
+
+
+# ------------------------------------------------
+# PRICE CHANGES
+# ------------------------------------------------
+# Subtotals depend on Product.price, so a price change (e.g. edit_product)
+# or a deleted product bumps prices_version and every cached summary is
+# rebuilt. Core updates (catalog import, bulk updates) call prices_changed().
+def prices_changed():
+    store_stats.add(PRICES_VERSION, 1)
+    db.session.info["prices_changed"] = True
+
+
+@event.listens_for(Product, "after_update")
+def _price_updated(mapper, connection, target):
+    if inspect(target).attrs.price.history.has_changes():
+        _mark_prices(connection, target)
+
+
+@event.listens_for(Product, "after_delete")
+def _product_deleted(mapper, connection, target):
+    _mark_prices(connection, target)
+
+
+def _mark_prices(connection, target):
+    store_stats.bump(connection, PRICES_VERSION)
+    session = object_session(target)
+    if session is not None:
+        session.info["prices_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _clear_after_commit(session):
+    if session.info.pop("prices_changed", False):
+        clear()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_prices_changed(session):
+    session.info.pop("prices_changed", None)
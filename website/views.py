@@ -8,6 +8,8 @@ from flask import (
     session,
     jsonify,
     send_file,
+    current_app,
+    abort,
 )
 
 from flask_login import (
@@ -17,9 +19,9 @@ from flask_login import (
     login_required,
 )
 
-from werkzeug.security import generate_password_hash
 from functools import wraps
-import io
+
+from sqlalchemy.orm import selectinload
 
 # Models
 from .models import (
@@ -31,24 +33,14 @@ from .models import (
     Cart,
     Order,
     OrderItem,
-    Category,
 )
 
 # Forms & Products
 from .forms import SignupForm, LoginForm
 from .products import all_products
-
-# ReportLab (PDF / POS / Invoice)
-from reportlab.platypus import (
-    SimpleDocTemplate,
-    Paragraph,
-    Spacer,
-    Table,
-    TableStyle,
-)
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4, mm
-from reportlab.lib import colors
+from . import flash_sale, guest_cart, upsert, user_summary
+from .ratelimit import rate_limit
+from . import invoices, store_settings
 
 
 views = Blueprint("views", __name__)
@@ -78,7 +70,15 @@ def customer_required(f):
     return decorated_function
 
 
+@views.app_context_processor
+def inject_cart_summary():
+    if current_user.is_authenticated:
+        return {"cart_summary": user_summary.get(current_user.id)}
+    return {"cart_summary": user_summary.for_guest(guest_cart.get_items())}
+
+
 @views.route("/search")
+@rate_limit("search", methods=("GET",), json=True)
 def search():
     q = request.args.get("q", "").strip()
 
@@ -124,7 +124,7 @@ def change_password():
         return redirect(url_for("views.profile"))
 
     # Update password
-    current_user.password_hash = generate_password_hash(new_password)
+    current_user.set_password(new_password)
     db.session.commit()
     flash("Password changed successfully!", "success")
     return redirect(url_for("views.profile"))
@@ -133,10 +133,15 @@ def change_password():
 # ------------------------------------------------
 # HOME + LOGIN + SIGNUP
 # ------------------------------------------------
+def _home_form_scope():
+    # Both forms post here and share the "submit" field; only signup has
+    # confirm_password.
+    return "signup" if "confirm_password" in request.form else "login"
+
+
 @views.route("/", methods=["GET", "POST"])
+@rate_limit(_home_form_scope, account_field="email")
 def home():
-    
-    categories = Category.query.all()
     # 🔐 If admin already logged in → go to dashboard
     if current_user.is_authenticated and current_user.role == "admin":
         return redirect(url_for("admin.dashboard"))
@@ -150,6 +155,8 @@ def home():
 
         if user and user.check_password(login_form.password.data):
             login_user(user)
+            db.session.commit()  # persist a rehashed password, if any
+            guest_cart.merge_into(user)
             flash(f"Welcome back, {user.name}!", "success")
 
             # 🔁 Redirect based on role
@@ -184,7 +191,6 @@ def home():
         signup_form=signup_form,
         login_form=login_form,
         user=current_user,
-        categories=categories,
         products=all_products,
         
         title="Farm Fresh",
@@ -265,20 +271,21 @@ def profile():
 def orders():
     # Fetch all orders for the current user, latest first
     orders = (
-        Order.query.filter_by(user_id=current_user.id).order_by(Order.id.desc()).all()
+        Order.query.filter_by(user_id=current_user.id)
+        .options(selectinload(Order.items).selectinload(OrderItem.product))
+        .order_by(Order.id.desc())
+        .all()
     )
 
     order_list = []
     for order in orders:
         items = []
         for item in order.items:
-            # you can also fetch product name dynamically if needed
-            product = Product.query.get(item.product_id)
-            print("ORDER:", order)
+            product = item.product
             if product:
                 items.append(
                     {
-                        "name": item.name,
+                        "name": product.name,
                         "quantity": item.quantity,
                         "price": item.price,
                         "subtotal": item.price * item.quantity,
@@ -294,7 +301,12 @@ def orders():
             }
         )
 
-    return render_template("orders.html", orders=order_list)
+    return render_template(
+        "orders.html",
+        orders=order_list,
+        login_form=LoginForm(),
+        signup_form=SignupForm(),
+    )
 
 
 # ------------------------------------------------
@@ -400,14 +412,11 @@ def contact():
 @login_required
 def add_to_wishlist(product_id):
 
-    exists = Wishlist.query.filter_by(
-        user_id=current_user.id, product_id=product_id
-    ).first()
+    added = upsert.add_to_wishlist(current_user.id, product_id)
+    db.session.commit()
 
-    if not exists:
-        wishlist_item = Wishlist(user_id=current_user.id, product_id=product_id)
-        db.session.add(wishlist_item)
-        db.session.commit()
+    if added:
+        user_summary.wishlist_added(current_user.id, product_id)
         flash("Item added to Wishlist!", "success")
     else:
         flash("Item already in Wishlist!", "info")
@@ -427,6 +436,7 @@ def remove_wishlist_item(product_id):
     if item:
         db.session.delete(item)
         db.session.commit()
+        user_summary.wishlist_removed(current_user.id, product_id)
         flash("Item removed!", "danger")
 
     return redirect(url_for("views.wishlist"))
@@ -439,6 +449,7 @@ def clear_wishlist():
 
     Wishlist.query.filter_by(user_id=current_user.id).delete()
     db.session.commit()
+    user_summary.wishlist_cleared(current_user.id)
 
     flash("Wishlist cleared!", "danger")
     return redirect(url_for("views.wishlist"))
@@ -446,22 +457,40 @@ def clear_wishlist():
 
 # 🔹 Move to Cart
 @views.route("/add_to_cart/<int:product_id>", methods=["POST", "GET"])
-@login_required
 def add_to_cart(product_id):
 
-    cart_item = Cart.query.filter_by(
-        user_id=current_user.id, product_id=product_id
-    ).first()
+    if not guest_cart.known_ids([product_id]):
+        abort(404)
 
-    if cart_item:
-        cart_item.quantity += 1
-        flash("Quantity updated in Cart!", "info")
-    else:
-        cart_item = Cart(user_id=current_user.id, product_id=product_id, quantity=1)
-        db.session.add(cart_item)
-        flash("Item added to Cart!", "success")
+    # Flash-sale items are checked against the shared counter so a sold
+    # out product never reaches the database.
+    if flash_sale.is_flash_product(product_id) and flash_sale.available(product_id) <= 0:
+        flash("Sorry, this item is sold out!", "danger")
+        return redirect(request.referrer or url_for("views.shop"))
+
+    # 🛒 Guests keep their cart in the session until they log in
+    if not current_user.is_authenticated:
+        try:
+            existed = guest_cart.add(product_id)
+        except guest_cart.CartFull:
+            flash("Your cart is full!", "danger")
+            return redirect(request.referrer or url_for("views.shop"))
+
+        if existed:
+            flash("Quantity updated in Cart!", "info")
+        else:
+            flash("Item added to Cart!", "success")
+        return redirect(request.referrer or url_for("views.shop"))
 
+    added = upsert.add_to_cart(current_user.id, product_id)
     db.session.commit()
+    user_summary.invalidate(current_user.id)
+
+    if added:
+        flash("Item added to Cart!", "success")
+    else:
+        flash("Quantity updated in Cart!", "info")
+
     return redirect(request.referrer or url_for("views.shop"))
 
 
@@ -489,26 +518,40 @@ def wishlist():
     )
 
 
-@views.route("/cart")
-@login_required
-def cart():
-
-    login_form = LoginForm()
-    signup_form = SignupForm()
+def _cart_quantities():
+    if current_user.is_authenticated:
+        return {
+            item.product_id: item.quantity
+            for item in Cart.query.filter_by(user_id=current_user.id).all()
+        }
+    return guest_cart.get_items()
 
-    cart_items = Cart.query.filter_by(user_id=current_user.id).all()
 
+def _cart_lines(quantities):
     products = []
     total_price = 0
-
-    for item in cart_items:
-        product = next((p for p in all_products if p["id"] == item.product_id), None)
-        if product:
-            product["quantity"] = item.quantity
-            product["subtotal"] = product["price"] * item.quantity
+    prices = user_summary.prices()
+
+    for product_id, quantity in quantities.items():
+        product = next((p for p in all_products if p["id"] == product_id), None)
+        if product and product_id in prices:
+            product = dict(product, price=prices[product_id])
+            product["quantity"] = quantity
+            product["subtotal"] = product["price"] * quantity
             total_price += product["subtotal"]
             products.append(product)
 
+    return products, total_price
+
+
+@views.route("/cart")
+def cart():
+
+    login_form = LoginForm()
+    signup_form = SignupForm()
+
+    products, total_price = _cart_lines(_cart_quantities())
+
     return render_template(
         "cart.html",
         cart=products,
@@ -519,9 +562,12 @@ def cart():
 
 
 @views.route("/update_cart/<int:product_id>/<string:action>", methods=["POST"])
-@login_required
 def update_cart(product_id, action):
 
+    if not current_user.is_authenticated:
+        guest_cart.update(product_id, action)
+        return redirect(url_for("views.cart"))
+
     cart_item = Cart.query.filter_by(
         user_id=current_user.id, product_id=product_id
     ).first()
@@ -535,30 +581,176 @@ def update_cart(product_id, action):
                 db.session.delete(cart_item)
 
         db.session.commit()
+        user_summary.invalidate(current_user.id)
 
     return redirect(url_for("views.cart"))
 
 
+def _line_limits(product_ids, max_quantity):
+    """``{product_id: (name, most that may be in a cart)}`` for the products
+    that exist; flash-sale items are limited by their shared counter."""
+    return {
+        product.id: (
+            product.name,
+            min(
+                max_quantity,
+                flash_sale.available(product.id)
+                if flash_sale.is_flash_product(product.id)
+                else product.stock or 0,
+            ),
+        )
+        for product in Product.query.filter(Product.id.in_(list(product_ids)))
+    }
+
+
+def _over_limit(quantities, limits):
+    for product_id, (name, limit) in limits.items():
+        if quantities.get(product_id, 0) > limit:
+            return f"Only {limit} of {name} can be added"
+    return None
+
+
+@views.route("/api/cart", methods=["PATCH"])
+def api_cart():
+    """Apply a batch of ``{product_id, delta | quantity}`` operations in one
+    transaction and return the new cart totals."""
+    ops = request.get_json(silent=True)
+    if isinstance(ops, dict):
+        ops = ops.get("items")
+
+    if not isinstance(ops, list):
+        return jsonify({"success": False, "message": "Expected a list of items"}), 400
+
+    max_quantity = current_app.config["CART_MAX_QUANTITY"]
+    changes = {}
+    try:
+        for op in ops:
+            product_id = int(op["product_id"])
+            if "quantity" in op:
+                changes[product_id] = ("set", int(op["quantity"]))
+            else:
+                kind, value = changes.get(product_id, ("add", 0))
+                changes[product_id] = (kind, value + int(op["delta"]))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"success": False, "message": "Invalid cart operation"}), 400
+
+    if any(abs(value) > max_quantity for _, value in changes.values()):
+        return jsonify(
+            {"success": False, "message": f"At most {max_quantity} of each item"}
+        ), 400
+
+    limits = _line_limits(changes, max_quantity)
+    if len(limits) < len(changes):
+        return jsonify({"success": False, "message": "Unknown product"}), 400
+
+    # Only lines being raised are held to the limit, so a cart left above
+    # it (e.g. after stock dropped) can still be reduced.
+    limits = {
+        pid: limit
+        for pid, limit in limits.items()
+        if changes[pid][0] == "set" or changes[pid][1] > 0
+    }
+
+    def apply(current, change):
+        kind, value = change
+        return value if kind == "set" else current + value
+
+    if current_user.is_authenticated:
+        # Deltas are added in SQL so concurrent requests cannot lose updates;
+        # limits are checked afterwards, inside the same transaction.
+        cart = Cart.__table__
+        upsert.upsert_rows(
+            cart,
+            [
+                {"user_id": current_user.id, "product_id": pid, "quantity": value}
+                for pid, (kind, value) in changes.items()
+                if kind == "set"
+            ],
+            ["user_id", "product_id"],
+        )
+        upsert.add_cart_quantities(
+            current_user.id,
+            {pid: value for pid, (kind, value) in changes.items() if kind == "add"},
+        )
+        db.session.execute(
+            cart.delete().where(
+                cart.c.user_id == current_user.id,
+                cart.c.product_id.in_(list(changes)),
+                cart.c.quantity <= 0,
+            )
+        )
+        quantities = dict(
+            db.session.query(Cart.product_id, Cart.quantity).filter(
+                Cart.user_id == current_user.id, Cart.product_id.in_(list(changes))
+            )
+        )
+
+        error = _over_limit(quantities, limits)
+        if error:
+            db.session.rollback()
+            return jsonify({"success": False, "message": error}), 409
+
+        db.session.commit()
+        user_summary.invalidate(current_user.id)
+    else:
+        quantities = guest_cart.get_items()
+        for product_id, change in changes.items():
+            quantities[product_id] = apply(quantities.get(product_id, 0), change)
+
+        error = _over_limit(quantities, limits)
+        if error:
+            return jsonify({"success": False, "message": error}), 409
+        if sum(qty > 0 for qty in quantities.values()) > current_app.config["CART_MAX_LINES"]:
+            return jsonify({"success": False, "message": "Your cart is full"}), 409
+
+        guest_cart.save_items(quantities)
+
+    products, total_price = _cart_lines(_cart_quantities())
+
+    return jsonify(
+        {
+            "success": True,
+            "items": [
+                {
+                    "product_id": p["id"],
+                    "quantity": p["quantity"],
+                    "subtotal": p["subtotal"],
+                }
+                for p in products
+            ],
+            "total_price": total_price,
+        }
+    )
+
+
 @views.route("/clear_cart", methods=["POST"])
-@login_required
 def clear_cart():
 
-    Cart.query.filter_by(user_id=current_user.id).delete()
-    db.session.commit()
+    if current_user.is_authenticated:
+        Cart.query.filter_by(user_id=current_user.id).delete()
+        db.session.commit()
+        user_summary.invalidate(current_user.id)
+    else:
+        guest_cart.clear()
 
     flash("Cart cleared!", "danger")
     return redirect(url_for("views.cart"))
 
 
 @views.route("/remove_cart_item/<int:product_id>", methods=["POST"])
-@login_required
 def remove_cart_item(product_id):
 
+    if not current_user.is_authenticated:
+        if guest_cart.remove(product_id):
+            flash("Item removed from Cart!", "danger")
+        return redirect(url_for("views.cart"))
+
     item = Cart.query.filter_by(user_id=current_user.id, product_id=product_id).first()
 
     if item:
         db.session.delete(item)
         db.session.commit()
+        user_summary.invalidate(current_user.id)
         flash("Item removed from Cart!", "danger")
 
     return redirect(url_for("views.cart"))
@@ -825,12 +1017,16 @@ def checkout():
     signup_form = SignupForm()
 
     # ================= LOAD CART =================
-    cart_items = Cart.query.filter_by(user_id=current_user.id).all()
+    cart_items = (
+        Cart.query.filter_by(user_id=current_user.id)
+        .options(selectinload(Cart.product))
+        .all()
+    )
     subtotal = 0
     checkout_items = []
 
     for item in cart_items:
-        product = Product.query.get(item.product_id)  # 🔥 use DB Product
+        product = item.product  # 🔥 use DB Product
         if product:
             total = product.price * item.quantity
             subtotal += total
@@ -841,7 +1037,11 @@ def checkout():
                     "price": product.price,
                     "quantity": item.quantity,
                     "subtotal": total,
-                    "stock": product.stock,
+                    "stock": (
+                        flash_sale.available(product.id)
+                        if flash_sale.is_flash_product(product.id)
+                        else product.stock
+                    ),
                 }
             )
 
@@ -850,6 +1050,22 @@ def checkout():
         if not checkout_items:
             return jsonify({"success": False, "message": "Cart is empty"})
 
+        # ⚡ Flash-sale items are reserved from the shared counters;
+        # their Product.stock is written back later in batches.
+        short_id, reserved = flash_sale.reserve(
+            {item["id"]: item["quantity"] for item in checkout_items}
+        )
+        if short_id is not None:
+            product = next(i for i in checkout_items if i["id"] == short_id)
+            return jsonify(
+                {
+                    "success": False,
+                    "message": f"Only {flash_sale.available(short_id)} left for {product['name']}",
+                }
+            )
+
+        products = {item.product_id: item.product for item in cart_items}
+
         try:
             # 1️⃣ Create Order
             order = Order(
@@ -860,10 +1076,22 @@ def checkout():
 
             # 2️⃣ Process each product
             for item in checkout_items:
-                product = Product.query.get(item["id"])
+                if item["id"] in reserved:
+                    db.session.add(
+                        OrderItem(
+                            order_id=order.id,
+                            product_id=item["id"],
+                            quantity=item["quantity"],
+                            price=item["price"],
+                        )
+                    )
+                    continue
+
+                product = products[item["id"]]
 
                 # ❌ Block if stock not enough
                 if product.stock < item["quantity"]:
+                    flash_sale.release(reserved)
                     return jsonify(
                         {
                             "success": False,
@@ -889,14 +1117,21 @@ def checkout():
 
             # 4️⃣ Commit everything
             db.session.commit()
+            user_summary.invalidate(current_user.id)
 
-            return jsonify({"success": True, "order_id": f"ORD{order.id}"})
-
-        except Exception as e:
+        except Exception:
             db.session.rollback()
-            print("Checkout Error:", e)
+            flash_sale.release(reserved)
+            current_app.logger.exception("Checkout failed for user %s", current_user.id)
             return jsonify({"success": False, "message": "Checkout failed"})
 
+        # 5️⃣ Write flash-sale decrements back once a batch has built up
+        if reserved:
+            flash_sale.confirm(reserved)
+            flash_sale.maybe_flush()
+
+        return jsonify({"success": True, "order_id": f"ORD{order.id}"})
+
     # ================= PAGE LOAD =================
     return render_template(
         "checkout.html",
@@ -993,13 +1228,15 @@ def invoice(order_code):
     order = Order.query.filter_by(
         id=order_id,
         user_id=current_user.id
+    ).options(
+        selectinload(Order.items).selectinload(OrderItem.product)
     ).first_or_404()
 
     items = []
     subtotal = 0
 
     for item in order.items:
-        product = Product.query.get(item.product_id)
+        product = item.product
         line_total = item.price * item.quantity
         subtotal += line_total
 
@@ -1010,7 +1247,7 @@ def invoice(order_code):
             "total": line_total
         })
 
-    tax = round(subtotal * 0.05, 2)   # 5% GST
+    tax = round(subtotal * store_settings.gst_rate(), 2)
     grand_total = subtotal + tax
 
     return render_template(
@@ -1029,89 +1266,17 @@ def invoice(order_code):
 def pos_invoice(order_code):
     order_id = int(order_code.replace("ORD", ""))
 
-    order = Order.query.filter_by(
-        id=order_id,
-        user_id=current_user.id
-    ).first_or_404()
+    order = invoices.load_order(order_id, user_id=current_user.id)
 
-    buffer = io.BytesIO()
-
-    # 🧾 POS size (80mm width)
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=(80 * mm, 200 * mm),
-        rightMargin=10,
-        leftMargin=10,
-        topMargin=10,
-        bottomMargin=10
-    )
-
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # 🟢 STORE HEADER
-    elements.append(Paragraph(
-        "<b>GREENMART</b><br/>Fresh & Organic Store<br/>----------------------",
-        styles["Title"]
-    ))
-
-    elements.append(Spacer(1, 6))
-
-    elements.append(Paragraph(
-        f"""
-        Invoice: ORD{order.id}<br/>
-        Date: {order.created_at.strftime('%d-%m-%Y %H:%M')}<br/>
-        Customer: {current_user.name}
-        <br/>----------------------
-        """,
-        styles["Normal"]
-    ))
-
-    # 🧾 ITEMS
-    data = [["Item", "Qty", "Amt"]]
-    subtotal = 0
-
-    for item in order.items:
-        total = item.price * item.quantity
-        subtotal += total
-        data.append([
-            item.product.name[:12],
-            str(item.quantity),
-            f"{total:.2f}"
-        ])
-
-    table = Table(data, colWidths=[35*mm, 10*mm, 15*mm])
-    table.setStyle(TableStyle([
-        ("GRID", (0,0), (-1,-1), 0.5, colors.black),
-        ("FONT", (0,0), (-1,0), "Helvetica-Bold"),
-        ("ALIGN", (1,1), (-1,-1), "CENTER"),
-    ]))
-
-    elements.append(table)
-    elements.append(Spacer(1, 6))
-
-    tax = round(subtotal * 0.05, 2)
-    grand = subtotal + tax
-
-    elements.append(Paragraph(
-        f"""
-        ----------------------<br/>
-        Subtotal: ${subtotal:.2f}<br/>
-        GST (5%): ${tax:.2f}<br/>
-        <b>Total: ${grand:.2f}</b><br/>
-        ----------------------<br/>
-        Thank you....!!<br/>
-        Visit Again!
-        """,
-        styles["Normal"]
-    ))
-
-    doc.build(elements)
-    buffer.seek(0)
+    # 🧾 Rendered once per order version, then served from the disk cache
+    path, etag = invoices.cached_pos_invoice(invoices.pos_invoice_data(order))
 
     return send_file(
-        buffer,
+        path,
         as_attachment=True,
         download_name=f"POS_ORD{order.id}.pdf",
-        mimetype="application/pdf"
-    )
\ No newline at end of file
+        mimetype="application/pdf",
+        etag=etag,
+        conditional=True,
+        max_age=0,
+    )
@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+
+
+class PoolBusy(Exception):
+    pass
+
+
+class BoundedPool:
+    """A lazily started process pool with a cap on queued jobs.
+
+    Sized from ``<NAME>_WORKERS``, ``<NAME>_MAX_PENDING`` and
+    ``<NAME>_TIMEOUT`` in the app config. With 0 workers jobs run inline.
+    When the queue is full, or a job takes longer than the timeout, ``run``
+    raises ``busy`` (a PoolBusy subclass) instead of making the request wait.
+    """
+
+    def __init__(self, name, busy=PoolBusy):
+        self.name = name
+        self.busy = busy
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _config(self, key):
+        return current_app.config[f"{self.name}_{key}"]
+
+    def _start(self):
+        with self._lock:
+            if self._executor is None:
+                self._slots = threading.BoundedSemaphore(self._config("MAX_PENDING"))
+                self._executor = ProcessPoolExecutor(max_workers=self._config("WORKERS"))
+        return self._executor
+
+    def run(self, fn, *args):
+        if not self._config("WORKERS"):
+            return fn(*args)
+
+        executor = self._executor or self._start()
+
+        if not self._slots.acquire(blocking=False):
+            raise self.busy()
+
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self._config("TIMEOUT"))
+        except FutureTimeout:
+            future.cancel()
+            raise self.busy()